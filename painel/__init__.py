@@ -0,0 +1,8 @@
+"""Núcleo de dados do Painel VISA Ipojuca (independente do Streamlit)."""
+
+import pandas as pd
+
+# Os dados são compartilhados entre sessões: com cópia na escrita (o padrão
+# no pandas 3), alterar um quadro derivado nunca altera o original
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
@@ -0,0 +1,146 @@
+"""Somas acumuladas por dia: totais de qualquer período em O(1).
+
+Para cada dia entre a primeira e a última data da base guarda-se a soma
+acumulada de inspeções e de liberados, no total e por valor de cada
+dimensão do cubo (turno, coordenação, motivação...). O total de um período
+``inicio..fim`` é então a diferença de duas posições, sem olhar linhas nem
+células do cubo, o que também torna imediata a comparação com outro
+período (o anterior, o mesmo do ano passado).
+
+Numa base nova, os dias dos meses fechados (ver ``painel.particoes``) não
+mudam: o prefixo que os cobre é reaproveitado da base anterior e só os
+dias seguintes são somados de novo.
+"""
+
+import numpy as np
+import pandas as pd
+
+MEDIDAS = ["INSPECOES", "LIBERADOS"]
+UM_DIA = np.timedelta64(1, "D")
+
+MODOS_COMPARACAO = {"periodo": "Período anterior", "ano": "Mesmo período do ano anterior"}
+
+
+def periodo_anterior(inicio, fim, modo: str = "periodo") -> tuple:
+    """Período de comparação: o imediatamente anterior, de mesma duração, ou o mesmo do ano anterior."""
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    if modo == "ano":
+        return inicio - pd.DateOffset(years=1), fim - pd.DateOffset(years=1)
+    duracao = fim - inicio + pd.Timedelta(days=1)
+    return inicio - duracao, fim - duracao
+
+
+def _inicio_mes(chave: int) -> np.datetime64:
+    return np.datetime64(f"{chave // 12:04d}-{chave % 12 + 1:02d}-01", "D")
+
+
+class SomasAcumuladas:
+    def __init__(self, cubo, anterior=None, meses_fechados=()):
+        """``meses_fechados``: chaves inteiras (ver ``painel.ranking``) de meses inalterados."""
+        tabela = cubo.tabela
+        datas = tabela["DATA"].to_numpy().astype("datetime64[D]")
+        validas = ~np.isnat(datas)
+        self._tipos = {coluna: tabela[coluna].dtype for coluna in cubo.dimensoes}
+        self.dimensoes = {coluna: tipo.categories for coluna, tipo in self._tipos.items()}
+        if not validas.any():
+            self.inicio, self.dias = None, 0
+        else:
+            self.inicio = datas[validas].min()
+            self.dias = int((datas[validas].max() - self.inicio) // UM_DIA) + 1
+
+        # Dias iniciais reaproveitáveis: os dos meses fechados desde o primeiro
+        limite = 0
+        if anterior is not None and self.inicio is not None and anterior.inicio == self.inicio:
+            mes = self.inicio.astype("datetime64[M]").astype(int) + 1970 * 12
+            while mes in meses_fechados:
+                mes += 1
+            limite = int((_inicio_mes(mes) - self.inicio) // UM_DIA)
+            limite = max(0, min(limite, self.dias, anterior.dias))
+        self.dias_reaproveitados = limite
+
+        dia = ((datas[validas] - self.inicio) // UM_DIA).astype(np.int64) if self.dias else np.empty(0, np.int64)
+        novos = dia >= limite
+        dia = dia[novos] - limite
+        restantes = self.dias - limite
+
+        self.total = {}
+        self.por_valor = {}
+        for medida in MEDIDAS:
+            pesos = tabela[medida].to_numpy()[validas][novos].astype(np.int64)
+            diario = np.bincount(dia, weights=pesos, minlength=restantes).astype(np.int64)
+            self.total[medida] = self._juntar(
+                anterior.total[medida][:limite + 1] if limite else np.zeros(1, np.int64), diario
+            )
+            self.por_valor[medida] = {}
+            for coluna, categorias in self.dimensoes.items():
+                codigos = tabela[coluna].cat.codes.to_numpy()[validas][novos]
+                k = len(categorias)
+                com_valor = codigos >= 0
+                diario = np.bincount(
+                    dia[com_valor] * k + codigos[com_valor], weights=pesos[com_valor],
+                    minlength=restantes * k,
+                ).astype(np.int64).reshape(restantes, k)
+                prefixo = np.zeros((limite + 1, k), dtype=np.int64)
+                if limite:
+                    antigo = anterior.dimensoes[coluna]
+                    posicoes = categorias.get_indexer(antigo)
+                    prefixo[:, posicoes[posicoes >= 0]] = (
+                        anterior.por_valor[medida][coluna][:limite + 1, posicoes >= 0]
+                    )
+                self.por_valor[medida][coluna] = self._juntar(prefixo, diario)
+
+        # Dias com alguma inspeção (para médias por dia)
+        com_inspecao = np.diff(self.total["INSPECOES"]) > 0
+        self.total["DIAS"] = np.concatenate([[0], np.cumsum(com_inspecao)]).astype(np.int64)
+        self.total["DIAS"].flags.writeable = False
+
+    @staticmethod
+    def _juntar(prefixo: np.ndarray, diario: np.ndarray) -> np.ndarray:
+        # Continua a soma a partir do último valor do prefixo reaproveitado
+        acumulado = np.concatenate([prefixo, np.cumsum(diario, axis=0) + prefixo[-1]])
+        acumulado.flags.writeable = False
+        return acumulado
+
+    def _posicoes(self, periodo) -> tuple[int, int]:
+        """Posições ``[a, b)`` dos acumulados que delimitam o período."""
+        if self.inicio is None:
+            return 0, 0
+        if not periodo:
+            return 0, self.dias
+        a = (np.datetime64(pd.Timestamp(periodo[0]), "D") - self.inicio) // UM_DIA
+        b = (np.datetime64(pd.Timestamp(periodo[1]), "D") - self.inicio) // UM_DIA + 1
+        a, b = int(np.clip(a, 0, self.dias)), int(np.clip(b, 0, self.dias))
+        return a, max(a, b)
+
+    def total_periodo(self, periodo, medida: str = "INSPECOES") -> int:
+        a, b = self._posicoes(periodo)
+        acumulado = self.total[medida]
+        return int(acumulado[b] - acumulado[a])
+
+    def somas(self, coluna: str, periodo) -> pd.DataFrame:
+        """INSPECOES e LIBERADOS por valor de ``coluna`` (só valores com inspeções)."""
+        a, b = self._posicoes(periodo)
+        somas = pd.DataFrame(
+            {medida: self.por_valor[medida][coluna][b] - self.por_valor[medida][coluna][a]
+             for medida in MEDIDAS},
+            index=pd.CategoricalIndex(
+                pd.Categorical.from_codes(np.arange(len(self.dimensoes[coluna])), dtype=self._tipos[coluna]),
+                name=coluna,
+            ),
+        )
+        return somas[somas["INSPECOES"] > 0]
+
+    def contagem(self, coluna: str, periodo) -> pd.Series:
+        """Mesmo resultado de ``agregacoes.contagem`` para um filtro só de período."""
+        serie = self.somas(coluna, periodo)["INSPECOES"]
+        return serie.sort_values(ascending=False, kind="stable").rename("count")
+
+    def totais(self, periodo) -> dict:
+        inspecoes = self.total_periodo(periodo)
+        liberados = self.total_periodo(periodo, "LIBERADOS")
+        return {
+            "total_inspecoes": inspecoes,
+            "liberados": liberados,
+            "dias_periodo": max(self.total_periodo(periodo, "DIAS"), 1),
+            "taxa_liberacao": liberados / inspecoes * 100 if inspecoes > 0 else 0,
+        }
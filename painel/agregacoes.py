@@ -0,0 +1,165 @@
+"""Indicadores e tabelas do painel calculados a partir do cubo de produção.
+
+Cada função recebe um recorte do cubo (ver ``BaseDados.agregar``) e devolve
+os mesmos quadros que o painel montava a partir das linhas. As contagens de
+estabelecimentos distintos não podem ser somadas entre células do cubo e
+por isso continuam vindo das linhas selecionadas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from painel.distintos import estimar
+from painel.graficos import inicio_do_periodo
+from painel.ranking import contar_meses
+
+
+def _codigos_equipe(cubo: pd.DataFrame) -> np.ndarray:
+    return cubo["EQUIPE/INSPETOR"].cat.codes.to_numpy()
+
+
+def _por_inspetor(cubo: pd.DataFrame, inspetores) -> pd.DataFrame:
+    """Cada célula do cubo repetida para cada membro da equipe."""
+    posicoes, ids = inspetores.membros(_codigos_equipe(cubo))
+    return pd.DataFrame({
+        "DATA": cubo["DATA"].to_numpy()[posicoes],
+        "INSPETOR_LISTA": pd.Categorical.from_codes(ids, categories=inspetores.nomes),
+        "INSPECOES": cubo["INSPECOES"].to_numpy()[posicoes],
+        "LIBERADOS": cubo["LIBERADOS"].to_numpy()[posicoes],
+    })
+
+
+# ======================================================
+# 📊 VISÃO GERAL
+# ======================================================
+def dias_periodo(cubo: pd.DataFrame) -> int:
+    dias = cubo["DATA"].nunique()
+    return dias if dias > 0 else 1
+
+
+def totais(cubo: pd.DataFrame) -> dict:
+    """Totais somáveis do recorte (os mesmos de ``SomasAcumuladas.totais``)."""
+    total_inspecoes = int(cubo["INSPECOES"].sum())
+    liberados = int(cubo["LIBERADOS"].sum())
+    return {
+        "total_inspecoes": total_inspecoes,
+        "liberados": liberados,
+        "dias_periodo": dias_periodo(cubo),
+        "taxa_liberacao": liberados / total_inspecoes * 100 if total_inspecoes > 0 else 0,
+    }
+
+
+def indicadores(cubo: pd.DataFrame, df_filtrado: pd.DataFrame, inspetores, totais_periodo=None,
+                sketches=None) -> dict:
+    """``totais_periodo``: totais já calculados (ex.: das somas acumuladas), senão somados do cubo.
+
+    Com ``sketches`` (``SketchesDistintos`` do cubo de onde ``cubo`` foi
+    recortado), os estabelecimentos distintos são estimados em vez de contados.
+    """
+    _, ids = inspetores.membros(_codigos_equipe(cubo))
+    if sketches is not None:
+        estabelecimentos = sketches.contar(cubo.index)
+    else:
+        estabelecimentos = int(df_filtrado["ESTABELECIMENTO"].nunique())
+    return {
+        **(totais_periodo or totais(cubo)),
+        "total_estabelecimentos": estabelecimentos,
+        "total_inspetores": len(np.unique(ids)),
+    }
+
+
+def producao_por_data(cubo: pd.DataFrame, granularidade: str = "dia") -> pd.DataFrame:
+    """Inspeções por dia, semana ou mês (coluna DATA = início do período)."""
+    datas = inicio_do_periodo(cubo["DATA"], granularidade)
+    return cubo.groupby(datas)["INSPECOES"].sum().reset_index(name="Inspeções")
+
+
+def contagem(cubo: pd.DataFrame, coluna: str) -> pd.Series:
+    """Equivalente a ``value_counts`` da coluna nas linhas selecionadas."""
+    serie = cubo.groupby(coluna, observed=True)["INSPECOES"].sum()
+    serie = serie[serie > 0].sort_values(ascending=False, kind="stable")
+    return serie.rename("count")
+
+
+def cruzamento(cubo: pd.DataFrame, coluna_x: str, coluna_cor: str) -> pd.DataFrame:
+    return (
+        cubo.groupby([coluna_x, coluna_cor], observed=True)["INSPECOES"]
+        .sum()
+        .reset_index(name="Quantidade")
+    )
+
+
+# ======================================================
+# 🕵️‍♂️ INSPETORES
+# ======================================================
+def desempenho_inspetores(cubo: pd.DataFrame, base, linhas, dias: int, sketches=None) -> pd.DataFrame:
+    por_inspetor = _por_inspetor(cubo, base.inspetores)
+    desempenho = por_inspetor.groupby("INSPETOR_LISTA", observed=True)[["INSPECOES", "LIBERADOS"]].sum()
+
+    if sketches is not None:
+        # Cada par (registrador, posto) vai para todos os membros da equipe da célula
+        celula, registros, postos = sketches.pares(cubo.index)
+        equipes = sketches.por_celula(cubo.index, _codigos_equipe(cubo))
+        posicoes, ids = base.inspetores.membros(equipes[celula])
+        por_inspetor = np.zeros(len(base.inspetores.nomes) * sketches.m, dtype=np.uint8)
+        np.maximum.at(por_inspetor, ids.astype(np.int64) * sketches.m + registros[posicoes], postos[posicoes])
+        estimados = estimar(por_inspetor.reshape(-1, sketches.m))
+        estab = pd.Series(np.rint(estimados).astype(np.int64), index=base.inspetores.nomes)
+    else:
+        estab = (
+            base.inspetores.explodir(base.df, linhas, ["ESTABELECIMENTO"])
+            .groupby("INSPETOR_LISTA", observed=True)["ESTABELECIMENTO"]
+            .nunique()
+        )
+    desempenho["ESTAB_UNICOS"] = estab.reindex(desempenho.index).fillna(0).astype("int64")
+    desempenho = desempenho.reset_index()
+
+    desempenho["TAXA_LIBERACAO_%"] = (
+        desempenho["LIBERADOS"] / desempenho["INSPECOES"] * 100
+    ).round(1)
+
+    desempenho["INSPECOES_DIA_MEDIO"] = (
+        desempenho["INSPECOES"] / dias
+    ).round(2)
+
+    desempenho["PARTICIPACAO_%"] = (
+        desempenho["INSPECOES"] / desempenho["INSPECOES"].sum() * 100
+    ).round(1)
+
+    return desempenho.sort_values("INSPECOES", ascending=False)
+
+
+def producao_mensal_inspetores(cubo: pd.DataFrame, inspetores) -> pd.DataFrame:
+    """Inspeções por mês (PERIODO inteiro) e inspetor; ver ``painel.ranking``."""
+    return contar_meses(cubo, inspetores)
+
+
+# ======================================================
+# 👥 COORDENAÇÕES
+# ======================================================
+def desempenho_coordenacoes(cubo: pd.DataFrame, df_filtrado: pd.DataFrame, soma=None,
+                            sketches=None) -> pd.DataFrame:
+    """``soma``: INSPECOES/LIBERADOS por coordenação já calculados (ex.: ``SomasAcumuladas.somas``)."""
+    if soma is None:
+        soma = cubo.groupby("COORDENAÇÃO", observed=True)[["INSPECOES", "LIBERADOS"]].sum()
+    if sketches is not None:
+        coordenacoes = cubo["COORDENAÇÃO"].cat
+        validas = coordenacoes.codes.to_numpy() >= 0
+        estimados = sketches.contar_por_grupo(
+            cubo.index[validas], coordenacoes.codes.to_numpy()[validas], len(coordenacoes.categories)
+        )
+        estab = pd.Series(estimados, index=pd.CategoricalIndex(coordenacoes.categories, name="COORDENAÇÃO"))
+    else:
+        estab = df_filtrado.groupby("COORDENAÇÃO", observed=True)["ESTABELECIMENTO"].nunique()
+
+    grp_coord = pd.DataFrame({
+        "INSPECOES": soma["INSPECOES"],
+        "ESTAB_UNICOS": estab.reindex(soma.index).fillna(0).astype("int64"),
+        "LIBERADOS": soma["LIBERADOS"],
+    }).reset_index()
+
+    grp_coord["TAXA_LIBERACAO_%"] = (
+        grp_coord["LIBERADOS"] / grp_coord["INSPECOES"] * 100
+    ).round(1)
+
+    return grp_coord.sort_values("INSPECOES", ascending=False)
@@ -0,0 +1,404 @@
+"""API HTTP/JSON com os indicadores do painel, sem o Streamlit.
+
+Para outros sistemas da prefeitura: os mesmos números de "Indicadores
+Gerais" e das tabelas de inspetores e coordenações, a partir da mesma base
+normalizada (``FonteIncremental`` ou um CSV local), com os filtros da
+barra lateral como parâmetros da URL. Os valores de um filtro se repetem
+(``?turno=MANHÃ&turno=TARDE``), porque nomes podem conter vírgulas.
+
+    GET /indicadores     indicadores gerais (admin e inspetor)
+    GET /inspetores      desempenho por inspetor (só admin)
+    GET /coordenacoes    desempenho por coordenação (só admin)
+    GET /saude           versão dos dados e uso do cache (sem login)
+
+Parâmetros: ``inicio`` e ``fim`` (AAAA-MM-DD; padrão igual ao do painel,
+o ano corrente), ``turno``, ``localidade``, ``estabelecimento``,
+``coordenacao``, ``risco``, ``motivacao``, ``status``, ``inspetor`` e, em
+``/indicadores``, ``comparacao`` (``periodo`` ou ``ano``).
+
+Login por HTTP Basic com os usuários do painel (``painel.usuarios``) e o
+mesmo escopo: o inspetor só vê a própria produção (o filtro de inspetor é
+sempre ele mesmo) e não acessa as tabelas de inspetores e coordenações.
+
+As respostas ficam num ``CacheAgregacoes`` (descartado quando chega uma
+versão nova dos dados). O ETag é derivado da versão dos dados e dos
+filtros efetivos, então uma requisição com ``If-None-Match`` é respondida
+com 304 antes de qualquer cálculo.
+
+Erros voltam sempre como JSON (``{"erro": ...}``): 4xx para consultas
+inválidas, 503 (com ``Retry-After``) enquanto ainda não há dados carregados
+e 500 para falhas inesperadas, registradas no log.
+
+    python -m painel.api --porta 8502                     # VISA_URL_DADOS
+    python -m painel.api --csv planilha.csv --porta 8502
+    curl -u admin:SENHA 'http://127.0.0.1:8502/indicadores?inicio=2025-01-01&fim=2025-03-31'
+"""
+
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from painel import agregacoes
+from painel.acumulados import MODOS_COMPARACAO, periodo_anterior
+from painel.cache import CacheAgregacoes, chave_filtros
+from painel.distintos import LIMITE_EXATO
+from painel.usuarios import autenticar
+
+logger = logging.getLogger("visa.api")
+
+# Parâmetro da URL -> coluna filtrada (os da barra lateral)
+PARAMETROS = {
+    "turno": "TURNO",
+    "localidade": "LOCALIDADE",
+    "estabelecimento": "ESTABELECIMENTO",
+    "coordenacao": "COORDENAÇÃO",
+    "risco": "CLASSIFICAÇÃO DE RISCO",
+    "motivacao": "MOTIVAÇÃO",
+    "status": "O ESTABELECIMENTO FOI LIBERADO",
+}
+# Recurso -> perfis com acesso
+RECURSOS = {
+    "indicadores": ("admin", "inspetor"),
+    "inspetores": ("admin",),
+    "coordenacoes": ("admin",),
+}
+
+
+class ErroConsulta(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def periodo_padrao(base, ano: int | None = None) -> tuple:
+    """Período inicial do painel: o ano corrente, limitado às datas da base.
+
+    Se a base ainda não tem inspeções no ano corrente, a base inteira. As
+    datas extremas vêm das somas acumuladas (montadas com a base), sem
+    varrer as linhas.
+    """
+    acumulados = base.acumulados
+    if acumulados.inicio is None:
+        return pd.NaT, pd.NaT
+    primeira = pd.Timestamp(acumulados.inicio)
+    ultima = primeira + pd.Timedelta(days=acumulados.dias - 1)
+    ano = ano or datetime.now().year
+    inicio = max(primeira, pd.Timestamp(f"{ano}-01-01"))
+    fim = min(ultima, pd.Timestamp(f"{ano}-12-31"))
+    if fim < inicio:
+        return primeira, ultima
+    return inicio, fim
+
+
+def _data(texto: str, nome: str) -> pd.Timestamp:
+    try:
+        return pd.Timestamp(datetime.strptime(texto, "%Y-%m-%d"))
+    except ValueError:
+        raise ErroConsulta(400, f"{nome} deve estar no formato AAAA-MM-DD") from None
+
+
+def _serializar(valor):
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return None if np.isnan(valor) else float(valor)
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _registros(df: pd.DataFrame) -> list:
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+# ======================================================
+# 🔎 CONSULTAS
+# ======================================================
+class ServicoIndicadores:
+    def __init__(self, obter_base, cache: CacheAgregacoes | None = None, distintos: str = "exato"):
+        """``obter_base``: devolve a ``BaseDados`` atual (ex.: ``FonteIncremental.obter``)."""
+        self.obter_base = obter_base
+        self.cache = cache or CacheAgregacoes()
+        self.distintos = distintos
+        self._periodo_padrao = (None, None, None)     # (versão, ano, período)
+
+    def periodo_padrao(self, base) -> tuple:
+        """``periodo_padrao`` calculado uma vez por versão da base (e ano)."""
+        versao, ano, periodo = self._periodo_padrao
+        ano_atual = datetime.now().year
+        if versao != base.versao or ano != ano_atual:
+            periodo = periodo_padrao(base, ano_atual)
+            self._periodo_padrao = (base.versao, ano_atual, periodo)
+        return periodo
+
+    def filtros(self, base, parametros: dict, perfil: dict) -> dict:
+        """Filtros efetivos da consulta, já com o escopo do perfil."""
+        desconhecidos = set(parametros) - set(PARAMETROS) - {"inicio", "fim", "inspetor", "comparacao"}
+        if desconhecidos:
+            raise ErroConsulta(400, f"Parâmetros desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+        inicio, fim = self.periodo_padrao(base)
+        if "inicio" in parametros:
+            inicio = _data(parametros["inicio"][-1], "inicio")
+        if "fim" in parametros:
+            fim = _data(parametros["fim"][-1], "fim")
+        if fim < inicio:
+            raise ErroConsulta(400, "fim anterior a inicio")
+
+        comparacao = parametros.get("comparacao", [None])[-1]
+        if comparacao is not None and comparacao not in MODOS_COMPARACAO:
+            raise ErroConsulta(400, f"comparacao deve ser um de: {', '.join(MODOS_COMPARACAO)}")
+
+        valores = {coluna: sorted(set(parametros.get(nome, []))) for nome, coluna in PARAMETROS.items()}
+        if perfil["perfil"] == "admin":
+            inspetores = sorted(set(parametros.get("inspetor", [])))
+        else:
+            # Inspetor comum é sempre filtrado nele mesmo
+            inspetores = [perfil["inspetor_nome"]]
+        return {"periodo": (inicio, fim), "valores": valores, "inspetores": inspetores,
+                "comparacao": comparacao}
+
+    def consultar(self, recurso: str, parametros: dict, perfil: dict, etag_cliente: str | None = None):
+        """``(status, corpo, etag)``; corpo ``None`` quando o ``etag_cliente`` ainda vale (304)."""
+        if recurso not in RECURSOS:
+            raise ErroConsulta(404, f"Recurso desconhecido: {recurso}")
+        if perfil["perfil"] not in RECURSOS[recurso]:
+            raise ErroConsulta(403, "Recurso disponível apenas para o perfil admin")
+
+        base = self._base()
+        filtros = self.filtros(base, parametros, perfil)
+        chave = chave_filtros(filtros["periodo"], filtros["valores"], filtros["inspetores"],
+                              recurso=recurso, comparacao=filtros["comparacao"], distintos=self.distintos)
+        etag = '"' + hashlib.sha1(f"{base.versao}|{chave}".encode()).hexdigest() + '"'
+        if etag_cliente and etag in [e.strip() for e in etag_cliente.split(",")]:
+            return 304, None, etag
+
+        corpo = self.cache.obter(base.versao, chave, "resposta",
+                                 lambda: self._corpo(base, recurso, filtros))
+        return 200, corpo, etag
+
+    def _base(self):
+        """Base atual com dados; 503 enquanto a primeira carga não terminou ou falhou."""
+        try:
+            base = self.obter_base()
+        except Exception as erro:
+            logger.warning("base indisponível: %s: %s", type(erro).__name__, erro)
+            raise ErroConsulta(503, "Dados indisponíveis no momento; tente novamente.") from erro
+        if base is None or base.acumulados.inicio is None:
+            raise ErroConsulta(503, "Ainda não há dados carregados.")
+        return base
+
+    def _memorizado(self, base, chave: str, nome: str, calcular):
+        return self.cache.obter(base.versao, chave, nome, calcular)
+
+    def _corpo(self, base, recurso: str, filtros: dict) -> bytes:
+        periodo, valores, inspetores = filtros["periodo"], filtros["valores"], filtros["inspetores"]
+        # Seleção compartilhada pelos recursos com os mesmos filtros (como no painel)
+        chave = chave_filtros(periodo, valores, inspetores)
+        linhas = self._memorizado(base, chave, "filtros", lambda: base.selecionar(periodo, valores, inspetores))
+        df_filtrado = self._memorizado(base, chave, "df_filtrado", lambda: base.recortar(linhas))
+        cubo = self._memorizado(base, chave, "cubo", lambda: base.agregar(linhas, periodo, valores, inspetores))
+        somente_periodo = not inspetores and not any(valores.values())
+        sketches = None
+        if self.distintos == "aproximado" and len(linhas) > LIMITE_EXATO and base.cubo.atende(valores):
+            sketches = base.cubo.distintos
+
+        resposta = {
+            "versao": base.versao,
+            "filtros": {
+                "inicio": periodo[0].date().isoformat(),
+                "fim": periodo[1].date().isoformat(),
+                **{nome: valores[coluna] for nome, coluna in PARAMETROS.items() if valores[coluna]},
+                "inspetor": inspetores,
+            },
+            "distintos": "aproximado" if sketches is not None else "exato",
+        }
+        if recurso == "indicadores":
+            resposta["indicadores"] = agregacoes.indicadores(
+                cubo, df_filtrado, base.inspetores,
+                base.acumulados.totais(periodo) if somente_periodo else None,
+                sketches,
+            )
+            if filtros["comparacao"]:
+                periodo_cmp = periodo_anterior(*periodo, filtros["comparacao"])
+                if somente_periodo:
+                    anteriores = base.acumulados.totais(periodo_cmp)
+                else:
+                    linhas_cmp = base.selecionar(periodo_cmp, valores, inspetores)
+                    anteriores = agregacoes.totais(base.agregar(linhas_cmp, periodo_cmp, valores, inspetores))
+                resposta["comparacao"] = {
+                    "modo": filtros["comparacao"],
+                    "inicio": periodo_cmp[0].date().isoformat(),
+                    "fim": periodo_cmp[1].date().isoformat(),
+                    **anteriores,
+                }
+        elif recurso == "inspetores":
+            desempenho = agregacoes.desempenho_inspetores(
+                cubo, base, linhas, agregacoes.dias_periodo(cubo), sketches
+            ) if len(linhas) else pd.DataFrame()
+            resposta["inspetores"] = _registros(desempenho)
+        else:
+            desempenho = agregacoes.desempenho_coordenacoes(
+                cubo, df_filtrado,
+                base.acumulados.somas("COORDENAÇÃO", periodo) if somente_periodo else None,
+                sketches,
+            ) if len(linhas) else pd.DataFrame()
+            resposta["coordenacoes"] = _registros(desempenho)
+        return json.dumps(resposta, ensure_ascii=False, default=_serializar).encode("utf-8")
+
+    def saude(self) -> bytes:
+        base = self._base()
+        return json.dumps({"versao": base.versao, "linhas": len(base.df),
+                           "cache": self.cache.estatisticas()}, default=_serializar).encode("utf-8")
+
+
+# ======================================================
+# 🌐 SERVIDOR HTTP
+# ======================================================
+def _perfil_basic(cabecalho: str | None) -> dict | None:
+    if not cabecalho or not cabecalho.startswith("Basic "):
+        return None
+    try:
+        usuario, _, senha = base64.b64decode(cabecalho[6:]).decode("utf-8").partition(":")
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return autenticar(usuario, senha)
+
+
+class ServidorIndicadores:
+    def __init__(self, servico: ServicoIndicadores, host: str = "127.0.0.1", porta: int = 0):
+        self.servico = servico
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def servir(self):
+        self._servidor.serve_forever()
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # --------------------------------------------------
+    def _criar_handler(self):
+        servico = self.servico
+
+        class _Handler(BaseHTTPRequestHandler):
+            def _enviar(self, status: int, corpo: bytes = b"", extras: dict | None = None):
+                self.send_response(status)
+                if corpo:
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                for nome, valor in (extras or {}).items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                if corpo:
+                    self.wfile.write(corpo)
+
+            def _erro(self, status: int, mensagem: str, extras: dict | None = None):
+                self._enviar(status, json.dumps({"erro": mensagem}, ensure_ascii=False).encode("utf-8"), extras)
+
+            def do_GET(self):
+                try:
+                    self._responder()
+                except ErroConsulta as erro:
+                    self._erro(erro.status, str(erro), {"Retry-After": "30"} if erro.status == 503 else None)
+                except Exception:
+                    # Sempre uma resposta HTTP, nunca a conexão derrubada
+                    logger.exception("erro inesperado em GET %s", self.path)
+                    self._erro(500, "Erro interno ao calcular a resposta.")
+
+            def _responder(self):
+                partes = urlsplit(self.path)
+                recurso = partes.path.strip("/")
+                if recurso == "saude":
+                    self._enviar(200, servico.saude(), {"Cache-Control": "no-store"})
+                    return
+
+                perfil = _perfil_basic(self.headers.get("Authorization"))
+                if perfil is None:
+                    self._erro(401, "Usuário ou senha incorretos.",
+                               {"WWW-Authenticate": 'Basic realm="VISA Ipojuca", charset="UTF-8"'})
+                    return
+                status, corpo, etag = servico.consultar(
+                    recurso, parse_qs(partes.query), perfil, self.headers.get("If-None-Match")
+                )
+                # Cada resposta depende do usuário (escopo): nada de caches compartilhados
+                self._enviar(status, corpo or b"", {
+                    "ETag": etag,
+                    "Cache-Control": "private, no-cache",
+                    "Vary": "Authorization",
+                })
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+
+def _main():
+    from painel.ingestao import FonteIncremental
+    from painel.lote import carregar_base
+
+    parser = argparse.ArgumentParser(description="Serve os indicadores do painel em JSON.")
+    parser.add_argument("--csv", help="planilha CSV local (em vez da URL)")
+    parser.add_argument("--url", default=os.environ.get("VISA_URL_DADOS"), help="URL CSV da planilha")
+    parser.add_argument("--snapshot", default=os.environ.get("VISA_SNAPSHOT"),
+                        help="pasta de partições para reaproveitar a carga")
+    parser.add_argument("--ttl", type=float, default=float(os.environ.get("VISA_TTL_DADOS", "300")),
+                        help="segundos entre consultas à planilha")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    args = parser.parse_args()
+
+    if args.csv:
+        base = carregar_base(csv=args.csv)
+        obter_base = lambda: base
+    elif args.url:
+        fonte = FonteIncremental(args.url, ttl=args.ttl, caminho_snapshot=args.snapshot)
+        fonte.iniciar_atualizador()
+        obter_base = fonte.obter
+    else:
+        parser.error("informe --csv ou a URL da planilha (VISA_URL_DADOS)")
+
+    servico = ServicoIndicadores(obter_base, distintos=os.environ.get("VISA_DISTINTOS", "exato"))
+    servico.obter_base()    # primeira carga antes de aceitar requisições
+    servidor = ServidorIndicadores(servico, args.host, args.porta)
+    print(f"Indicadores em {servidor.url}", flush=True)
+    try:
+        servidor.servir()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor._servidor.server_close()
+
+
+if __name__ == "__main__":
+    _main()
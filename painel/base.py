@@ -0,0 +1,66 @@
+"""Conjunto de dados servido ao painel: quadro normalizado + índices.
+
+Uma ``BaseDados`` é montada uma vez por versão dos dados e nunca é
+alterada depois; uma atualização da planilha produz uma base nova. As
+linhas ficam agrupadas por mês (ver ``painel.particoes``).
+
+Uma única base atende a todas as sessões. Elas trabalham com posições de
+linha e com visões: ``df`` e ``recortar`` devolvem quadros rasos (sem copiar
+os dados) que, com cópia na escrita, podem ser alterados sem afetar a base,
+e os arrays dos índices são somente leitura.
+"""
+
+import pandas as pd
+
+from painel.acumulados import SomasAcumuladas
+from painel.cubo import CuboProducao, montar_cubo
+from painel.estabelecimentos import DimensaoEstabelecimentos
+from painel.filtros import IndiceFiltros
+from painel.inspetores import DimensaoInspetores
+from painel.particoes import Particoes, ordenar_por_mes
+from painel.ranking import RankingMensal
+from painel.tabela import TabelaDetalhada
+
+
+class BaseDados:
+    def __init__(self, df: pd.DataFrame, col_data: str, versao: str, ranking_fechado: dict | None = None,
+                 anterior=None):
+        """``anterior``: base da versão anterior, da qual se reaproveita o que cobre meses fechados."""
+        df = ordenar_por_mes(df)
+        self._df = df
+        self.col_data = col_data
+        self.versao = versao
+        self.particoes = Particoes(df)
+        self.inspetores = DimensaoInspetores(df["EQUIPE/INSPETOR"])
+        self.indice = IndiceFiltros(df, col_data, self.inspetores, self.particoes)
+        self.estabelecimentos = DimensaoEstabelecimentos(
+            df, col_data, self.indice.dimensoes["ESTABELECIMENTO"]
+        )
+        self.cubo = CuboProducao(df, self.inspetores)
+        # Meses fechados do ranking vêm prontos (base anterior ou snapshot)
+        self.ranking = RankingMensal(self.cubo, self.inspetores, ranking_fechado)
+        self.acumulados = SomasAcumuladas(
+            self.cubo, anterior.acumulados if anterior is not None else None, self.ranking.fechados
+        )
+        self.tabela = TabelaDetalhada(df)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Visão do quadro completo (alterações nela não chegam à base)."""
+        return self._df.copy(deep=False)
+
+    def selecionar(self, periodo=None, valores=None, inspetores=None):
+        """Posições (ordenadas) das linhas que atendem aos filtros."""
+        return self.indice.selecionar(periodo, valores, inspetores)
+
+    def recortar(self, linhas) -> pd.DataFrame:
+        """Quadro com as ``linhas`` selecionadas (mesmo índice e ordem da base)."""
+        if len(linhas) == self.indice.total:
+            return self.df
+        return self._df.take(linhas)
+
+    def agregar(self, linhas, periodo=None, valores=None, inspetores=None) -> pd.DataFrame:
+        """Recorte do cubo de produção equivalente às ``linhas`` selecionadas."""
+        if self.cubo.atende(valores):
+            return self.cubo.recortar(periodo, valores, inspetores)
+        return montar_cubo(self.recortar(linhas))
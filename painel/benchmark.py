@@ -0,0 +1,397 @@
+"""Bateria de medições do pipeline do painel sobre planilhas sintéticas.
+
+Cada etapa é cronometrada isoladamente (mediana e mínimo de várias
+repetições) e, numa passada separada, tem o pico de memória medido com
+``tracemalloc``. O ``tracemalloc`` enxerga as alocações do Python e do
+NumPy/pandas, mas não os buffers internos do Arrow; ele também deixa o
+código mais lento, por isso não é usado nas passadas cronometradas.
+
+    python -m painel.benchmark --linhas 10000 100000 1000000 -o resultados.json
+    python -m painel.benchmark --comparar antes.json depois.json
+    python -m painel.benchmark --linhas 100000 --sessoes 1 10 50
+    python -m painel.benchmark --linhas 100000 --api 200
+
+As etapas seguem o caminho de um rerun do painel: carga (leitura do CSV,
+normalização, índices e cubo, snapshot), aplicação dos filtros em cenários
+típicos, as agregações de cada visão e a exportação dos dados filtrados.
+``--sessoes`` mede, em vez disso, a memória retida por sessões simultâneas,
+e ``--api`` a latência da API de indicadores (``painel.api``).
+"""
+
+import argparse
+import base64
+import gc
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from datetime import datetime
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+from painel import agregacoes
+from painel.api import PARAMETROS, ServicoIndicadores, ServidorIndicadores
+from painel.base import BaseDados
+from painel.cache import CacheAgregacoes, chave_filtros
+from painel.carga import ler_csv, normalizar
+from painel.exportacao import exportar
+from painel.particoes import carregar_particoes, salvar_particoes
+from painel.sintetico import gerar_csv
+from painel.usuarios import SENHA_ADMIN, USUARIO_ADMIN
+
+LINHAS_PADRAO = [10_000, 100_000, 1_000_000]
+
+
+# ======================================================
+# ⏱️ MEDIÇÃO
+# ======================================================
+def medir(funcao, repeticoes: int = 5, memoria: bool = True) -> dict:
+    """Tempo (mediana/mínimo em segundos) e pico de memória de ``funcao()``."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    resultado = {
+        "segundos_mediana": statistics.median(tempos),
+        "segundos_min": min(tempos),
+        "repeticoes": repeticoes,
+    }
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            resultado["pico_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+
+def _cenarios(base: BaseDados) -> dict:
+    """Filtros típicos da barra lateral: nome -> (periodo, valores, inspetores)."""
+    datas = base.df["DATA"].dropna()
+    fim = datas.max()
+    trimestre = (fim - pd.Timedelta(days=90), fim)
+    frequentes = {
+        coluna: base.df[coluna].value_counts().index[:1].tolist()
+        for coluna in ["TURNO", "LOCALIDADE", "ESTABELECIMENTO"]
+    }
+    inspetor = base.inspetores.nomes_ordenados()[:1]
+    return {
+        "sem_filtro": (None, {}, []),
+        "trimestre": (trimestre, {}, []),
+        "turno_localidade": (trimestre, {"TURNO": frequentes["TURNO"], "LOCALIDADE": frequentes["LOCALIDADE"]}, []),
+        "estabelecimento": (None, {"ESTABELECIMENTO": frequentes["ESTABELECIMENTO"]}, []),
+        "inspetor": (trimestre, {}, inspetor),
+    }
+
+
+# ======================================================
+# 🧪 ETAPAS
+# ======================================================
+def medir_etapas(linhas: int, repeticoes: int = 5, memoria: bool = True, semente: int = 0,
+                 formatos=("xlsx", "csv", "parquet")) -> dict:
+    conteudo = gerar_csv(linhas, semente)
+    etapas = {}
+
+    def etapa(nome, funcao, vezes=repeticoes):
+        etapas[nome] = medir(funcao, vezes, memoria)
+
+    # 📥 Carga (o que ``carregar_dados`` faz numa partida sem snapshot)
+    bruto = ler_csv(conteudo)
+    df, col_data = normalizar(bruto.copy())
+    etapa("carga.ler_csv", lambda: ler_csv(conteudo), min(repeticoes, 3))
+    etapa("carga.normalizar", lambda: normalizar(bruto.copy()), min(repeticoes, 3))
+    etapa("carga.normalizar_linha_a_linha", lambda: normalizar(bruto.copy(), rapido=False), 1)
+    etapa("carga.indices_e_cubo", lambda: BaseDados(df, col_data, "benchmark"), min(repeticoes, 3))
+    base = BaseDados(df, col_data, "benchmark")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        etapa("carga.salvar_snapshot", lambda: salvar_particoes(pasta, base.df, col_data), min(repeticoes, 3))
+        etapa("carga.abrir_snapshot", lambda: carregar_particoes(pasta), min(repeticoes, 3))
+
+    # 🔍 Filtros e 📊 agregações por visão, em cada cenário
+    for cenario, (periodo, valores, inspetores) in _cenarios(base).items():
+        def filtrar():
+            linhas_sel = base.selecionar(periodo, valores, inspetores)
+            return linhas_sel, base.recortar(linhas_sel), base.agregar(linhas_sel, periodo, valores, inspetores)
+
+        etapa(f"filtros.{cenario}", filtrar)
+        linhas_sel, df_filtrado, cubo = filtrar()
+
+        etapa(f"visao_geral.{cenario}", lambda: (
+            agregacoes.indicadores(cubo, df_filtrado, base.inspetores),
+            agregacoes.producao_por_data(cubo),
+            agregacoes.contagem(cubo, "MOTIVAÇÃO"),
+            agregacoes.contagem(cubo, "O ESTABELECIMENTO FOI LIBERADO"),
+            agregacoes.cruzamento(cubo, "LOCALIDADE", "CLASSIFICAÇÃO DE RISCO"),
+        ))
+        etapa(f"inspetores.{cenario}", lambda: (
+            agregacoes.desempenho_inspetores(cubo, base, linhas_sel, agregacoes.dias_periodo(cubo)),
+            agregacoes.producao_mensal_inspetores(cubo, base.inspetores),
+        ))
+        etapa(f"coordenacoes.{cenario}", lambda: (
+            agregacoes.desempenho_coordenacoes(cubo, df_filtrado),
+            agregacoes.cruzamento(cubo, "COORDENAÇÃO", "CLASSIFICAÇÃO DE RISCO"),
+        ))
+        etapa(f"detalhes.{cenario}", lambda: base.tabela.pagina(
+            base.tabela.ordenar(linhas_sel, "DATA", decrescente=True), 1, 100
+        ))
+
+    # 📥 Exportação de uma seleção típica (último trimestre)
+    periodo, valores, inspetores = _cenarios(base)["trimestre"]
+    df_export = base.recortar(base.selecionar(periodo, valores, inspetores))
+    with tempfile.TemporaryDirectory() as pasta:
+        for formato in formatos:
+            caminho = os.path.join(pasta, f"exportacao.{formato}")
+            etapa(f"exportacao.{formato}", lambda: exportar(df_export, formato, caminho), 1)
+            etapas[f"exportacao.{formato}"]["linhas"] = len(df_export)
+
+    return {
+        "linhas": linhas,
+        "memoria_quadro_mb": df.memory_usage(deep=True).sum() / 2**20,
+        "celulas_cubo": len(base.cubo),
+        "etapas": etapas,
+    }
+
+
+# ======================================================
+# 👥 MEMÓRIA POR SESSÃO
+# ======================================================
+def medir_sessoes(linhas: int, sessoes=(1, 10, 50), semente: int = 0) -> list:
+    """Memória retida por N sessões simultâneas: base compartilhada × cópia por sessão.
+
+    Cada sessão é um inspetor diferente no último ano (seleção, recorte e
+    cubo). No modelo compartilhado os resultados vêm do ``CacheAgregacoes``,
+    como no painel; no modelo antigo cada sessão recebia a própria cópia
+    desserializada do quadro (``st.cache_data``) e filtrava outra cópia.
+    """
+    base = BaseDados(*normalizar(ler_csv(gerar_csv(linhas, semente))), "benchmark")
+    nomes = base.inspetores.nomes_ordenados()
+    fim = base.df["DATA"].max()
+    periodo = (fim - pd.Timedelta(days=365), fim)
+    serializado = pickle.dumps(base.df)
+
+    def compartilhada(cache, i):
+        inspetores = [nomes[i % len(nomes)]]
+        chave = chave_filtros(periodo, {}, inspetores)
+        linhas_sel = cache.obter(base.versao, chave, "filtros",
+                                 lambda: base.selecionar(periodo, {}, inspetores))
+        return (
+            linhas_sel,
+            cache.obter(base.versao, chave, "df_filtrado", lambda: base.recortar(linhas_sel)),
+            cache.obter(base.versao, chave, "cubo",
+                        lambda: base.agregar(linhas_sel, periodo, {}, inspetores)),
+        )
+
+    def copia_por_sessao(_, i):
+        df = pickle.loads(serializado)
+        filtrado = df.copy()
+        filtrado = filtrado[(filtrado["DATA"] >= periodo[0]) & (filtrado["DATA"] <= periodo[1])]
+        equipe = filtrado["EQUIPE/INSPETOR"].astype(str).str.upper()
+        return df, filtrado[equipe.str.contains(nomes[i % len(nomes)], regex=False)]
+
+    resultados = []
+    for n in sessoes:
+        for modelo, sessao in (("compartilhado", compartilhada), ("copia_por_sessao", copia_por_sessao)):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                cache = CacheAgregacoes()
+                estados = [sessao(cache, i) for i in range(n)]
+                retido = tracemalloc.get_traced_memory()[0] / 2**20
+            finally:
+                tracemalloc.stop()
+            del estados, cache
+            resultados.append({
+                "linhas": linhas,
+                "sessoes": n,
+                "modelo": modelo,
+                "mb_retidos": round(retido, 2),
+                "mb_por_sessao": round(retido / n, 3),
+            })
+    return resultados
+
+
+# ======================================================
+# 🌐 API DE INDICADORES
+# ======================================================
+def medir_api(linhas: int, requisicoes: int = 200, semente: int = 0) -> list:
+    """Latência (p50/p95/p99, ms) das requisições HTTP à API, por cenário e situação.
+
+    ``frio``: cache vazio a cada requisição (seleção, cubo e agregação);
+    ``cache``: mesma consulta já em cache; ``304``: revalidação com
+    ``If-None-Match``, respondida sem calcular nada.
+    """
+    base = BaseDados(*normalizar(ler_csv(gerar_csv(linhas, semente))), "benchmark")
+    colunas = {coluna: nome for nome, coluna in PARAMETROS.items()}
+    servico = ServicoIndicadores(lambda: base)
+    autorizacao = "Basic " + base64.b64encode(f"{USUARIO_ADMIN}:{SENHA_ADMIN}".encode()).decode()
+
+    def requisitar(url, etag_cliente=None):
+        pedido = urllib.request.Request(url, headers={"Authorization": autorizacao})
+        if etag_cliente:
+            pedido.add_header("If-None-Match", etag_cliente)
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(pedido) as resposta:
+                resposta.read()
+                status, etag = resposta.status, resposta.headers["ETag"]
+        except HTTPError as erro:   # 304 chega como HTTPError
+            status, etag = erro.code, erro.headers["ETag"]
+        if status != (304 if etag_cliente else 200):
+            raise RuntimeError(f"{url}: status {status} inesperado")
+        return (time.perf_counter() - inicio) * 1000, etag
+
+    datas = base.df["DATA"].dropna()
+    resultados = []
+    with ServidorIndicadores(servico) as servidor:
+        for cenario, (periodo, valores, inspetores) in _cenarios(base).items():
+            # Sem período no cenário: a base inteira (a API assumiria o ano corrente)
+            periodo = periodo or (datas.min(), datas.max())
+            parametros = [(colunas[coluna], valor) for coluna, aceitos in valores.items() for valor in aceitos]
+            parametros += [("inspetor", nome) for nome in inspetores]
+            parametros += [("inicio", f"{periodo[0]:%Y-%m-%d}"), ("fim", f"{periodo[1]:%Y-%m-%d}")]
+            for recurso in ("indicadores", "inspetores", "coordenacoes"):
+                url = f"{servidor.url}/{recurso}?{urlencode(parametros)}"
+                tempos = {"frio": [], "cache": [], "304": []}
+                for _ in range(max(requisicoes // 10, 1)):
+                    servico.cache.limpar()
+                    tempos["frio"].append(requisitar(url)[0])
+                _, etag = requisitar(url)
+                for _ in range(requisicoes):
+                    tempos["cache"].append(requisitar(url)[0])
+                    tempos["304"].append(requisitar(url, etag)[0])
+                for situacao, valores_ms in tempos.items():
+                    resultados.append({
+                        "linhas": linhas,
+                        "cenario": cenario,
+                        "recurso": recurso,
+                        "situacao": situacao,
+                        "n": len(valores_ms),
+                        **{f"p{p}_ms": round(float(np.percentile(valores_ms, p)), 3) for p in (50, 95, 99)},
+                    })
+    return resultados
+
+
+def _ambiente() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+    }
+
+
+def executar(tamanhos=LINHAS_PADRAO, **opcoes) -> dict:
+    resultados = []
+    for linhas in tamanhos:
+        print(f"→ {linhas:,} linhas", flush=True)
+        resultados.append(medir_etapas(linhas, **opcoes))
+    return {"ambiente": _ambiente(), "resultados": resultados}
+
+
+# ======================================================
+# 📈 COMPARAÇÃO ENTRE EXECUÇÕES
+# ======================================================
+def comparar(antes: dict, depois: dict, limite: float = 1.2) -> pd.DataFrame:
+    """Razão depois/antes da mediana de cada etapa; marca regressões acima de ``limite``."""
+    def tabela(execucao):
+        return {
+            (r["linhas"], nome): m
+            for r in execucao["resultados"] for nome, m in r["etapas"].items()
+        }
+
+    a, d = tabela(antes), tabela(depois)
+    linhas = []
+    for chave in sorted(a.keys() & d.keys()):
+        razao = d[chave]["segundos_mediana"] / a[chave]["segundos_mediana"] if a[chave]["segundos_mediana"] else np.nan
+        linhas.append({
+            "LINHAS": chave[0],
+            "ETAPA": chave[1],
+            "ANTES_MS": a[chave]["segundos_mediana"] * 1000,
+            "DEPOIS_MS": d[chave]["segundos_mediana"] * 1000,
+            "RAZAO": razao,
+            "PICO_MB_ANTES": a[chave].get("pico_mb"),
+            "PICO_MB_DEPOIS": d[chave].get("pico_mb"),
+            "REGRESSAO": bool(razao > limite),
+        })
+    return pd.DataFrame(linhas).round(3)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Mede cada etapa do painel sobre planilhas sintéticas.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=LINHAS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--sem-memoria", action="store_true", help="pula a passada com tracemalloc")
+    parser.add_argument("--formatos", nargs="*", default=["xlsx", "csv", "parquet"],
+                        help="formatos de exportação medidos")
+    parser.add_argument("-o", "--saida", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="compara dois arquivos de resultados em vez de medir")
+    parser.add_argument("--limite", type=float, default=1.2, help="razão considerada regressão")
+    parser.add_argument("--sessoes", type=int, nargs="+",
+                        help="mede a memória retida por N sessões simultâneas em vez das etapas")
+    parser.add_argument("--api", type=int, metavar="N",
+                        help="mede a latência da API de indicadores com N requisições por consulta")
+    args = parser.parse_args()
+
+    if args.api:
+        resultado = {
+            "ambiente": _ambiente(),
+            "api": [r for linhas in args.linhas for r in medir_api(linhas, args.api)],
+        }
+        print(pd.DataFrame(resultado["api"]).to_string(index=False))
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        return
+
+    if args.sessoes:
+        resultado = {
+            "ambiente": _ambiente(),
+            "sessoes": [r for linhas in args.linhas for r in medir_sessoes(linhas, args.sessoes)],
+        }
+        print(pd.DataFrame(resultado["sessoes"]).to_string(index=False))
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        return
+
+    if args.comparar:
+        with open(args.comparar[0], encoding="utf-8") as a, open(args.comparar[1], encoding="utf-8") as d:
+            relatorio = comparar(json.load(a), json.load(d), args.limite)
+        print(relatorio.to_string(index=False))
+        return
+
+    resultado = executar(args.linhas, repeticoes=args.repeticoes, memoria=not args.sem_memoria,
+                         formatos=args.formatos)
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    _main()
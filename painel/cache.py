@@ -0,0 +1,142 @@
+"""Cache de agregações compartilhado entre sessões.
+
+As entradas são indexadas por ``(versão dos dados, hash canônico dos
+filtros, nome da agregação)``. Sessões diferentes com os mesmos filtros
+reaproveitam o mesmo resultado, e um rerun que só troca, por exemplo, o mês
+do ranking não recalcula nada. Quando chega uma versão nova dos dados, as
+entradas da versão anterior são descartadas de uma vez.
+
+A remoção é LRU, limitada por número de entradas e por bytes estimados.
+Os valores guardados são compartilhados; ``obter`` entrega visões
+protegidas deles (ver ``somente_leitura``).
+"""
+
+import copy
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def _canonico(valor):
+    if isinstance(valor, (datetime, date, pd.Timestamp)):
+        return pd.Timestamp(valor).isoformat()
+    if isinstance(valor, (list, tuple, set)):
+        return [_canonico(v) for v in valor]
+    return valor
+
+
+def chave_filtros(periodo=None, valores=None, inspetores=None, **extras) -> str:
+    """Hash estável do estado dos filtros (ordem de seleção não importa)."""
+    estado = {
+        "periodo": _canonico(list(periodo)) if periodo else None,
+        "valores": {
+            coluna: sorted(map(str, aceitos))
+            for coluna, aceitos in sorted((valores or {}).items()) if aceitos
+        },
+        "inspetores": sorted(set(map(str, inspetores or []))),
+        **{nome: _canonico(valor) for nome, valor in sorted(extras.items())},
+    }
+    texto = json.dumps(estado, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+
+def somente_leitura(valor):
+    """Visão de ``valor`` que não permite alterar o original compartilhado.
+
+    Arrays viram visões não graváveis; quadros e séries, cópias rasas (com
+    cópia na escrita, alterá-las copia só o que for alterado); dicionários e
+    listas (indicadores, figuras já em dicionário), cópias profundas.
+    """
+    if isinstance(valor, np.ndarray):
+        visao = valor.view()
+        visao.flags.writeable = False
+        return visao
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=False)
+    if isinstance(valor, (dict, list)):
+        return copy.deepcopy(valor)
+    return valor
+
+
+def tamanho_estimado(valor) -> int:
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True, index=True)
+        return int(uso.sum() if isinstance(uso, pd.Series) else uso)
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_estimado(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamanho_estimado(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheAgregacoes:
+    def __init__(self, max_entradas: int = 512, max_bytes: int = 256 * 2**20):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._trava = threading.Lock()
+        self._entradas = OrderedDict()     # chave -> (valor, bytes)
+        self._bytes = 0
+        self._versao = None
+        self._contadores = {"acertos": 0, "falhas": 0, "remocoes": 0, "invalidacoes": 0}
+
+    def obter(self, versao: str, chave: str, nome: str, calcular):
+        """Valor em cache para ``(versao, chave, nome)`` ou ``calcular()``."""
+        completa = (versao, chave, nome)
+        with self._trava:
+            if versao != self._versao:
+                self._invalidar(versao)
+            if completa in self._entradas:
+                self._entradas.move_to_end(completa)
+                self._contadores["acertos"] += 1
+                return somente_leitura(self._entradas[completa][0])
+            self._contadores["falhas"] += 1
+
+        valor = calcular()
+        tamanho = tamanho_estimado(valor)
+
+        with self._trava:
+            if versao != self._versao or tamanho > self.max_bytes:
+                return somente_leitura(valor)
+            if completa not in self._entradas:
+                self._entradas[completa] = (valor, tamanho)
+                self._bytes += tamanho
+                self._remover_excedentes()
+        return somente_leitura(valor)
+
+    def limpar(self):
+        with self._trava:
+            self._invalidar(self._versao)
+
+    def estatisticas(self) -> dict:
+        with self._trava:
+            consultas = self._contadores["acertos"] + self._contadores["falhas"]
+            return {
+                **self._contadores,
+                "taxa_acerto": self._contadores["acertos"] / consultas if consultas else 0.0,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+                "versao": self._versao,
+            }
+
+    # --------------------------------------------------
+    def _invalidar(self, versao):
+        if self._entradas:
+            self._contadores["invalidacoes"] += 1
+        self._entradas.clear()
+        self._bytes = 0
+        self._versao = versao
+
+    def _remover_excedentes(self):
+        while self._entradas and (len(self._entradas) > self.max_entradas
+                                  or self._bytes > self.max_bytes):
+            _, (_, tamanho) = self._entradas.popitem(last=False)
+            self._bytes -= tamanho
+            self._contadores["remocoes"] += 1
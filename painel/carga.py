@@ -0,0 +1,205 @@
+"""Leitura e normalização da planilha do formulário da VISA.
+
+``normalizar`` trabalha por valor distinto: cada coluna de texto é
+fatorada uma vez (códigos por linha + valores únicos), e a limpeza de
+espaços, a conversão de datas e a normalização do status de liberação
+rodam só sobre os valores únicos, que são poucos mesmo em planilhas
+grandes. As datas usam o formato do formulário (``dd/mm/aaaa``); valores
+que não seguem esse formato passam pelo caminho antigo
+(``pd.to_datetime(dayfirst=True)``), apenas eles, e as linhas afetadas são
+informadas em ``relatorio``.
+
+O caminho antigo, linha a linha, continua disponível com ``rapido=False``
+e serve de referência: os dois produzem o mesmo quadro.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from painel.esquema import COLUNAS_CATEGORICAS, compactar, periodos_mensais
+
+# Formato das datas gravadas pelo Google Forms (pt-BR)
+FORMATO_DATA = "%d/%m/%Y"
+
+# pandas >= 2 infere o formato a partir da primeira data não vazia e o
+# aplica à coluna inteira; antes disso cada valor era lido isoladamente
+_INFERE_FORMATO = int(pd.__version__.split(".")[0]) >= 2
+
+
+# ======================================================
+# 🔧 FUNÇÕES AUXILIARES
+# ======================================================
+def extrair_inspetores(texto):
+    if pd.isna(texto):
+        return []
+    return [nome.strip().upper() for nome in str(texto).split(",") if nome.strip()]
+
+
+def coluna_data(df: pd.DataFrame) -> str:
+    """Coluna da data da inspeção (a primeira com "data" no nome, fora o carimbo)."""
+    return [c for c in df.columns if "data" in c.lower() and c != "Carimbo de data/hora"][0]
+
+
+def _eh_texto(serie: pd.Series) -> bool:
+    return serie.dtype == "object" or pd.api.types.is_string_dtype(serie.dtype)
+
+
+def _por_valor(serie: pd.Series, funcao, categorica: bool, vazio=None) -> pd.Series:
+    """Aplica ``funcao`` (operação sobre um ``Index``) uma vez por valor distinto.
+
+    Com ``vazio``, as linhas nulas recebem esse valor (como um ``fillna``).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, unicos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, unicos = pd.factorize(serie)
+    valores = funcao(pd.Index(unicos))
+    if vazio is not None and (codigos < 0).any():
+        valores = valores.append(pd.Index([vazio], dtype=valores.dtype))
+        codigos = np.where(codigos < 0, len(valores) - 1, codigos)
+
+    # Valores distintos podem coincidir depois da transformação
+    novos, categorias = pd.factorize(valores, sort=True)
+    codigos = np.append(novos, -1)[codigos]
+    if categorica:
+        return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias),
+                         index=serie.index, name=serie.name)
+    return pd.Series(categorias.take(codigos, allow_fill=True, fill_value=np.nan),
+                     index=serie.index, name=serie.name)
+
+
+def _formato_inferido(unicos: pd.Index):
+    """Formato que ``pd.to_datetime(dayfirst=True)`` usaria para a coluna."""
+    if not _INFERE_FORMATO:
+        return None
+    from pandas.tseries.api import guess_datetime_format
+
+    for valor in unicos:
+        if valor != "":
+            return guess_datetime_format(valor, dayfirst=True)
+    return None
+
+
+def converter_datas(serie: pd.Series, relatorio: dict | None = None) -> pd.Series:
+    """Datas ``dd/mm/aaaa`` convertidas uma vez por valor distinto.
+
+    Valores fora do formato do formulário (e só eles) seguem o caminho
+    antigo; suas posições vão para ``relatorio["linhas_fallback"]``.
+    """
+    codigos, unicos = pd.factorize(serie)
+    unicos = pd.Index(unicos)
+    datas = pd.to_datetime(unicos, format=FORMATO_DATA, errors="coerce")
+    formato = _formato_inferido(unicos)
+
+    if formato in (FORMATO_DATA, None):
+        falhos = np.flatnonzero(datas.isna() & (unicos != ""))
+        if len(falhos):
+            opcoes = {"format": formato or "mixed"} if _INFERE_FORMATO else {}
+            lentos = pd.to_datetime(unicos[falhos], dayfirst=True, errors="coerce", **opcoes)
+            valores = datas.to_numpy().copy()
+            valores[falhos] = lentos.to_numpy().astype(valores.dtype)
+            datas = pd.DatetimeIndex(valores)
+    else:
+        # A primeira data da planilha já está em outro formato: o caminho
+        # antigo o aplicaria a todas as linhas, então todas vão por ele
+        falhos = np.arange(len(unicos))
+        datas = pd.to_datetime(unicos, dayfirst=True, errors="coerce", format=formato)
+
+    valores = datas.to_numpy()
+    valores = np.append(valores, np.array(["NaT"], dtype=valores.dtype))[codigos]
+
+    if relatorio is not None:
+        relatorio["datas_distintas"] = len(unicos)
+        relatorio["formato_datas"] = formato
+        relatorio["valores_fallback"] = unicos[falhos].tolist()
+        relatorio["linhas_fallback"] = np.flatnonzero(np.isin(codigos, falhos))
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
+
+# ======================================================
+# 📥 LEITURA E NORMALIZAÇÃO
+# ======================================================
+def ler_csv(conteudo: bytes) -> pd.DataFrame:
+    return pd.read_csv(BytesIO(conteudo), dtype=str)
+
+
+def normalizar(df: pd.DataFrame, compacto: bool = True, rapido: bool = True,
+               relatorio: dict | None = None):
+    """Retorna ``(df, col_data)``; ``relatorio`` recebe as linhas que caíram no caminho lento."""
+    if not rapido:
+        return _normalizar_linha_a_linha(df, compacto)
+
+    # Remove carimbo se existir
+    df = df.drop(columns=["Carimbo de data/hora"], errors="ignore")
+
+    # Identifica coluna de data
+    col_data = coluna_data(df)
+
+    colunas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if _eh_texto(serie):
+            categorica = compacto and coluna in COLUNAS_CATEGORICAS and coluna != col_data
+            serie = _por_valor(serie, lambda valores: valores.str.strip(), categorica)
+        colunas[coluna] = serie
+    df = pd.DataFrame(colunas, index=df.index)
+
+    if _eh_texto(df[col_data]):
+        df[col_data] = converter_datas(df[col_data], relatorio)
+    else:
+        df[col_data] = pd.to_datetime(df[col_data], dayfirst=True, errors="coerce")
+        if relatorio is not None:
+            relatorio["linhas_fallback"] = np.empty(0, dtype=np.intp)
+
+    _colunas_derivadas(df, col_data, compacto)
+
+    # Normaliza campo de liberação (uma vez por valor distinto)
+    df["LIBERADO_FLAG"] = _por_valor(
+        df["O ESTABELECIMENTO FOI LIBERADO"], lambda valores: valores.str.upper(), compacto, vazio=""
+    )
+    df["LIBERADO_BIN"] = (df["LIBERADO_FLAG"] == "SIM").to_numpy().astype("int64")
+
+    if compacto:
+        df = compactar(df)
+    return df, col_data
+
+
+def _colunas_derivadas(df: pd.DataFrame, col_data: str, compacto: bool):
+    # Colunas auxiliares de tempo
+    df["DATA"] = df[col_data]
+    df["ANO"] = df["DATA"].dt.year
+    df["MES"] = df["DATA"].dt.month
+    if compacto:
+        df["ANO_MES"], df["MES_ANO_LABEL"] = periodos_mensais(df["DATA"])
+    else:
+        df["ANO_MES"] = df["DATA"].dt.to_period("M").astype(str)
+        df["MES_ANO_LABEL"] = df["DATA"].dt.strftime("%b/%Y")
+
+    # Lista de inspetores (no esquema compacto, a relação linha ↔ inspetor
+    # fica na DimensaoInspetores da base, sem listas por linha)
+    if not compacto:
+        df["INSPETOR_LISTA"] = df["EQUIPE/INSPETOR"].apply(extrair_inspetores)
+
+
+def _normalizar_linha_a_linha(df: pd.DataFrame, compacto: bool):
+    df = df.apply(lambda x: x.str.strip() if _eh_texto(x) else x)
+
+    # Remove carimbo se existir
+    if "Carimbo de data/hora" in df.columns:
+        df = df.drop(columns=["Carimbo de data/hora"])
+
+    # Identifica coluna de data
+    col_data = [c for c in df.columns if "data" in c.lower()][0]
+    df[col_data] = pd.to_datetime(df[col_data], dayfirst=True, errors="coerce")
+
+    _colunas_derivadas(df, col_data, compacto)
+
+    # Normaliza campo de liberação
+    df["LIBERADO_FLAG"] = df["O ESTABELECIMENTO FOI LIBERADO"].str.upper().fillna("")
+    df["LIBERADO_BIN"] = df["LIBERADO_FLAG"].apply(lambda x: 1 if x == "SIM" else 0)
+
+    if compacto:
+        df = compactar(df)
+    return df, col_data
@@ -0,0 +1,88 @@
+"""Cubo de produção pré-agregado, montado uma vez por versão dos dados.
+
+Granularidade: dia × equipe (EQUIPE/INSPETOR) × turno × coordenação ×
+localidade × risco × motivação × status, com a contagem de inspeções e a
+soma de liberados. A equipe entra no lugar do inspetor porque uma inspeção
+pode ter vários inspetores: assim o filtro por inspetor continua exato
+(equipes que contêm algum dos selecionados) e a produção por inspetor é
+obtida expandindo cada célula para os membros da equipe.
+
+ESTABELECIMENTO não faz parte do cubo (cardinalidade alta); quando esse
+filtro está ativo o cubo é montado na hora a partir das linhas selecionadas.
+Os estabelecimentos de cada célula ficam num sketch HyperLogLog (ver
+``painel.distintos``), para contagens aproximadas de distintos.
+"""
+
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from painel.distintos import SketchesDistintos
+
+DIMENSOES_CUBO = [
+    "TURNO",
+    "COORDENAÇÃO",
+    "LOCALIDADE",
+    "CLASSIFICAÇÃO DE RISCO",
+    "MOTIVAÇÃO",
+    "O ESTABELECIMENTO FOI LIBERADO",
+]
+
+
+def montar_cubo(df: pd.DataFrame, com_celulas: bool = False):
+    """Cubo de ``df``; com ``com_celulas``, também a célula (posição no cubo) de cada linha."""
+    chaves = ["DATA", "EQUIPE/INSPETOR"] + [c for c in DIMENSOES_CUBO if c in df.columns]
+    grupos = df.groupby(chaves, observed=True, dropna=False, sort=False)
+    cubo = (
+        grupos.agg(INSPECOES=("LIBERADO_BIN", "size"), LIBERADOS=("LIBERADO_BIN", "sum"))
+        .reset_index()
+    )
+    if com_celulas:
+        return cubo, grupos.ngroup().to_numpy()
+    return cubo
+
+
+class CuboProducao:
+    def __init__(self, df: pd.DataFrame, inspetores):
+        # Células em ordem de data: o período vira uma fatia por busca binária
+        tabela, celulas = montar_cubo(df, com_celulas=True)
+        ordem = np.argsort(tabela["DATA"].to_numpy(), kind="stable")
+        self.tabela = tabela.take(ordem).reset_index(drop=True)
+        posicao = np.empty(len(ordem), dtype=np.int64)
+        posicao[ordem] = np.arange(len(ordem))
+        self._celula_da_linha = posicao[celulas].astype(np.int32)
+        self._estabelecimentos = df["ESTABELECIMENTO"]
+        self.inspetores = inspetores    # DimensaoInspetores da mesma base
+        self.dimensoes = [c for c in DIMENSOES_CUBO if c in self.tabela.columns]
+        self._datas = self.tabela["DATA"].to_numpy()
+        self._equipes = self.tabela["EQUIPE/INSPETOR"].cat.codes.to_numpy()
+
+    def __len__(self):
+        return len(self.tabela)
+
+    @cached_property
+    def distintos(self) -> SketchesDistintos:
+        """Sketches de estabelecimentos por célula, montados no primeiro uso."""
+        return SketchesDistintos(self._celula_da_linha, len(self.tabela), self._estabelecimentos)
+
+    def atende(self, valores) -> bool:
+        """Se os filtros de ``valores`` podem ser resolvidos pelo cubo."""
+        return all(not aceitos or coluna in self.dimensoes
+                   for coluna, aceitos in (valores or {}).items())
+
+    def recortar(self, periodo=None, valores=None, inspetores=None) -> pd.DataFrame:
+        """Células do cubo que atendem aos filtros (mesma semântica do painel)."""
+        a, b = 0, len(self.tabela)
+        if periodo:
+            a = np.searchsorted(self._datas, np.datetime64(pd.Timestamp(periodo[0])), side="left")
+            b = np.searchsorted(self._datas, np.datetime64(pd.Timestamp(periodo[1])), side="right")
+        tabela = self.tabela.iloc[a:b]
+        mascara = np.ones(len(tabela), dtype=bool)
+        for coluna, aceitos in (valores or {}).items():
+            if aceitos:
+                mascara &= tabela[coluna].isin(aceitos).to_numpy()
+        if inspetores:
+            equipes = np.append(self.inspetores.equipes_com(inspetores), False)
+            mascara &= equipes[self._equipes[a:b]]
+        return tabela[mascara]
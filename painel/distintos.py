@@ -0,0 +1,135 @@
+"""Contagem aproximada de estabelecimentos distintos com HyperLogLog.
+
+Estabelecimentos distintos não se somam entre células do cubo, e por isso
+"Estabelecimentos Únicos" e ESTAB_UNICOS (por inspetor e por coordenação)
+saíam de um ``nunique`` sobre as linhas selecionadas. Aqui cada célula do
+cubo (dia × equipe × dimensões) guarda um sketch HyperLogLog esparso dos
+seus estabelecimentos: os pares (registrador, posto) com o maior posto por
+registrador. Qualquer combinação de filtros atendida pelo cubo é uma
+seleção de células, e o sketch dela é o máximo, registrador a registrador,
+dos sketches das células, sem voltar às linhas. Agrupar por inspetor ou
+coordenação é o mesmo máximo, com um conjunto de registradores por grupo.
+
+Erro: com ``2**PRECISAO`` registradores o erro padrão relativo é
+``1,04 / sqrt(2**PRECISAO)``, cerca de 1,6% com a precisão padrão (12);
+em ~95% dos casos a estimativa fica a até ~3,3% do valor exato. Para
+poucos distintos a correção de contagem linear deixa o erro bem menor.
+Seleções pequenas (``LIMITE_EXATO`` linhas ou menos) devem continuar a
+usar a contagem exata, que nelas já é barata.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PRECISAO = 12
+ERRO_PADRAO = 1.04 / math.sqrt(2 ** PRECISAO)
+# Abaixo disso (linhas selecionadas), a contagem exata é usada
+LIMITE_EXATO = 5000
+
+
+def _zeros_a_esquerda(valores: np.ndarray) -> np.ndarray:
+    """Número de bits zero à esquerda de cada ``uint64`` (64 para zero)."""
+    valores = valores.astype(np.uint64)
+    zeros = np.zeros(len(valores), dtype=np.int64)
+    for passo in (32, 16, 8, 4, 2, 1):
+        vazio = (valores >> np.uint64(64 - passo)) == 0
+        zeros += vazio * passo
+        valores = np.where(vazio, valores << np.uint64(passo), valores)
+    return np.where(valores == 0, 64, zeros)
+
+
+def registros_e_postos(valores, precisao: int = PRECISAO):
+    """Registrador (primeiros ``precisao`` bits do hash) e posto de cada valor."""
+    hashes = pd.util.hash_array(np.asarray(valores, dtype=object))
+    registros = (hashes >> np.uint64(64 - precisao)).astype(np.uint16)
+    restante = hashes << np.uint64(precisao)
+    postos = np.minimum(_zeros_a_esquerda(restante) + 1, 64 - precisao + 1).astype(np.uint8)
+    return registros, postos
+
+
+def estimar(registradores: np.ndarray) -> np.ndarray:
+    """Estimativa HyperLogLog (com correção para poucos distintos) de cada linha de registradores."""
+    registradores = np.atleast_2d(registradores)
+    m = registradores.shape[1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    bruta = alfa * m * m / np.sum(np.exp2(-registradores.astype(np.float64)), axis=1)
+    vazios = np.count_nonzero(registradores == 0, axis=1)
+    linear = m * np.log(m / np.maximum(vazios, 1))
+    return np.where((bruta <= 2.5 * m) & (vazios > 0), linear, bruta)
+
+
+class SketchesDistintos:
+    def __init__(self, celula_da_linha: np.ndarray, total_celulas: int, valores: pd.Series,
+                 precisao: int = PRECISAO):
+        """``celula_da_linha``: posição no cubo da célula de cada linha da base."""
+        self.precisao = precisao
+        self.m = 2 ** precisao
+        if not isinstance(valores.dtype, pd.CategoricalDtype):
+            valores = valores.astype("category")
+
+        # Hash de cada valor distinto uma única vez; as linhas usam os códigos
+        registros, postos = registros_e_postos(valores.cat.categories, precisao)
+        codigos = valores.cat.codes.to_numpy()
+        validas = (codigos >= 0) & (celula_da_linha >= 0)
+        celulas = celula_da_linha[validas].astype(np.int64)
+        chave = celulas * self.m + registros[codigos[validas]]
+        posto = postos[codigos[validas]]
+
+        # Maior posto por (célula, registrador): o sketch esparso da célula
+        ordem = np.lexsort((posto, chave))
+        chave, posto = chave[ordem], posto[ordem]
+        ultimo = np.append(chave[1:] != chave[:-1], True) if len(chave) else np.zeros(0, dtype=bool)
+        chave, posto = chave[ultimo], posto[ultimo]
+
+        self.registros = (chave % self.m).astype(np.uint16)
+        self.postos = posto
+        contagem = np.bincount(chave // self.m, minlength=total_celulas)
+        self.inicio = np.concatenate([[0], np.cumsum(contagem)])
+        for array in (self.registros, self.postos, self.inicio):
+            array.flags.writeable = False   # compartilhados entre sessões
+
+    def pares(self, celulas):
+        """``(célula, registrador, posto)`` de cada par das ``celulas`` (ordenadas, sem repetição)."""
+        selecao = self._pares(np.asarray(celulas, dtype=np.int64))
+        celula = np.repeat(np.arange(len(self.inicio) - 1), np.diff(self.inicio))[selecao]
+        return celula, self.registros[selecao], self.postos[selecao]
+
+    def registradores(self, celulas, grupos=None, total_grupos: int = 1) -> np.ndarray:
+        """Registradores ``(total_grupos, m)`` da união das ``celulas`` (ordenadas, sem repetição).
+
+        ``grupos[i]`` é o grupo da célula ``celulas[i]``; sem ``grupos``, um só.
+        """
+        celulas = np.asarray(celulas, dtype=np.int64)
+        celula, registros, postos = self.pares(celulas)
+        destino = registros.astype(np.int64)
+        if grupos is not None:
+            destino += self.por_celula(celulas, grupos)[celula] * self.m
+        registradores = np.zeros(total_grupos * self.m, dtype=np.uint8)
+        np.maximum.at(registradores, destino, postos)
+        return registradores.reshape(total_grupos, self.m)
+
+    def por_celula(self, celulas, valores) -> np.ndarray:
+        """``valores`` (um por célula selecionada) espalhados num array indexado pela posição da célula."""
+        espalhados = np.zeros(len(self.inicio) - 1, dtype=np.int64)
+        espalhados[np.asarray(celulas, dtype=np.int64)] = valores
+        return espalhados
+
+    def _pares(self, celulas: np.ndarray):
+        """Pares das ``celulas`` (ordenadas, sem repetição): fatia se contíguas, senão máscara."""
+        if len(celulas) == 0:
+            return slice(0, 0)
+        if celulas[-1] - celulas[0] + 1 == len(celulas):
+            return slice(int(self.inicio[celulas[0]]), int(self.inicio[celulas[-1] + 1]))
+        selecionadas = np.zeros(len(self.inicio) - 1, dtype=bool)
+        selecionadas[celulas] = True
+        return np.repeat(selecionadas, np.diff(self.inicio))
+
+    def contar(self, celulas) -> int:
+        """Estimativa de distintos nas ``celulas`` do cubo."""
+        return int(round(estimar(self.registradores(celulas))[0]))
+
+    def contar_por_grupo(self, celulas, grupos, total_grupos: int) -> np.ndarray:
+        """Estimativa por grupo (ver ``registradores``)."""
+        return np.rint(estimar(self.registradores(celulas, grupos, total_grupos))).astype(np.int64)
@@ -0,0 +1,166 @@
+"""Esquema compacto em memória da tabela de inspeções.
+
+- colunas de baixa cardinalidade viram categóricas (dicionário + códigos
+  inteiros) em vez de uma string Python por linha;
+- ANO_MES e MES_ANO_LABEL são categóricas ordenadas sobre o intervalo
+  contínuo de meses: o código de cada linha é o deslocamento (em meses)
+  a partir do primeiro mês, e os rótulos existem uma única vez;
+- flags e partes de data usam inteiros de 8/16 bits.
+
+O resultado se comporta como o quadro original em filtros (``isin``),
+ordenações e exportação; agrupamentos devem usar ``observed=True``.
+
+Relatório de memória (reamostrando uma exportação da planilha)::
+
+    python -m painel.esquema planilha.csv --linhas 100000 1000000
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_CATEGORICAS = [
+    "TURNO",
+    "LOCALIDADE",
+    "COORDENAÇÃO",
+    "CLASSIFICAÇÃO DE RISCO",
+    "MOTIVAÇÃO",
+    "O ESTABELECIMENTO FOI LIBERADO",
+    "ESTABELECIMENTO",
+    "NÚMERO DA VISITA",
+    "EQUIPE/INSPETOR",
+    "LIBERADO_FLAG",
+]
+
+COLUNAS_MES = ["ANO_MES", "MES_ANO_LABEL"]
+
+
+# ======================================================
+# 📆 PERÍODOS MENSAIS
+# ======================================================
+def _meses(inicio: pd.Period, fim: pd.Period):
+    periodos = pd.period_range(inicio, fim, freq="M")
+    return periodos.strftime("%Y-%m"), periodos.strftime("%b/%Y")
+
+
+def periodos_mensais(datas: pd.Series):
+    """Retorna as séries categóricas ``(ANO_MES, MES_ANO_LABEL)`` de ``datas``."""
+    validas = datas.dropna()
+    if validas.empty:
+        vazia = pd.Categorical([None] * len(datas), categories=[], ordered=True)
+        return (pd.Series(vazia, index=datas.index),
+                pd.Series(vazia.copy(), index=datas.index))
+
+    inicio = validas.min().to_period("M")
+    fim = validas.max().to_period("M")
+    anos_meses, rotulos = _meses(inicio, fim)
+
+    codigos = (datas.dt.year - inicio.year) * 12 + (datas.dt.month - inicio.month)
+    codigos = codigos.fillna(-1).to_numpy(dtype=np.int32)
+
+    ano_mes = pd.Categorical.from_codes(codigos, categories=anos_meses, ordered=True)
+    rotulo = pd.Categorical.from_codes(codigos, categories=rotulos, ordered=True)
+    return pd.Series(ano_mes, index=datas.index), pd.Series(rotulo, index=datas.index)
+
+
+# ======================================================
+# 🗜️ COMPACTAÇÃO
+# ======================================================
+def _inteiro(serie: pd.Series, tipo: str) -> pd.Series:
+    if serie.isna().any():
+        return serie.astype(tipo.capitalize())   # Int16/Int8 anuláveis
+    return serie.astype(tipo)
+
+
+def compactar(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy(deep=False)
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("category")
+
+    if "ANO" in df.columns:
+        df["ANO"] = _inteiro(df["ANO"], "int16")
+    if "MES" in df.columns:
+        df["MES"] = _inteiro(df["MES"], "int8")
+    if "LIBERADO_BIN" in df.columns:
+        df["LIBERADO_BIN"] = df["LIBERADO_BIN"].astype("int8")
+    return df
+
+
+def concatenar(base: pd.DataFrame, *novos: pd.DataFrame) -> pd.DataFrame:
+    """Anexa ``novos`` (já compactados) a ``base`` mantendo as categóricas."""
+    partes = [parte.copy(deep=False) for parte in (base, *novos)]
+    base = partes[0]
+    for coluna in base.columns:
+        if coluna in COLUNAS_MES or not all(coluna in parte for parte in partes):
+            continue
+        if not isinstance(base[coluna].dtype, pd.CategoricalDtype):
+            continue
+        # Valores novos entram no fim do dicionário; os existentes não mudam
+        categorias = base[coluna].cat.categories
+        for parte in partes[1:]:
+            if not parte[coluna].cat.categories.equals(categorias):
+                categorias = categorias.union(parte[coluna].cat.categories, sort=False)
+        for parte in partes:
+            if not parte[coluna].cat.categories.equals(categorias):
+                parte[coluna] = parte[coluna].cat.set_categories(categorias)
+
+    if all(coluna in parte for coluna in COLUNAS_MES for parte in partes):
+        limites = [
+            parte["ANO_MES"].cat.categories[[0, -1]]
+            for parte in partes if len(parte["ANO_MES"].cat.categories)
+        ]
+        if limites:
+            inicio = min(pd.Period(par[0], freq="M") for par in limites)
+            fim = max(pd.Period(par[1], freq="M") for par in limites)
+            anos_meses, rotulos = _meses(inicio, fim)
+            for parte in partes:
+                if not parte["ANO_MES"].cat.categories.equals(anos_meses):
+                    parte["ANO_MES"] = parte["ANO_MES"].cat.set_categories(anos_meses)
+                    parte["MES_ANO_LABEL"] = parte["MES_ANO_LABEL"].cat.set_categories(rotulos)
+
+    return pd.concat(partes, ignore_index=True)
+
+
+# ======================================================
+# 📏 RELATÓRIO DE MEMÓRIA
+# ======================================================
+def relatorio_memoria(original: pd.DataFrame, compacto: pd.DataFrame) -> pd.DataFrame:
+    """Bytes por coluna (``deep=True``) antes e depois da compactação."""
+    antes = original.memory_usage(deep=True, index=False)
+    depois = compacto.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        "TIPO_ORIGINAL": original.dtypes.astype(str),
+        "TIPO_COMPACTO": compacto.dtypes.reindex(original.columns).astype(str),
+        "MB_ORIGINAL": antes / 2**20,
+        "MB_COMPACTO": depois.reindex(original.columns) / 2**20,
+    })
+    relatorio.loc["TOTAL"] = ["", "", relatorio["MB_ORIGINAL"].sum(), relatorio["MB_COMPACTO"].sum()]
+    relatorio["ECONOMIA_%"] = (1 - relatorio["MB_COMPACTO"] / relatorio["MB_ORIGINAL"]) * 100
+    return relatorio.round(2)
+
+
+def _main():
+    from painel.carga import ler_csv, normalizar
+
+    parser = argparse.ArgumentParser(description="Compara a memória do quadro normalizado "
+                                                 "com e sem o esquema compacto.")
+    parser.add_argument("csv", help="exportação CSV da planilha")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[100_000, 1_000_000],
+                        help="tamanhos a simular (reamostragem com reposição)")
+    args = parser.parse_args()
+
+    with open(args.csv, "rb") as arquivo:
+        bruto = ler_csv(arquivo.read())
+
+    for linhas in args.linhas:
+        amostra = bruto.sample(n=linhas, replace=True, random_state=0).reset_index(drop=True)
+        original, _ = normalizar(amostra, compacto=False)
+        compacto, _ = normalizar(amostra)
+        print(f"\n=== {linhas:,} linhas ===")
+        print(relatorio_memoria(original, compacto).to_string())
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,133 @@
+"""Dimensão de estabelecimentos e índice de busca por prefixo.
+
+Montada uma vez por base. A tabela tem uma linha por estabelecimento
+(na ordem das categorias de ESTABELECIMENTO): número de inspeções,
+primeira e última inspeção, o NÚMERO DA VISITA e os atributos
+(localidade, coordenação, risco) da inspeção mais recente.
+
+O índice de busca guarda, para cada palavra do nome, o trecho do nome que
+começa nela, na forma canônica (sem acento, caixa ou espaços extras; ver
+``chave_nome``), em um array ordenado. Achar os nomes com alguma palavra
+começando pelo texto digitado é então uma busca binária, sem varrer a
+lista de nomes a cada tecla.
+"""
+
+import numpy as np
+import pandas as pd
+
+from painel.inspetores import chave_nome
+
+ATRIBUTOS = ["LOCALIDADE", "COORDENAÇÃO", "CLASSIFICAÇÃO DE RISCO"]
+LIMITE_BUSCA = 100
+
+
+def _valores(serie: pd.Series, posicoes: np.ndarray) -> np.ndarray:
+    """Valores (objeto, None para nulos) de ``serie`` nas ``posicoes``."""
+    valores = serie.to_numpy(dtype=object)[posicoes]
+    return np.where(pd.isna(valores), None, valores)
+
+
+class DimensaoEstabelecimentos:
+    def __init__(self, df: pd.DataFrame, col_data: str, dimensao):
+        """``dimensao``: a dimensão ESTABELECIMENTO do ``IndiceFiltros`` da base."""
+        self.dimensao = dimensao
+        self.df = df
+        self.col_data = col_data
+        self.nomes = np.array(list(dimensao.posicao), dtype=object)
+        codigos = dimensao.codigos
+        total = len(self.nomes)
+
+        # Última linha de cada estabelecimento: ordem por (código, data), NaT primeiro
+        datas = df[col_data].to_numpy()
+        validas = np.flatnonzero(codigos >= 0)
+        ordem = validas[np.lexsort((datas[validas].view("int64"), codigos[validas]))]
+        visitas = np.bincount(codigos[validas], minlength=total)
+        fim = np.cumsum(visitas)
+        presentes = visitas > 0
+        ultima = ordem[fim[presentes] - 1]
+        primeira_valida = pd.Series(datas[validas]).groupby(codigos[validas]).min()
+
+        tabela = pd.DataFrame({
+            "ESTABELECIMENTO": self.nomes[presentes],
+            "VISITAS": visitas[presentes],
+            "PRIMEIRA_INSPECAO": primeira_valida.reindex(np.flatnonzero(presentes)).to_numpy(),
+            "ULTIMA_INSPECAO": datas[ultima],
+        }, index=pd.Index(np.flatnonzero(presentes), name="CODIGO"))
+        for coluna in ["NÚMERO DA VISITA"] + ATRIBUTOS:
+            if coluna in df.columns:
+                tabela[coluna] = _valores(df[coluna], ultima)
+        self.tabela = tabela
+
+        # Nomes em ordem alfabética (ordem de exibição)
+        self.opcoes = sorted(self.nomes[presentes].tolist())
+        self._ordem_exibicao = np.empty(total, dtype=np.int64)
+        self._ordem_exibicao[[dimensao.posicao[n] for n in self.opcoes]] = np.arange(len(self.opcoes))
+
+        # Índice de busca: um termo por palavra de cada nome
+        termos, donos = [], []
+        for codigo in np.flatnonzero(presentes):
+            chave = chave_nome(self.nomes[codigo])
+            inicio = 0
+            for palavra in chave.split(" "):
+                termos.append(chave[inicio:])
+                donos.append(codigo)
+                inicio += len(palavra) + 1
+        ordem_termos = np.argsort(np.array(termos, dtype=object), kind="stable")
+        self._termos = np.array(termos, dtype=object)[ordem_termos]
+        self._donos = np.array(donos, dtype=np.int64)[ordem_termos]
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def buscar(self, texto: str, limite: int = LIMITE_BUSCA) -> list:
+        """Até ``limite`` nomes (em ordem alfabética) com uma palavra começando por ``texto``."""
+        chave = chave_nome(texto)
+        if not chave:
+            return self.opcoes[:limite]
+        a = np.searchsorted(self._termos, chave, side="left")
+        b = np.searchsorted(self._termos, chave + "\uffff", side="right")
+        codigos = np.unique(self._donos[a:b])
+        posicoes = np.sort(self._ordem_exibicao[codigos])[:limite]
+        return [self.opcoes[p] for p in posicoes]
+
+    def linhas(self, nome: str, linhas=None) -> np.ndarray:
+        """Linhas do estabelecimento, opcionalmente restritas às ``linhas`` selecionadas."""
+        codigo = self.dimensao.posicao.get(nome)
+        if codigo is None:
+            return np.empty(0, dtype=np.int32)
+        proprias = self.dimensao.postings.uniao([codigo])
+        if linhas is None or len(linhas) == len(self.dimensao.codigos):
+            return proprias
+        if len(linhas) == 0:
+            return linhas
+        # ``linhas`` é ordenada: busca binária em vez de varrer a seleção
+        posicoes = np.minimum(np.searchsorted(linhas, proprias), len(linhas) - 1)
+        return proprias[linhas[posicoes] == proprias]
+
+    def historico(self, nome: str, linhas=None) -> pd.DataFrame:
+        """Inspeções do estabelecimento (base inteira ou só entre ``linhas``), da mais recente para a mais antiga."""
+        colunas = [c for c in [self.col_data, "NÚMERO DA VISITA", "MOTIVAÇÃO",
+                               "O ESTABELECIMENTO FOI LIBERADO", "EQUIPE/INSPETOR"] if c in self.df.columns]
+        historico = self.df[colunas].take(self.linhas(nome, linhas))
+        return historico.sort_values(self.col_data, ascending=False, kind="stable")
+
+    def resumo(self, nome: str, linhas=None) -> dict:
+        """Atributos do estabelecimento nas ``linhas`` selecionadas e seu histórico.
+
+        Os atributos são os valores distintos entre as inspeções selecionadas
+        (como no resumo da barra lateral); visitas e última inspeção são da
+        base inteira.
+        """
+        selecionadas = self.linhas(nome, linhas)
+        resumo = {
+            coluna: self.df[coluna].take(selecionadas).dropna().unique().tolist()
+            for coluna in ATRIBUTOS if coluna in self.df.columns
+        }
+        resumo["inspecoes_selecionadas"] = len(selecionadas)
+        codigo = self.dimensao.posicao.get(nome)
+        if codigo in self.tabela.index:
+            linha = self.tabela.loc[codigo]
+            resumo["visitas"] = int(linha["VISITAS"])
+            resumo["ultima_inspecao"] = linha["ULTIMA_INSPECAO"]
+            resumo["ultima_visita"] = linha.get("NÚMERO DA VISITA")
+        return resumo
@@ -0,0 +1,396 @@
+"""Teste de carga: várias sessões simultâneas num servidor ``streamlit run``.
+
+Sobe o ``visa.py`` num processo ``streamlit run`` de verdade e abre N
+clientes websocket simultâneos (``/_stcore/stream``, o mesmo protocolo do
+navegador: ``BackMsg`` de rerun com os estados dos widgets, ``ForwardMsg``
+de volta até o ``script_finished``). Cada cliente segue uma sequência
+realista de ações: login (admin ou inspetor de ``USUARIOS_INSPETORES``),
+troca do período, marcar/desmarcar filtros, trocar o mês do ranking
+(admin, reexecução só do fragmento) e gerar a exportação. A planilha é
+servida por um ``PlanilhaLocal`` com dados sintéticos, sem acessar a rede.
+
+O servidor executa os reruns das sessões em paralelo, como em produção:
+a base e os caches (``st.cache_resource``) são compartilhados e as sessões
+disputam o GIL e os núcleos do processo. Para cada número de sessões o
+relatório traz a resposta vista pelo cliente (do envio do rerun ao fim da
+execução, p50/p95/p99), a vazão (reruns/s) e a memória residente do
+processo do servidor (inicial, pico e por sessão). Os clientes são threads
+deste processo e só decodificam mensagens; o custo fica no servidor.
+
+    python -m painel.estresse --linhas 100000 --sessoes 1 5 10 20
+    python -m painel.estresse --sessoes 10 --rodadas 5 --admins 0.5 -o carga.json
+
+Requer o Streamlit e o ``websockets`` (dependência das versões recentes do
+Streamlit; nas antigas, instale à parte).
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from painel.planilha_local import PlanilhaLocal
+from painel.sintetico import gerar_csv
+from painel.telemetria import memoria_residente_mb
+from painel.usuarios import SENHA_ADMIN, USUARIO_ADMIN, USUARIOS_INSPETORES
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "visa.py")
+ADMIN = (USUARIO_ADMIN, SENHA_ADMIN)
+VISAO_RANKING = "🕵️‍♂️ Painel dos Inspetores"
+VISAO_DOWNLOAD = "📥 Download"
+PERCENTIS = (50, 95, 99)
+
+
+# ======================================================
+# 🖥️ SERVIDOR
+# ======================================================
+class Servidor:
+    """``streamlit run`` do painel num subprocesso, numa porta livre (gerenciador de contexto)."""
+
+    def __init__(self, app: str = APP, ambiente: dict | None = None, timeout: float = 60):
+        self.app = app
+        self.ambiente = {**os.environ, **(ambiente or {})}
+        self.timeout = timeout
+        self.processo = None
+        self.url = None
+
+    @property
+    def pid(self) -> int:
+        return self.processo.pid
+
+    def __enter__(self):
+        with socket.socket() as livre:
+            livre.bind(("127.0.0.1", 0))
+            porta = livre.getsockname()[1]
+        self._log = tempfile.TemporaryFile()
+        self.processo = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", self.app,
+             "--server.headless", "true", "--server.address", "127.0.0.1",
+             "--server.port", str(porta), "--server.fileWatcherType", "none",
+             "--browser.gatherUsageStats", "false", "--logger.level", "error"],
+            env=self.ambiente, stdout=subprocess.DEVNULL, stderr=self._log,
+        )
+        self.url = f"http://127.0.0.1:{porta}"
+        limite = time.monotonic() + self.timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1):
+                    return self
+            except OSError:
+                if self.processo.poll() is not None or time.monotonic() > limite:
+                    self.__exit__(None, None, None)
+                    raise RuntimeError(f"o servidor do painel não subiu: {self._saida()}")
+                time.sleep(0.1)
+
+    def __exit__(self, *exc):
+        if self.processo.poll() is None:
+            self.processo.terminate()
+            try:
+                self.processo.wait(10)
+            except subprocess.TimeoutExpired:
+                self.processo.kill()
+                self.processo.wait()
+        self._log.close()
+
+    def _saida(self) -> str:
+        self._log.seek(0)
+        return self._log.read()[-2000:].decode(errors="replace")
+
+
+# ======================================================
+# 👤 SESSÃO (CLIENTE WEBSOCKET)
+# ======================================================
+def _estado(widget: dict, **valor):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    estado = WidgetState(id=widget["proto"].id)
+    for campo, conteudo in valor.items():
+        if campo == "string_array_value":
+            estado.string_array_value.data[:] = conteudo
+        else:
+            setattr(estado, campo, conteudo)
+    return estado
+
+
+class Sessao:
+    """Uma aba do navegador: envia reruns pelo websocket e guarda os widgets da última execução."""
+
+    def __init__(self, conexao, usuario: str, senha: str, semente: int = 0, timeout: float = 300):
+        self.conexao = conexao
+        self.usuario, self.senha = usuario, senha
+        self.admin = usuario == ADMIN[0]
+        self.aleatorio = random.Random(semente)
+        self.timeout = timeout
+        self.amostras = []
+        self.erros = []
+        self.widgets = []      # da última execução completa
+        self.estados = {}      # id -> WidgetState, como o navegador guarda entre reruns
+
+    def _rodar(self, acao: str, valores=(), gatilhos=(), fragmento: str = ""):
+        """Envia um rerun e espera o fim da execução (pulando as encerradas por ``st.rerun``)."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        for estado in valores:
+            self.estados[estado.id] = estado
+        pedido = BackMsg()
+        pedido.rerun_script.query_string = ""
+        pedido.rerun_script.widget_states.widgets.extend([*self.estados.values(), *gatilhos])
+        pedido.rerun_script.fragment_id = fragmento
+
+        inicio = time.perf_counter()
+        self.conexao.send(pedido.SerializeToString())
+        mensagens = []
+        while True:
+            mensagem = ForwardMsg()
+            mensagem.ParseFromString(self.conexao.recv(timeout=self.timeout))
+            mensagens.append(mensagem)
+            if (mensagem.WhichOneof("type") == "script_finished"
+                    and mensagem.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN):
+                break
+        self.amostras.append({"acao": acao, "resposta_ms": (time.perf_counter() - inicio) * 1000})
+
+        elementos = [
+            {"tipo": m.delta.new_element.WhichOneof("type"),
+             "proto": getattr(m.delta.new_element, m.delta.new_element.WhichOneof("type")),
+             "fragmento": m.delta.fragment_id,
+             "lateral": m.metadata.delta_path[:1] == [1]}
+            for m in mensagens if m.HasField("delta") and m.delta.HasField("new_element")
+        ]
+        self.erros += [f"{acao}: {e['proto'].message}" for e in elementos
+                       if e["tipo"] == "exception" and not e["proto"].is_warning]
+        if not fragmento:
+            self.widgets = elementos
+            # Widgets que sumiram da página saem do estado, como no navegador
+            ids = {e["proto"].id for e in elementos if hasattr(e["proto"], "id")}
+            self.estados = {i: estado for i, estado in self.estados.items() if i in ids}
+
+    def _procurar(self, tipo: str, rotulo: str = "", lateral: bool | None = None) -> list:
+        return [w for w in self.widgets
+                if w["tipo"] == tipo and w["proto"].label.startswith(rotulo)
+                and (lateral is None or w["lateral"] == lateral)]
+
+    def _selecionado(self, widget: dict):
+        """Valor atual de um radio/selectbox (rótulo) ou multiselect (lista de rótulos)."""
+        proto, estado = widget["proto"], self.estados.get(widget["proto"].id)
+        if widget["tipo"] == "multiselect":
+            return list(estado.string_array_value.data) if estado else [proto.options[i] for i in proto.default]
+        if estado:
+            return estado.string_value
+        return proto.options[proto.default] if proto.HasField("default") else None
+
+    def _visao(self, nome: str) -> bool:
+        """Seleciona a visão (sem efeito no layout em abas, em que todas são montadas)."""
+        radios = self._procurar("radio", "Visão")
+        if not radios:
+            return True
+        if nome not in radios[0]["proto"].options:
+            return False
+        if self._selecionado(radios[0]) != nome:
+            self._rodar("visao", [_estado(radios[0], string_value=nome)])
+        return True
+
+    # --------------------------------------------------
+    def login(self):
+        self._rodar("abertura")
+        usuario, senha = self._procurar("text_input")[:2]
+        entrar = [b for b in self._procurar("button") if b["proto"].is_form_submitter][0]
+        self._rodar("login", [_estado(usuario, string_value=self.usuario), _estado(senha, string_value=self.senha)],
+                    [_estado(entrar, trigger_value=True)])
+        if not self._procurar("date_input", lateral=True):
+            raise RuntimeError(f"login recusado para {self.usuario}")
+
+    def periodo(self):
+        campo = self._procurar("date_input", lateral=True)[0]
+        inicio, fim = pd.Timestamp(campo["proto"].min), pd.Timestamp(campo["proto"].max)
+        dias = max((fim - inicio).days, 1)
+        a = self.aleatorio.randint(0, dias)
+        b = self.aleatorio.randint(a, min(dias, a + 365))
+        datas = [(inicio + pd.Timedelta(days=d)).date().isoformat() for d in (a, b)]
+        self._rodar("periodo", [_estado(campo, string_array_value=datas)])
+
+    def filtros(self):
+        campos = [m for m in self._procurar("multiselect", lateral=True) if m["proto"].options]
+        campo = self.aleatorio.choice(campos)
+        opcao = self.aleatorio.choice(list(campo["proto"].options))
+        marcadas = self._selecionado(campo)
+        marcadas = [m for m in marcadas if m != opcao] if opcao in marcadas else marcadas + [opcao]
+        self._rodar("filtros", [_estado(campo, string_array_value=marcadas)])
+
+    def limpar_filtros(self):
+        self._rodar("limpar_filtros", [_estado(campo, string_array_value=[])
+                                       for campo in self._procurar("multiselect", lateral=True)])
+
+    def ranking(self):
+        if not self.admin or not self._visao(VISAO_RANKING):
+            return
+        meses = self._procurar("selectbox", "Selecione o Mês/Ano")
+        if meses and meses[0]["proto"].options:
+            rotulo = self.aleatorio.choice(list(meses[0]["proto"].options))
+            self._rodar("ranking", [_estado(meses[0], string_value=rotulo)],
+                        fragmento=meses[0]["fragmento"])
+
+    def exportar(self):
+        if not self._visao(VISAO_DOWNLOAD):
+            return
+        botoes = self._procurar("button", "⚙️ Gerar arquivo")
+        if botoes:
+            self._rodar("exportar", gatilhos=[_estado(botoes[0], trigger_value=True)],
+                        fragmento=botoes[0]["fragmento"])
+
+
+ROTEIRO = ["periodo", "filtros", "filtros", "ranking", "periodo", "exportar", "limpar_filtros"]
+
+
+def _executar_sessao(url, usuario, senha, semente, rodadas, pausa) -> dict:
+    from websockets.sync.client import connect
+
+    sessao = None
+    try:
+        with connect(url.replace("http", "ws", 1) + "/_stcore/stream",
+                     subprotocols=["streamlit"], max_size=None) as conexao:
+            sessao = Sessao(conexao, usuario, senha, semente)
+            sessao.login()
+            for _ in range(rodadas):
+                for acao in ROTEIRO:
+                    # Tempo de "leitura" do usuário entre uma ação e outra
+                    time.sleep(sessao.aleatorio.expovariate(1 / pausa) if pausa > 0 else 0)
+                    getattr(sessao, acao)()
+    except Exception as erro:   # a sessão falha, o teste continua
+        if sessao is None:
+            return {"usuario": usuario, "amostras": [], "erros": [repr(erro)]}
+        sessao.erros.append(repr(erro))
+    return {"usuario": usuario, "amostras": sessao.amostras, "erros": sessao.erros}
+
+
+def _credenciais(n: int, admins: float) -> list:
+    """``n`` pares (usuário, senha): a fração ``admins`` de administradores, o resto inspetores."""
+    total_admins = int(round(n * admins))
+    inspetores = [(u["username"], u["senha"]) for u in USUARIOS_INSPETORES]
+    return [ADMIN if i < total_admins else inspetores[i % len(inspetores)] for i in range(n)]
+
+
+# ======================================================
+# 📈 NÍVEIS DE CARGA (SESSÕES SIMULTÂNEAS)
+# ======================================================
+def _percentis(valores, prefixo: str) -> dict:
+    if not len(valores):
+        return {f"{prefixo}_p{p}_ms": None for p in PERCENTIS}
+    return {f"{prefixo}_p{p}_ms": float(np.percentile(valores, p)) for p in PERCENTIS}
+
+
+def medir_nivel(servidor: Servidor, sessoes: int, rodadas: int = 3, pausa: float = 0.2,
+                admins: float = 0.25, semente: int = 0) -> dict:
+    """Roda ``sessoes`` clientes simultâneos no ``servidor`` e resume latência, vazão e memória."""
+    rss_inicial = memoria_residente_mb(servidor.pid)
+    pico = [rss_inicial]
+    ativo = threading.Event()
+
+    def amostrar_memoria():
+        while not ativo.wait(0.05):
+            pico[0] = max(pico[0], memoria_residente_mb(servidor.pid) or 0)
+
+    monitor = threading.Thread(target=amostrar_memoria, daemon=True)
+    monitor.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(sessoes) as executor:
+        resultados = list(executor.map(
+            lambda args: _executar_sessao(*args),
+            [(servidor.url, usuario, senha, semente + i, rodadas, pausa)
+             for i, (usuario, senha) in enumerate(_credenciais(sessoes, admins))],
+        ))
+    segundos = time.perf_counter() - inicio
+    rss_final = memoria_residente_mb(servidor.pid)
+    ativo.set()
+    monitor.join()
+
+    amostras = pd.DataFrame([a for r in resultados for a in r["amostras"]], columns=["acao", "resposta_ms"])
+    # Abertura e login não são reruns de uso: ficam fora dos percentis
+    uso = amostras[~amostras["acao"].isin(["abertura", "login"])]
+    por_acao = {acao: {"n": len(grupo), **_percentis(grupo["resposta_ms"], "resposta")}
+                for acao, grupo in amostras.groupby("acao", sort=True)}
+    return {
+        "sessoes": sessoes,
+        "reruns": len(amostras),
+        "segundos": segundos,
+        "reruns_por_segundo": len(amostras) / segundos if segundos else None,
+        **_percentis(uso["resposta_ms"], "resposta"),
+        "resposta_max_ms": float(uso["resposta_ms"].max()) if len(uso) else None,
+        "rss_inicial_mb": round(rss_inicial, 1) if rss_inicial else None,
+        "rss_pico_mb": round(pico[0], 1) if pico[0] else None,
+        "rss_final_mb": round(rss_final, 1) if rss_final else None,
+        "mb_por_sessao": round((pico[0] - rss_inicial) / sessoes, 2) if rss_inicial else None,
+        "erros": [e for r in resultados for e in r["erros"]],
+        "por_acao": por_acao,
+    }
+
+
+def executar(linhas: int = 50_000, niveis=(1, 5, 10), app: str = APP, **opcoes) -> dict:
+    """Sobe a planilha sintética e o servidor, aquece a base com uma sessão e mede cada nível."""
+    with PlanilhaLocal(gerar_csv(linhas, opcoes.get("semente", 0))) as planilha, \
+            tempfile.TemporaryDirectory() as pasta, \
+            Servidor(app, {"VISA_URL_DADOS": planilha.url,
+                           "VISA_SNAPSHOT": os.path.join(pasta, "particoes")}) as servidor:
+        # Aquecimento: a primeira sessão paga a carga da base (compartilhada)
+        inicio = time.perf_counter()
+        aquecimento = _executar_sessao(servidor.url, *ADMIN, 0, 0, 0)
+        if aquecimento["erros"]:
+            raise RuntimeError(f"o painel falhou no aquecimento: {aquecimento['erros'][:3]}")
+        carga = time.perf_counter() - inicio
+
+        niveis_medidos = []
+        for sessoes in niveis:
+            print(f"→ {sessoes} sessão(ões) simultânea(s)", flush=True)
+            niveis_medidos.append(medir_nivel(servidor, sessoes, **opcoes))
+    return {"linhas": linhas, "aquecimento_s": carga, "niveis": niveis_medidos}
+
+
+def resumo(resultado: dict) -> pd.DataFrame:
+    colunas = ["sessoes", "reruns", "reruns_por_segundo", "resposta_p50_ms",
+               "resposta_p95_ms", "resposta_p99_ms", "resposta_max_ms",
+               "rss_pico_mb", "mb_por_sessao"]
+    tabela = pd.DataFrame(resultado["niveis"])[colunas]
+    tabela["erros"] = [len(n["erros"]) for n in resultado["niveis"]]
+    return tabela.round(1)
+
+
+def _main():
+    parser = argparse.ArgumentParser(
+        description="Mede a latência dos reruns com várias sessões simultâneas num servidor streamlit run."
+    )
+    parser.add_argument("--linhas", type=int, default=50_000, help="linhas da planilha sintética")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[1, 5, 10],
+                        help="números de sessões simultâneas medidos")
+    parser.add_argument("--rodadas", type=int, default=3, help="repetições do roteiro por sessão")
+    parser.add_argument("--pausa", type=float, default=0.2,
+                        help="pausa média (s) do usuário entre ações")
+    parser.add_argument("--admins", type=float, default=0.25, help="fração de sessões de admin")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--app", default=APP, help="script do painel")
+    parser.add_argument("-o", "--saida", help="arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    resultado = executar(args.linhas, args.sessoes, app=args.app, rodadas=args.rodadas,
+                         pausa=args.pausa, admins=args.admins, semente=args.semente)
+    print(resumo(resultado).to_string(index=False))
+    for nivel in resultado["niveis"]:
+        for erro in nivel["erros"][:5]:
+            print(f"[{nivel['sessoes']} sessões] {erro}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,129 @@
+"""Exportação dos dados filtrados em blocos (Excel, CSV e Parquet).
+
+Os arquivos são gravados direto em disco, bloco a bloco, para que o pico
+de memória não cresça com o tamanho da seleção: o Excel usa o modo
+``constant_memory`` do xlsxwriter (cada linha é descarregada assim que a
+próxima começa), o CSV é escrito em fatias e o Parquet em row groups.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+TAMANHO_BLOCO = 50_000
+
+# Windows: arquivo apagado pelo sistema ao ser fechado (não há unlink com ele aberto)
+_APAGAR_AO_FECHAR = getattr(os, "O_TEMPORARY", 0)
+_BINARIO = getattr(os, "O_BINARY", 0)
+
+# formato -> (rótulo, extensão, MIME)
+FORMATOS = {
+    "xlsx": ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("CSV", "csv", "text/csv"),
+    "parquet": ("Parquet", "parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _blocos(df: pd.DataFrame, tamanho: int):
+    for inicio in range(0, len(df), tamanho):
+        yield inicio, df.iloc[inicio:inicio + tamanho]
+
+
+def _valores_excel(serie: pd.Series) -> np.ndarray:
+    """Valores de uma coluna como objetos Python, com ``None`` nos vazios."""
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        valores = np.array(serie.dt.to_pydatetime(), dtype=object)
+    else:
+        valores = serie.astype(object).to_numpy(copy=True)
+    valores[pd.isna(serie).to_numpy()] = None
+    return valores
+
+
+# ======================================================
+# 📄 FORMATOS
+# ======================================================
+def _escrever_aba(livro, aba: str, df: pd.DataFrame, tamanho: int):
+    planilha = livro.add_worksheet(aba)
+    # Mesmo cabeçalho do ``DataFrame.to_excel``
+    cabecalho = livro.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    for coluna, nome in enumerate(df.columns):
+        planilha.write(0, coluna, str(nome), cabecalho)
+
+    for inicio, bloco in _blocos(df, tamanho):
+        colunas = [_valores_excel(bloco[c]) for c in bloco.columns]
+        for deslocamento, linha in enumerate(zip(*colunas)):
+            planilha.write_row(inicio + deslocamento + 1, 0, linha)
+
+
+def _gravar_abas(abas: dict, caminho: str, tamanho: int):
+    import xlsxwriter
+
+    livro = xlsxwriter.Workbook(caminho, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+    # Em ``constant_memory`` as abas são escritas uma de cada vez, em ordem
+    for aba, df in abas.items():
+        _escrever_aba(livro, aba, df, tamanho)
+    livro.close()
+
+
+def _gravar_xlsx(df: pd.DataFrame, caminho: str, tamanho: int, aba: str = "Dados Filtrados"):
+    _gravar_abas({aba: df}, caminho, tamanho)
+
+
+def _gravar_csv(df: pd.DataFrame, caminho: str, tamanho: int):
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        if df.empty:
+            df.to_csv(arquivo, index=False)
+        for inicio, bloco in _blocos(df, tamanho):
+            bloco.to_csv(arquivo, index=False, header=inicio == 0)
+
+
+def _gravar_parquet(df: pd.DataFrame, caminho: str, tamanho: int):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.Schema.from_pandas(df.iloc[:0], preserve_index=False)
+    with pq.ParquetWriter(caminho, esquema) as escritor:
+        for _, bloco in _blocos(df, tamanho):
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+
+
+_GRAVADORES = {"xlsx": _gravar_xlsx, "csv": _gravar_csv, "parquet": _gravar_parquet}
+
+
+def exportar(df: pd.DataFrame, formato: str, caminho: str, tamanho_bloco: int = TAMANHO_BLOCO) -> str:
+    """Grava ``df`` em ``caminho`` no ``formato`` pedido; devolve o caminho."""
+    if formato not in _GRAVADORES:
+        raise ValueError(f"Formato de exportação desconhecido: {formato!r}")
+    _GRAVADORES[formato](df, caminho, tamanho_bloco)
+    return caminho
+
+
+def exportar_abas(abas: dict, caminho: str, tamanho_bloco: int = TAMANHO_BLOCO) -> str:
+    """Grava uma pasta de trabalho Excel com uma aba por quadro (``nome -> df``)."""
+    _gravar_abas(abas, caminho, tamanho_bloco)
+    return caminho
+
+
+def exportar_temporario(df: pd.DataFrame, formato: str, tamanho_bloco: int = TAMANHO_BLOCO):
+    """Exporta para um arquivo temporário anônimo, devolvido aberto para leitura.
+
+    O nome é apagado logo após a gravação (no Windows, ao fechar): o espaço
+    volta ao disco quando o arquivo é fechado ou coletado, mesmo que a
+    sessão que o guardava termine sem removê-lo ou o processo caia.
+    """
+    descritor, caminho = tempfile.mkstemp(prefix="visa_exportacao_", suffix="." + FORMATOS[formato][1])
+    os.close(descritor)
+    try:
+        exportar(df, formato, caminho, tamanho_bloco)
+        arquivo = os.fdopen(os.open(caminho, os.O_RDONLY | _BINARIO | _APAGAR_AO_FECHAR), "rb")
+    except BaseException:
+        os.remove(caminho)
+        raise
+    if not _APAGAR_AO_FECHAR:
+        os.remove(caminho)      # POSIX: o arquivo aberto continua legível
+    return arquivo
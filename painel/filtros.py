@@ -0,0 +1,136 @@
+"""Motor de filtros por índice invertido, construído uma vez na carga.
+
+Para cada dimensão da barra lateral o índice guarda os códigos por linha
+(a coluna categórica) e, por valor, a lista ordenada de linhas que o
+contêm. O período usa as partições mensais da base: só as linhas dos
+meses que tocam o intervalo são examinadas.
+
+``selecionar`` resolve qualquer combinação de filtros em um único array
+ordenado de posições de linha: o predicado mais seletivo gera os
+candidatos e os demais apenas os interceptam, sem copiar a tabela. O
+resultado equivale ao encadeamento de máscaras booleanas do painel.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Coluna de cada multiselect da barra lateral
+COLUNAS_FILTRO = [
+    "TURNO",
+    "LOCALIDADE",
+    "ESTABELECIMENTO",
+    "COORDENAÇÃO",
+    "CLASSIFICAÇÃO DE RISCO",
+    "MOTIVAÇÃO",
+    "O ESTABELECIMENTO FOI LIBERADO",
+]
+
+
+class _Postings:
+    """Linhas agrupadas por código: ``linhas[inicio[c]:inicio[c + 1]]``."""
+
+    def __init__(self, codigos: np.ndarray, total_codigos: int):
+        validas = codigos >= 0
+        posicoes = np.flatnonzero(validas).astype(np.int32)
+        ordem = np.argsort(codigos[validas], kind="stable")
+        self.linhas = posicoes[ordem]
+        self.linhas.flags.writeable = False
+        contagem = np.bincount(codigos[validas], minlength=total_codigos)
+        self.inicio = np.concatenate([[0], np.cumsum(contagem)])
+
+    def tamanho(self, codigos) -> int:
+        return int(sum(self.inicio[c + 1] - self.inicio[c] for c in codigos))
+
+    def uniao(self, codigos) -> np.ndarray:
+        partes = [self.linhas[self.inicio[c]:self.inicio[c + 1]] for c in codigos]
+        if len(partes) == 1:
+            return partes[0]
+        if not partes:
+            return np.empty(0, dtype=np.int32)
+        return np.sort(np.concatenate(partes))
+
+
+class _Dimensao:
+    def __init__(self, serie: pd.Series):
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        self.codigos = serie.cat.codes.to_numpy()
+        self.posicao = {valor: codigo for codigo, valor in enumerate(serie.cat.categories)}
+        self.postings = _Postings(self.codigos, len(self.posicao))
+        # Opções do multiselect (valores presentes, em ordem), montadas uma vez
+        presentes = np.diff(self.postings.inicio) > 0
+        self.opcoes = sorted(serie.cat.categories[presentes].tolist())
+
+    def codigos_de(self, valores):
+        return sorted({self.posicao[v] for v in valores if v in self.posicao})
+
+
+class IndiceFiltros:
+    def __init__(self, df: pd.DataFrame, col_data: str, inspetores, particoes):
+        self.total = len(df)
+        self.dimensoes = {
+            coluna: _Dimensao(df[coluna]) for coluna in COLUNAS_FILTRO if coluna in df.columns
+        }
+        self.inspetores = inspetores    # DimensaoInspetores (postings por inspetor)
+        self.particoes = particoes      # Particoes do quadro (linhas agrupadas por mês)
+        self._datas = df[col_data].to_numpy()
+
+    def opcoes(self, coluna: str) -> list:
+        """Valores (ordenados, sem nulos) oferecidos no filtro de ``coluna``."""
+        return self.dimensoes[coluna].opcoes
+
+    # --------------------------------------------------
+    def _linhas_periodo(self, a: int, b: int, ini, fim) -> np.ndarray:
+        datas = self._datas[a:b]
+        return np.flatnonzero((datas >= ini) & (datas <= fim)).astype(np.int32) + a
+
+    def selecionar(self, periodo=None, valores=None, inspetores=None) -> np.ndarray:
+        """Posições (ordenadas) das linhas que satisfazem todos os filtros.
+
+        ``periodo`` é ``(inicio, fim)`` inclusivo; ``valores`` mapeia coluna →
+        valores aceitos (vazio = sem filtro); ``inspetores`` aceita linhas com
+        ao menos um dos nomes.
+        """
+        predicados = []   # (tamanho estimado, gerar candidatos, filtrar candidatos)
+
+        if periodo:
+            a, b = self.particoes.intervalo(*periodo)
+            ini = np.datetime64(pd.Timestamp(periodo[0]))
+            fim = np.datetime64(pd.Timestamp(periodo[1]))
+            predicados.append((
+                b - a,
+                lambda a=a, b=b, ini=ini, fim=fim: self._linhas_periodo(a, b, ini, fim),
+                lambda c, ini=ini, fim=fim: c[(self._datas[c] >= ini) & (self._datas[c] <= fim)],
+            ))
+
+        for coluna, aceitos in (valores or {}).items():
+            if not aceitos:
+                continue
+            dimensao = self.dimensoes[coluna]
+            codigos = dimensao.codigos_de(aceitos)
+            mascara = np.zeros(len(dimensao.posicao) + 1, dtype=bool)
+            mascara[codigos] = True     # o último slot (código -1) fica False
+            predicados.append((
+                dimensao.postings.tamanho(codigos),
+                lambda d=dimensao, cs=codigos: d.postings.uniao(cs),
+                lambda c, d=dimensao, m=mascara: c[m[d.codigos[c]]],
+            ))
+
+        if inspetores:
+            linhas = self.inspetores.linhas_de(inspetores)
+            predicados.append((
+                len(linhas),
+                lambda linhas=linhas: linhas,
+                lambda c, linhas=linhas: c[np.isin(c, linhas, assume_unique=True)],
+            ))
+
+        if not predicados:
+            return np.arange(self.total, dtype=np.int32)
+
+        predicados.sort(key=lambda p: p[0])
+        candidatos = predicados[0][1]()
+        for _, _, filtrar in predicados[1:]:
+            if len(candidatos) == 0:
+                break
+            candidatos = filtrar(candidatos)
+        return candidatos
@@ -0,0 +1,66 @@
+"""Apoio aos gráficos plotly do painel: granularidade adaptativa e cache.
+
+A produção no tempo é agrupada por dia, semana ou mês conforme a extensão
+do período selecionado, para que períodos de vários anos não virem
+milhares de barras. Séries de linha grandes usam traços WebGL.
+
+As figuras prontas ficam num cache indexado pela versão da base e pelo
+hash dos dados agregados que as originam (mais o nome/parâmetros do
+gráfico): se os dados não mudaram, a figura não é reconstruída (o
+plotly.express não reagrupa nem remonta os traços). Só a construção é
+poupada: o ``st.plotly_chart`` ainda revalida o dicionário, o serializa e
+o reenvia ao navegador a cada rerun que passa por ele (o Streamlit não
+tem como pular o envio de um elemento inalterado). Cada leitura recebe
+uma cópia profunda do dicionário guardado (ver ``somente_leitura``), então
+alterar a figura devolvida não corrompe o cache.
+"""
+
+import hashlib
+
+import pandas as pd
+
+# nome -> (frequência pandas, adjetivo do título, substantivo)
+GRANULARIDADES = {
+    "dia": ("D", "Diária", "Dia"),
+    "semana": ("W-SUN", "Semanal", "Semana"),
+    "mes": ("M", "Mensal", "Mês"),
+}
+
+# Maior número de barras aceito em cada granularidade: um ano cabe em
+# barras diárias, até ~3 anos em semanais; além disso, mensais
+MAX_BARRAS = {"dia": 400, "semana": 160}
+# Acima disso, linhas são desenhadas com WebGL (scattergl)
+LIMITE_WEBGL = 1000
+
+
+def escolher_granularidade(inicio, fim) -> str:
+    """Menor granularidade que mantém o período dentro de ``MAX_BARRAS``."""
+    dias = (pd.Timestamp(fim) - pd.Timestamp(inicio)).days + 1
+    if dias <= MAX_BARRAS["dia"]:
+        return "dia"
+    if dias / 7 <= MAX_BARRAS["semana"]:
+        return "semana"
+    return "mes"
+
+
+def inicio_do_periodo(datas: pd.Series, granularidade: str) -> pd.Series:
+    """Primeiro dia do balde (semana começando na segunda, ou mês) de cada data."""
+    if granularidade == "dia":
+        return datas
+    return datas.dt.to_period(GRANULARIDADES[granularidade][0]).dt.start_time
+
+
+def modo_renderizacao(pontos: int) -> str:
+    return "webgl" if pontos > LIMITE_WEBGL else "svg"
+
+
+def chave_dados(dados: pd.DataFrame) -> str:
+    """Hash do conteúdo (colunas + valores) de um quadro agregado."""
+    resumo = hashlib.sha1(repr(list(dados.columns)).encode())
+    resumo.update(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    return resumo.hexdigest()
+
+
+def figura_em_cache(cache, versao: str, nome: str, dados: pd.DataFrame, construir) -> dict:
+    """Figura de ``construir(dados)`` como dicionário, reaproveitada na ``versao`` enquanto os dados forem iguais."""
+    return cache.obter(versao, chave_dados(dados), nome, lambda: construir(dados).to_dict())
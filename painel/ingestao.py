@@ -0,0 +1,500 @@
+"""Ingestão incremental da planilha (CSV exportado pelo Google Sheets).
+
+A ``FonteIncremental`` guarda o quadro já normalizado e os validadores HTTP
+(ETag/Last-Modified) da última resposta. Dentro do TTL ela não vai à rede;
+depois dele, faz uma requisição condicional:
+
+- 304 Not Modified (ou corpo idêntico): nada é reprocessado;
+- corpo que apenas cresceu no final: só as linhas novas são lidas e
+  normalizadas, e então anexadas ao quadro existente;
+- qualquer outra mudança: leitura completa.
+
+Com ``iniciar_atualizador``, as revalidações saem do caminho das
+requisições: uma thread própria consulta a planilha a cada TTL (com recuo
+exponencial após falhas) e troca a ``BaseDados`` de uma vez só quando a
+nova está completa; ``obter`` apenas devolve a base atual, sem esperar.
+
+Com ``caminho_snapshot`` (uma pasta), o quadro normalizado é persistido em
+partições mensais junto com os validadores. Um processo novo abre as
+partições, responde imediatamente com elas e reconcilia com a planilha
+remota em segundo plano quando o snapshot é mais antigo que o TTL (a idade
+conta de quando ele foi gravado).
+
+Meses fechados (ver ``painel.particoes``) são imutáveis: numa releitura as
+linhas da planilha desses meses são descartadas antes da normalização e as
+partições já carregadas são reaproveitadas; só os meses abertos são
+reprocessados e regravados.
+
+Para que um lançamento atrasado ou uma correção num mês fechado não se
+perca, cada leitura resume as linhas brutas de cada mês (quantidade e a
+soma dos hashes das linhas, que não depende da ordem e se acumula com as
+caudas anexadas). Numa releitura, um mês fechado cujo resumo difere do
+guardado é reaberto: suas linhas voltam a ser normalizadas a partir da
+planilha, o ranking congelado e as somas acumuladas desse mês são
+refeitos, e a reabertura fica em ``reaberturas`` (e no log) para o painel
+de administração. Numa cauda com linhas de meses fechados, a atualização
+passa a ser completa.
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from painel.base import BaseDados
+from painel.carga import coluna_data, converter_datas, ler_csv, normalizar
+from painel.esquema import concatenar
+from painel.particoes import CARENCIA_DIAS, SEM_DATA, carregar_particoes, mes_fechado, salvar_particoes
+from painel.ranking import chave_de_ano_mes
+from painel.telemetria import cronometrar
+
+logger = logging.getLogger("visa.ingestao")
+
+
+def _baixar(url: str, cabecalhos: dict, timeout: float):
+    """Retorna ``(status, corpo, cabeçalhos_resposta)``; corpo é None no 304."""
+    if "://" not in url:
+        # Caminho local: sem validadores HTTP, mas o resumo do conteúdo
+        # ainda permite detectar "nada mudou" e anexos no final.
+        with open(url, "rb") as arquivo:
+            return 200, arquivo.read(), {}
+
+    requisicao = urllib.request.Request(url, headers=cabecalhos)
+    try:
+        with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+            corpo = resposta.read()
+            if resposta.headers.get("Content-Encoding") == "gzip":
+                corpo = gzip.decompress(corpo)
+            return resposta.status, corpo, dict(resposta.headers)
+    except urllib.error.HTTPError as erro:
+        if erro.code == 304:
+            return 304, None, dict(erro.headers)
+        raise
+
+
+def _inicio_da_cauda(corpo: bytes, tamanho_anterior: int, termina_em_quebra: bool):
+    """Posição onde começam as linhas novas, ou None se não for um anexo limpo."""
+    resto = corpo[tamanho_anterior:]
+    if termina_em_quebra:
+        return tamanho_anterior
+    if resto.startswith(b"\r\n"):
+        return tamanho_anterior + 2
+    if resto.startswith(b"\n"):
+        return tamanho_anterior + 1
+    return None
+
+
+class FonteIncremental:
+    def __init__(self, url: str, ttl: float = 300, timeout: float = 30,
+                 caminho_snapshot: str | None = None, carencia_dias: int = CARENCIA_DIAS,
+                 recuo_inicial: float = 5, recuo_maximo: float = 600):
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.caminho_snapshot = caminho_snapshot
+        self.carencia_dias = carencia_dias
+        self.recuo_inicial = recuo_inicial
+        self.recuo_maximo = recuo_maximo
+
+        # Uma única atualização de rede por vez; leitores nunca esperam por
+        # ela se já houver dados para servir.
+        self._trava = threading.Lock()
+        self._atual = None          # BaseDados, trocada atomicamente
+        self._verificado_em = None
+        self._reconciliacao = None
+        self._fechadas = set()      # meses ("AAAA-MM") congelados
+        self._resumos_meses = {}    # mês -> [linhas, soma dos hashes] das linhas brutas
+        self.reaberturas = []       # meses fechados reabertos por divergirem da planilha
+        self._regravar = set()      # meses reabertos ainda não regravados no snapshot
+
+        # Atualizador em segundo plano (opcional)
+        self._atualizador = None
+        self._sinal = threading.Event()
+        self._parando = False
+        self.verificado_em = None   # time.time() da última consulta bem-sucedida
+        self.falhas_seguidas = 0
+        self.ultimo_erro = None
+
+        # Estado da última resposta processada
+        self._etag = None
+        self._last_modified = None
+        self._tamanho = 0
+        self._resumo = None
+        self._cabecalho = b""
+        self._termina_em_quebra = False
+
+        self.estatisticas = {
+            "requisicoes": 0,
+            "nao_modificado": 0,
+            "inalterado": 0,
+            "incremental": 0,
+            "completo": 0,
+            "snapshot": 0,
+            "falhas": 0,
+        }
+        # Tempos (ms) e tamanho da última atualização, para a telemetria
+        self.ultima_atualizacao = {}
+        self.relatorio_normalizacao = {}
+
+    # --------------------------------------------------
+    def obter(self):
+        """Retorna a ``BaseDados`` atual, revalidando a fonte se o TTL expirou.
+
+        Com o atualizador ativo, só a primeira carga (sem snapshot) espera.
+        """
+        em_fundo = self.atualizador_ativo()
+        if self._atual is None:
+            with self._trava:
+                if self._atual is None:
+                    if self._abrir_snapshot():
+                        if not em_fundo and self._expirado():
+                            self._reconciliar_em_segundo_plano()
+                    else:
+                        self._atualizar()
+        elif not em_fundo and self._expirado() and self._trava.acquire(blocking=False):
+            # Se outra thread já está atualizando, serve o que temos
+            try:
+                if self._expirado():
+                    self._atualizar()
+            finally:
+                self._trava.release()
+        return self._atual
+
+    def sincronizar(self):
+        """Base confirmada com a planilha agora, sem nada em segundo plano.
+
+        Abre o snapshot (se houver) e consulta a planilha nesta thread; falhas
+        de rede sobem em vez de servir dados antigos. Para usos em lote, que
+        precisam de uma base atual e que não mude durante o processamento.
+        """
+        with self._trava:
+            if self._atual is None:
+                self._abrir_snapshot()
+            self._atualizar()
+        return self._atual
+
+    def invalidar(self):
+        """Força uma revalidação na próxima chamada de ``obter`` (ou já, no atualizador)."""
+        self._verificado_em = None
+        self._sinal.set()
+
+    def idade(self) -> float | None:
+        """Segundos desde a última consulta bem-sucedida à planilha (ou do snapshot)."""
+        if self.verificado_em is None:
+            return None
+        return max(0.0, time.time() - self.verificado_em)
+
+    # --------------------------------------------------
+    def iniciar_atualizador(self):
+        """Passa as revalidações para uma thread própria, fora do caminho das requisições."""
+        if self.atualizador_ativo():
+            return
+        self._parando = False
+        self._atualizador = threading.Thread(
+            target=self._laco_atualizador, name="visa-atualizador", daemon=True
+        )
+        self._atualizador.start()
+
+    def parar_atualizador(self, timeout: float | None = None):
+        self._parando = True
+        self._sinal.set()
+        if self._atualizador is not None:
+            self._atualizador.join(timeout)
+
+    def atualizador_ativo(self) -> bool:
+        return self._atualizador is not None and self._atualizador.is_alive()
+
+    def _laco_atualizador(self):
+        espera = 0.0
+        while True:
+            self._sinal.wait(espera)
+            self._sinal.clear()
+            if self._parando:
+                return
+            if self._atual is None:
+                # Partida a frio antes do primeiro ``obter``: o snapshot antes da
+                # rede (e, se ainda vale, a espera do TTL a partir da gravação)
+                with self._trava:
+                    if self._atual is None:
+                        self._abrir_snapshot()
+            intervalo = max(self.ttl, 1.0)
+            if self._verificado_em is not None:
+                restante = intervalo - (time.monotonic() - self._verificado_em)
+                if restante > 0:
+                    espera = restante
+                    continue
+            try:
+                with self._trava:
+                    self._atualizar()
+            except Exception as erro:
+                self.falhas_seguidas += 1
+                self.estatisticas["falhas"] += 1
+                self.ultimo_erro = f"{type(erro).__name__}: {erro}"
+                espera = min(self.recuo_inicial * 2 ** (self.falhas_seguidas - 1), self.recuo_maximo)
+                logger.warning("falha ao atualizar a planilha (%s); nova tentativa em %.1f s",
+                               self.ultimo_erro, espera)
+            else:
+                self.falhas_seguidas = 0
+                self.ultimo_erro = None
+                espera = intervalo
+
+    def aguardar_reconciliacao(self, timeout: float | None = None):
+        if self._reconciliacao is not None:
+            self._reconciliacao.join(timeout)
+
+    def _expirado(self) -> bool:
+        if self._verificado_em is None:
+            return True
+        return time.monotonic() - self._verificado_em >= self.ttl
+
+    # --------------------------------------------------
+    def _abrir_snapshot(self) -> bool:
+        if not self.caminho_snapshot:
+            return False
+        lido = carregar_particoes(self.caminho_snapshot)
+        if lido is None:
+            return False
+        df, col_data, metadados, fechadas = lido
+        if metadados.get("url") != self.url:
+            return False
+
+        self._etag = metadados.get("etag")
+        self._last_modified = metadados.get("last_modified")
+        self._tamanho = metadados.get("tamanho", 0)
+        self._resumo = bytes.fromhex(metadados["resumo"]) if metadados.get("resumo") else None
+        self._cabecalho = metadados.get("cabecalho", "").encode()
+        self._termina_em_quebra = metadados.get("termina_em_quebra", False)
+        self._atual = BaseDados(df, col_data, metadados.get("resumo", "")[:16], metadados.get("ranking"))
+        self._fechadas = fechadas
+        self._resumos_meses = metadados.get("resumos_meses", {})
+        self.verificado_em = metadados.get("salvo_em")
+        if self.verificado_em is not None:
+            # O TTL conta da gravação do snapshot (idade passada para o relógio monotônico)
+            self._verificado_em = time.monotonic() - max(0.0, time.time() - self.verificado_em)
+        self.estatisticas["snapshot"] += 1
+        return True
+
+    def _reconciliar_em_segundo_plano(self):
+        def reconciliar():
+            with self._trava:
+                try:
+                    self._atualizar()
+                except Exception:
+                    # Sem rede: segue com o snapshot e tenta após o TTL
+                    self._verificado_em = time.monotonic()
+
+        self._reconciliacao = threading.Thread(target=reconciliar, daemon=True)
+        self._reconciliacao.start()
+
+    def _persistir(self):
+        if not self.caminho_snapshot:
+            return
+        base = self._atual
+        self.ultima_atualizacao["particoes_gravadas"] = salvar_particoes(
+            self.caminho_snapshot, base.df, base.col_data, {
+                "url": self.url,
+                "etag": self._etag,
+                "last_modified": self._last_modified,
+                "tamanho": self._tamanho,
+                "resumo": self._resumo.hex(),
+                "cabecalho": self._cabecalho.decode(),
+                "termina_em_quebra": self._termina_em_quebra,
+                "salvo_em": time.time(),
+                "ranking": {str(chave): linhas for chave, linhas in base.ranking.fechados.items()},
+                "resumos_meses": self._resumos_meses,
+            }, self._fechadas, self._regravar,
+        )
+        self._regravar.clear()
+
+    def _atualizar(self):
+        self._consultar()
+        # Só conta como verificada depois que a base nova (se houve) está pronta
+        self.verificado_em = time.time()
+
+    def _consultar(self):
+        cabecalhos = {"Accept-Encoding": "gzip"}
+        if self._atual is not None:
+            if self._etag:
+                cabecalhos["If-None-Match"] = self._etag
+            if self._last_modified:
+                cabecalhos["If-Modified-Since"] = self._last_modified
+
+        self.estatisticas["requisicoes"] += 1
+        tempos = self.ultima_atualizacao = {}
+        with cronometrar(tempos, "download_ms"):
+            status, corpo, resposta = _baixar(self.url, cabecalhos, self.timeout)
+        self._verificado_em = time.monotonic()
+        tempos["bytes"] = len(corpo) if corpo is not None else 0
+
+        if status == 304:
+            self.estatisticas["nao_modificado"] += 1
+            tempos["modo"] = "nao_modificado"
+            return
+
+        self._etag = resposta.get("ETag") or resposta.get("Etag")
+        self._last_modified = resposta.get("Last-Modified")
+
+        if self._atual is not None and len(corpo) >= self._tamanho:
+            prefixo = hashlib.sha256(corpo[:self._tamanho]).digest()
+            if prefixo == self._resumo:
+                if len(corpo) == self._tamanho:
+                    self.estatisticas["inalterado"] += 1
+                    tempos["modo"] = "inalterado"
+                    return
+                inicio = _inicio_da_cauda(corpo, self._tamanho, self._termina_em_quebra)
+                if inicio is not None:
+                    with cronometrar(tempos, "normalizar_ms"):
+                        df = self._anexar(corpo[inicio:])
+                    if df is not None:
+                        self._registrar(corpo, df, self._atual.col_data)
+                        self.estatisticas["incremental"] += 1
+                        tempos["modo"] = "incremental"
+                        return
+
+        with cronometrar(tempos, "normalizar_ms"):
+            bruto = ler_csv(corpo)
+            meses = self._meses_brutos(bruto)
+            resumos = self._resumir_meses(bruto, meses)
+            self._reabrir_divergentes(resumos)
+            self._resumos_meses = resumos
+            bruto = self._sem_meses_fechados(bruto, meses)
+            df, col_data = normalizar(bruto, relatorio=self._relatorio_normalizacao())
+            fechado = self._quadro_fechado()
+            if fechado is not None:
+                df = concatenar(fechado, df)
+        self._cabecalho = corpo.split(b"\n", 1)[0].rstrip(b"\r")
+        self._registrar(corpo, df, col_data)
+        self.estatisticas["completo"] += 1
+        tempos["modo"] = "completo"
+
+    def _anexar(self, cauda: bytes):
+        """Quadro com a cauda anexada; ``None`` se ela traz linhas de meses fechados."""
+        novos = ler_csv(self._cabecalho + b"\n" + cauda)
+        meses = self._meses_brutos(novos)
+        resumos = self._resumir_meses(novos, meses)
+        if self._fechadas & set(resumos):
+            # Lançamento atrasado: a releitura completa reabre o mês
+            return None
+        for mes, (linhas, soma) in resumos.items():
+            anterior = self._resumos_meses.get(mes, [0, 0])
+            self._resumos_meses[mes] = [anterior[0] + linhas, (anterior[1] + soma) % 2**64]
+        if novos.empty:
+            return self._atual.df
+        novos, _ = normalizar(novos, relatorio=self._relatorio_normalizacao())
+        return concatenar(self._atual.df, novos)
+
+    @staticmethod
+    def _meses_brutos(bruto) -> np.ndarray:
+        """Chave inteira do mês de cada linha bruta (-1 sem data válida)."""
+        if bruto.empty:
+            return np.empty(0, dtype=np.int64)
+        datas = converter_datas(bruto[coluna_data(bruto)].str.strip())
+        meses = (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype=float, na_value=np.nan)
+        return np.nan_to_num(meses, nan=-1).astype(np.int64)
+
+    @staticmethod
+    def _resumir_meses(bruto, meses: np.ndarray) -> dict:
+        """Mês ("AAAA-MM") -> ``[linhas, soma dos hashes das linhas]`` das linhas brutas."""
+        validas = meses >= 0
+        if not validas.any():
+            return {}
+        hashes = pd.util.hash_pandas_object(bruto, index=False).to_numpy()[validas]
+        chaves, inverso = np.unique(meses[validas], return_inverse=True)
+        somas = np.zeros(len(chaves), dtype=np.uint64)
+        np.add.at(somas, inverso, hashes)   # soma módulo 2**64
+        linhas = np.bincount(inverso, minlength=len(chaves))
+        return {
+            f"{chave // 12:04d}-{chave % 12 + 1:02d}": [int(n), int(soma)]
+            for chave, n, soma in zip(chaves, linhas, somas)
+        }
+
+    def _reabrir_divergentes(self, resumos: dict):
+        """Reabre os meses fechados cujas linhas na planilha não batem com as congeladas."""
+        if not self._fechadas:
+            return
+        fatias = self._atual.particoes.fatias() if self._atual is not None else {}
+        divergentes = []
+        for mes in sorted(self._fechadas):
+            planilha = resumos.get(mes, [0, 0])
+            guardado = self._resumos_meses.get(mes)
+            if guardado is not None:
+                igual = list(guardado) == planilha
+            else:
+                # Snapshot sem resumo do mês: compara ao menos a quantidade de linhas
+                a, b = fatias.get(mes, (0, 0))
+                igual = planilha[0] == b - a
+            if not igual:
+                a, b = fatias.get(mes, (0, 0))
+                divergentes.append({
+                    "mes": mes,
+                    "linhas_congeladas": b - a,
+                    "linhas_planilha": planilha[0],
+                    "momento": time.time(),
+                })
+        for reabertura in divergentes:
+            self._fechadas.discard(reabertura["mes"])
+            self._regravar.add(reabertura["mes"])
+            logger.warning(
+                "mês fechado %s difere da planilha (%d linhas congeladas, %d na planilha); reaberto",
+                reabertura["mes"], reabertura["linhas_congeladas"], reabertura["linhas_planilha"],
+            )
+        self.reaberturas += divergentes
+        self.ultima_atualizacao["meses_reabertos"] = [r["mes"] for r in divergentes]
+
+    def _sem_meses_fechados(self, bruto, meses: np.ndarray):
+        """Descarta (antes de normalizar) as linhas de meses já fechados."""
+        if not self._fechadas or bruto.empty:
+            return bruto
+        fechados = [chave_de_ano_mes(mes) for mes in self._fechadas]
+        descartar = np.isin(meses, fechados)
+        self.ultima_atualizacao["linhas_fechadas"] = int(descartar.sum())
+        return bruto[~descartar].reset_index(drop=True)
+
+    def _quadro_fechado(self):
+        """Linhas dos meses fechados, tiradas da base atual (sem reprocessar)."""
+        if self._atual is None or not self._fechadas:
+            return None
+        fatias = self._atual.particoes.fatias()
+        linhas = [np.arange(a, b) for mes, (a, b) in fatias.items() if mes in self._fechadas]
+        if not linhas:
+            return None
+        return self._atual.df.take(np.concatenate(linhas)).reset_index(drop=True)
+
+    def _relatorio_normalizacao(self) -> dict:
+        # Linhas com data fora do formato do formulário (caminho lento); as
+        # posições são relativas às linhas reprocessadas (as novas, numa
+        # atualização incremental, ou as dos meses abertos)
+        self.relatorio_normalizacao = {}
+        return self.relatorio_normalizacao
+
+    def _registrar(self, corpo: bytes, df, col_data: str):
+        self._tamanho = len(corpo)
+        self._resumo = hashlib.sha256(corpo).digest()
+        self._termina_em_quebra = corpo.endswith(b"\n")
+        fallback = self.relatorio_normalizacao.get("linhas_fallback")
+        if fallback is not None:
+            self.ultima_atualizacao["linhas_fallback"] = len(fallback)
+        ranking_fechado = None
+        if self._atual is not None:
+            # Sem os meses reabertos: ranking e somas acumuladas deles são refeitos
+            chaves = {chave_de_ano_mes(mes) for mes in self._fechadas}
+            ranking_fechado = {
+                chave: linhas for chave, linhas in self._atual.ranking.fechados.items() if chave in chaves
+            }
+        with cronometrar(self.ultima_atualizacao, "indices_ms"):
+            self._atual = BaseDados(df, col_data, self._resumo.hex()[:16], ranking_fechado, self._atual)
+        hoje = date.today()
+        self._fechadas |= {
+            mes for mes in self._atual.particoes.fatias()
+            if mes != SEM_DATA and mes_fechado(mes, hoje, self.carencia_dias)
+        }
+        self._atual.ranking.congelar(chave_de_ano_mes(mes) for mes in self._fechadas)
+        with cronometrar(self.ultima_atualizacao, "snapshot_ms"):
+            self._persistir()
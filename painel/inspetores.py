@@ -0,0 +1,166 @@
+"""Dimensão de inspetores e tabela de incidência linha ↔ inspetor.
+
+O campo EQUIPE/INSPETOR traz um ou mais nomes separados por vírgula. Em vez
+de uma lista Python por linha, cada texto de equipe distinto é decomposto
+uma única vez; os nomes recebem ids inteiros e a relação com as linhas fica
+em formato longo (CSR por linha), de modo que filtro, contagem de
+inspetores e "explode" por inspetor são buscas vetorizadas lineares no
+número de inspeções.
+
+Variantes de grafia do mesmo nome (acentos, caixa, espaços repetidos) são
+unificadas; o nome exibido é a grafia mais frequente na planilha.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+def chave_nome(nome: str) -> str:
+    """Forma canônica usada para comparar nomes (sem acento, caixa ou espaços extras)."""
+    sem_acento = unicodedata.normalize("NFKD", str(nome))
+    sem_acento = "".join(c for c in sem_acento if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", sem_acento).strip().upper()
+
+
+def _grafia(nome: str) -> str:
+    return re.sub(r"\s+", " ", nome).strip().upper()
+
+
+class DimensaoInspetores:
+    def __init__(self, equipes: pd.Series):
+        if not isinstance(equipes.dtype, pd.CategoricalDtype):
+            equipes = equipes.astype("category")
+        codigos_equipe = equipes.cat.codes.to_numpy()
+        frequencia_equipe = np.bincount(codigos_equipe[codigos_equipe >= 0],
+                                        minlength=len(equipes.cat.categories))
+
+        # Decompõe cada equipe distinta uma única vez
+        ids_por_chave = {}
+        grafias = []            # por id: {grafia: frequência}
+        membros = []
+        for texto, frequencia in zip(equipes.cat.categories, frequencia_equipe):
+            ids = []
+            for parte in str(texto).split(","):
+                grafia = _grafia(parte)
+                if not grafia:
+                    continue
+                chave = chave_nome(grafia)
+                if chave not in ids_por_chave:
+                    ids_por_chave[chave] = len(grafias)
+                    grafias.append({})
+                id_ = ids_por_chave[chave]
+                grafias[id_][grafia] = grafias[id_].get(grafia, 0) + int(frequencia)
+                if id_ not in ids:
+                    ids.append(id_)
+            membros.append(ids)
+
+        # Ids em ordem alfabética do nome exibido
+        nomes = [max(contagem, key=lambda g: (contagem[g], g)) for contagem in grafias]
+        ordem = np.argsort(np.array(nomes, dtype=object), kind="stable")
+        novo_id = np.empty(len(nomes), dtype=np.int32)
+        novo_id[ordem] = np.arange(len(nomes), dtype=np.int32)
+        self.nomes = np.array(nomes, dtype=object)[ordem]
+        self._ids_por_chave = {chave: int(novo_id[i]) for chave, i in ids_por_chave.items()}
+
+        # Equipe -> membros (CSR); o último slot atende linhas sem equipe (código -1)
+        tamanhos = np.array([len(m) for m in membros] + [0], dtype=np.int64)
+        self.equipe_inicio = np.concatenate([[0], np.cumsum(tamanhos[:-1])])
+        self.equipe_membros = novo_id[np.array([i for m in membros for i in m], dtype=np.int64)]
+        self.codigos_equipe = codigos_equipe
+
+        # Linha -> inspetores (CSR): tabela de incidência em formato longo
+        por_linha = tamanhos[codigos_equipe]
+        self.linha_inicio = np.concatenate([[0], np.cumsum(por_linha)])
+        self.incidencia_linha = np.repeat(np.arange(len(equipes), dtype=np.int32), por_linha)
+        self.incidencia_inspetor = self.equipe_membros[
+            _posicoes_csr(self.equipe_inicio, codigos_equipe[codigos_equipe >= 0])
+        ]
+
+        # Inspetor -> linhas (postings ordenados, para o filtro)
+        ordem = np.argsort(self.incidencia_inspetor, kind="stable")
+        self._linhas_por_inspetor = self.incidencia_linha[ordem]
+        self._inspetor_inicio = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.incidencia_inspetor, minlength=len(self.nomes)))]
+        )
+        for array in (self.equipe_membros, self.incidencia_linha, self.incidencia_inspetor,
+                      self._linhas_por_inspetor):
+            array.flags.writeable = False   # compartilhados entre sessões
+
+    # --------------------------------------------------
+    def ids(self, nomes) -> list:
+        """Ids dos nomes informados (variantes de grafia inclusas)."""
+        encontrados = {self._ids_por_chave.get(chave_nome(nome)) for nome in nomes}
+        return sorted(i for i in encontrados if i is not None)
+
+    def localizar(self, chaves) -> np.ndarray:
+        """Id de cada chave canônica (``chave_nome``); -1 para as ausentes."""
+        return np.array([self._ids_por_chave.get(chave, -1) for chave in chaves], dtype=np.int64)
+
+    def nomes_ordenados(self) -> list:
+        return self.nomes.tolist()
+
+    def linhas_de(self, nomes) -> np.ndarray:
+        """Linhas (ordenadas) com pelo menos um dos inspetores ``nomes``."""
+        partes = [
+            self._linhas_por_inspetor[self._inspetor_inicio[i]:self._inspetor_inicio[i + 1]]
+            for i in self.ids(nomes)
+        ]
+        if not partes:
+            return np.empty(0, dtype=np.int32)
+        if len(partes) == 1:
+            return partes[0]
+        return np.unique(np.concatenate(partes))
+
+    def equipes_com(self, nomes) -> np.ndarray:
+        """Máscara (por código de equipe) das equipes com algum dos ``nomes``."""
+        selecionados = np.zeros(len(self.nomes), dtype=bool)
+        selecionados[self.ids(nomes)] = True
+        equipe_de_membro = np.repeat(
+            np.arange(len(self.equipe_inicio) - 1), np.diff(self.equipe_inicio)
+        )
+        equipes = np.zeros(len(self.equipe_inicio) - 1, dtype=bool)
+        equipes[equipe_de_membro[selecionados[self.equipe_membros]]] = True
+        return equipes
+
+    def membros(self, codigos_equipe: np.ndarray):
+        """Pares ``(posição, id_inspetor)``: cada código de equipe expandido nos membros."""
+        codigos_equipe = np.asarray(codigos_equipe)
+        posicoes = np.flatnonzero(codigos_equipe >= 0)
+        tamanhos = np.diff(self.equipe_inicio)[codigos_equipe[posicoes]]
+        indices = _posicoes_csr(self.equipe_inicio, codigos_equipe[posicoes])
+        return np.repeat(posicoes, tamanhos), self.equipe_membros[indices]
+
+    def incidencias(self, linhas: np.ndarray):
+        """Pares ``(linha, id_inspetor)`` das ``linhas`` informadas."""
+        posicoes = _posicoes_csr(self.linha_inicio, linhas)
+        return self.incidencia_linha[posicoes], self.incidencia_inspetor[posicoes]
+
+    def contar(self, linhas: np.ndarray) -> int:
+        """Número de inspetores distintos envolvidos nas ``linhas``."""
+        _, ids = self.incidencias(linhas)
+        return int(np.count_nonzero(np.bincount(ids, minlength=len(self.nomes))))
+
+    def explodir(self, df: pd.DataFrame, linhas: np.ndarray, colunas) -> pd.DataFrame:
+        """Uma linha por (inspeção, inspetor), com a coluna INSPETOR_LISTA.
+
+        ``df`` é o quadro completo da base e ``linhas`` as posições selecionadas.
+        """
+        linhas_inc, ids = self.incidencias(linhas)
+        explodido = df[list(colunas)].take(linhas_inc)
+        explodido["INSPETOR_LISTA"] = pd.Categorical.from_codes(ids, categories=self.nomes)
+        return explodido
+
+
+def _posicoes_csr(inicio: np.ndarray, grupos: np.ndarray) -> np.ndarray:
+    """Concatena ``arange(inicio[g], inicio[g + 1])`` para cada g, vetorizado."""
+    grupos = np.asarray(grupos)
+    comecos = inicio[grupos]
+    tamanhos = inicio[grupos + 1] - comecos
+    total = int(tamanhos.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    deslocamento = np.repeat(comecos - np.cumsum(tamanhos) + tamanhos, tamanhos)
+    return deslocamento + np.arange(total)
@@ -0,0 +1,216 @@
+"""Relatórios de produção em lote, sem o Streamlit.
+
+No fechamento do mês, gera uma pasta de trabalho Excel por inspetor (os de
+``USUARIOS_INSPETORES``) e por COORDENAÇÃO, com os mesmos filtros e
+agregações do painel: resumo, produção diária, distribuição por motivação,
+desempenho dos inspetores (coordenações) e as linhas filtradas, como no
+download do painel.
+
+A base é carregada uma única vez e os relatórios são repartidos entre
+processos. Com ``fork`` (Linux) os processos herdam a base já montada, sem
+copiá-la nem recarregá-la; nos demais sistemas ela é serializada uma vez
+por processo.
+
+    python -m painel.lote --csv planilha.csv --mes 2025-09 --saida relatorios/
+    python -m painel.lote --mes 2025-09 --processos 8      # VISA_URL_DADOS
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from painel import agregacoes
+from painel.base import BaseDados
+from painel.carga import ler_csv, normalizar
+from painel.exportacao import exportar_abas
+from painel.ingestao import FonteIncremental
+from painel.inspetores import chave_nome
+from painel.usuarios import USUARIOS_INSPETORES
+
+TIPOS = ("inspetor", "coordenacao")
+
+
+# ======================================================
+# 📥 CARGA
+# ======================================================
+def carregar_base(csv: str | None = None, url: str | None = None, snapshot: str | None = None) -> BaseDados:
+    """Base a partir de um CSV local ou da planilha (``url``, com snapshot opcional)."""
+    if csv:
+        with open(csv, "rb") as arquivo:
+            df, col_data = normalizar(ler_csv(arquivo.read()))
+        return BaseDados(df, col_data, "lote")
+    if not url:
+        raise ValueError("Informe um CSV ou a URL da planilha (VISA_URL_DADOS)")
+    # Consulta síncrona: ``obter`` serviria o snapshot e reconciliaria numa
+    # thread, e o relatório sairia de dados talvez antigos (e o fork do pool
+    # pegaria essa thread no meio)
+    return FonteIncremental(url, caminho_snapshot=snapshot).sincronizar()
+
+
+def periodo_do_mes(ano_mes: str) -> tuple:
+    mes = pd.Period(ano_mes, freq="M")
+    return mes.start_time.normalize(), mes.end_time.normalize()
+
+
+def mes_anterior(hoje=None) -> str:
+    return str(pd.Period(hoje or pd.Timestamp.today(), freq="M") - 1)
+
+
+# ======================================================
+# 📄 RELATÓRIOS
+# ======================================================
+def tarefas(base: BaseDados, usuarios=USUARIOS_INSPETORES) -> list:
+    """``(tipo, nome)`` de cada relatório: inspetores da lista e coordenações da base."""
+    inspetores = [("inspetor", usuario["nome_inspetor"]) for usuario in usuarios]
+    coordenacoes = [("coordenacao", nome) for nome in base.indice.opcoes("COORDENAÇÃO")]
+    return inspetores + coordenacoes
+
+
+def nome_arquivo(tipo: str, nome: str, periodo) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "_", chave_nome(nome).lower()).strip("_")
+    return f"{tipo}_{slug}_{pd.Timestamp(periodo[0]):%Y-%m-%d}_{pd.Timestamp(periodo[1]):%Y-%m-%d}.xlsx"
+
+
+def _resumo(indicadores: dict, tipo: str, nome: str, periodo) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Indicador": [
+            "Relatório", "Período", "Total de Inspeções", "Estabelecimentos Únicos",
+            "Inspetores Envolvidos", "Dias com Inspeção", "Taxa de Liberação (%)",
+        ],
+        "Valor": [
+            f"{'Inspetor' if tipo == 'inspetor' else 'Coordenação'}: {nome}",
+            f"{pd.Timestamp(periodo[0]):%d/%m/%Y} a {pd.Timestamp(periodo[1]):%d/%m/%Y}",
+            indicadores["total_inspecoes"],
+            indicadores["total_estabelecimentos"],
+            indicadores["total_inspetores"],
+            indicadores["dias_periodo"],
+            round(indicadores["taxa_liberacao"], 1),
+        ],
+    })
+
+
+def gerar_relatorio(base: BaseDados, tipo: str, nome: str, periodo, pasta: str) -> dict:
+    """Grava o relatório de um inspetor ou coordenação; devolve o que foi feito e o tempo."""
+    inicio = time.perf_counter()
+    if tipo == "inspetor":
+        valores, inspetores = {}, [nome]
+    elif tipo == "coordenacao":
+        valores, inspetores = {"COORDENAÇÃO": [nome]}, None
+    else:
+        raise ValueError(f"Tipo de relatório desconhecido: {tipo!r}")
+
+    linhas = base.selecionar(periodo, valores, inspetores)
+    df_filtrado = base.recortar(linhas)
+    cubo = base.agregar(linhas, periodo, valores, inspetores)
+    indicadores = agregacoes.indicadores(cubo, df_filtrado, base.inspetores)
+
+    abas = {
+        "Resumo": _resumo(indicadores, tipo, nome, periodo),
+        "Produção Diária": agregacoes.producao_por_data(cubo, "dia"),
+        "Motivação": agregacoes.contagem(cubo, "MOTIVAÇÃO").rename("Quantidade").reset_index(),
+    }
+    if tipo == "coordenacao":
+        abas["Inspetores"] = agregacoes.desempenho_inspetores(
+            cubo, base, linhas, agregacoes.dias_periodo(cubo)
+        )
+    abas["Dados Filtrados"] = df_filtrado.drop(columns=["INSPETOR_LISTA"], errors="ignore")
+
+    arquivo = os.path.join(pasta, nome_arquivo(tipo, nome, periodo))
+    exportar_abas(abas, arquivo)
+    return {
+        "tipo": tipo,
+        "nome": nome,
+        "arquivo": arquivo,
+        "linhas": len(linhas),
+        "segundos": time.perf_counter() - inicio,
+        "processo": os.getpid(),
+    }
+
+
+# ======================================================
+# ⚙️ EXECUÇÃO EM PARALELO
+# ======================================================
+_base = None    # base do processo de trabalho (herdada ou recebida uma vez)
+
+
+def _iniciar(base: BaseDados):
+    global _base
+    _base = base
+
+
+def _gerar(tarefa) -> dict:
+    tipo, nome, periodo, pasta = tarefa
+    return gerar_relatorio(_base, tipo, nome, periodo, pasta)
+
+
+def gerar_lote(base: BaseDados, periodo, pasta: str, usuarios=USUARIOS_INSPETORES,
+               processos: int | None = None) -> dict:
+    """Gera todos os relatórios do período em ``pasta``; ``processos=1`` roda sem pool."""
+    os.makedirs(pasta, exist_ok=True)
+    lista = [(tipo, nome, periodo, pasta) for tipo, nome in tarefas(base, usuarios)]
+    processos = processos or min(len(lista), os.cpu_count() or 1) or 1
+
+    inicio = time.perf_counter()
+    if processos == 1:
+        _iniciar(base)
+        relatorios = [_gerar(tarefa) for tarefa in lista]
+    else:
+        metodos = multiprocessing.get_all_start_methods()
+        contexto = multiprocessing.get_context("fork" if "fork" in metodos else None)
+        with ProcessPoolExecutor(processos, mp_context=contexto,
+                                 initializer=_iniciar, initargs=(base,)) as executor:
+            relatorios = list(executor.map(_gerar, lista))
+    segundos = time.perf_counter() - inicio
+
+    linhas = sum(r["linhas"] for r in relatorios)
+    return {
+        "periodo": [str(pd.Timestamp(periodo[0]).date()), str(pd.Timestamp(periodo[1]).date())],
+        "processos": processos,
+        "relatorios": relatorios,
+        "segundos": segundos,
+        "relatorios_por_segundo": len(relatorios) / segundos if segundos else float("inf"),
+        "linhas_por_segundo": linhas / segundos if segundos else float("inf"),
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Gera os relatórios de produção por inspetor e coordenação.")
+    parser.add_argument("--csv", help="planilha CSV local (em vez da URL)")
+    parser.add_argument("--url", default=os.environ.get("VISA_URL_DADOS"), help="URL CSV da planilha")
+    parser.add_argument("--snapshot", default=os.environ.get("VISA_SNAPSHOT"),
+                        help="pasta de partições para reaproveitar a carga")
+    parser.add_argument("--mes", help="mês AAAA-MM (padrão: o mês anterior)")
+    parser.add_argument("--inicio", help="data inicial AAAA-MM-DD (com --fim, em vez de --mes)")
+    parser.add_argument("--fim", help="data final AAAA-MM-DD")
+    parser.add_argument("--saida", default="relatorios", help="pasta de destino")
+    parser.add_argument("--processos", type=int, help="processos em paralelo (padrão: núcleos)")
+    args = parser.parse_args()
+
+    if args.inicio and args.fim:
+        periodo = (pd.Timestamp(args.inicio), pd.Timestamp(args.fim))
+    else:
+        periodo = periodo_do_mes(args.mes or mes_anterior())
+
+    inicio = time.perf_counter()
+    base = carregar_base(args.csv, args.url, args.snapshot)
+    carga = time.perf_counter() - inicio
+    print(f"Base carregada: {len(base.df):,} linhas em {carga:.2f}s", flush=True)
+
+    resultado = gerar_lote(base, periodo, args.saida, processos=args.processos)
+    tabela = pd.DataFrame(resultado["relatorios"])[["tipo", "nome", "linhas", "segundos", "processo"]]
+    print(tabela.round(3).to_string(index=False))
+    print(
+        f"{len(resultado['relatorios'])} relatórios em {resultado['segundos']:.2f}s "
+        f"com {resultado['processos']} processo(s): "
+        f"{resultado['relatorios_por_segundo']:.1f} relatórios/s, "
+        f"{resultado['linhas_por_segundo']:,.0f} linhas/s"
+    )
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,175 @@
+"""Partições mensais (ANO_MES) do quadro normalizado.
+
+A ``BaseDados`` guarda as linhas agrupadas por mês, em ordem cronológica
+(dentro do mês, na ordem da planilha), com as linhas sem data válida no
+fim. Cada mês ocupa então um intervalo contíguo de posições, e um filtro de
+período descarta os meses de fora antes de olhar qualquer linha.
+
+Em disco, cada mês é um arquivo Arrow (ver ``painel.snapshot``) listado num
+manifesto JSON. Um mês fica *fechado* ``carencia_dias`` depois do seu fim:
+a partir daí é gravado uma única vez e não é mais reprocessado nem
+regravado. Só os meses abertos (o atual e os ainda em carência) e as linhas
+sem data acompanham as atualizações da planilha.
+"""
+
+import json
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from painel.esquema import periodos_mensais
+from painel.snapshot import VERSAO_ESQUEMA, ler_tabela, salvar_snapshot
+
+SEM_DATA = "sem_data"
+MANIFESTO = "manifesto.json"
+CARENCIA_DIAS = 7
+
+
+def _numero_mes(ano_mes) -> int:
+    periodo = pd.Period(ano_mes, freq="M")
+    return periodo.year * 12 + periodo.month - 1
+
+
+def mes_fechado(ano_mes: str, hoje: date, carencia_dias: int = CARENCIA_DIAS) -> bool:
+    """Se o mês terminou há mais de ``carencia_dias`` (e não recebe mais linhas)."""
+    fim = pd.Period(ano_mes, freq="M").end_time.normalize()
+    return pd.Timestamp(hoje) > fim + pd.Timedelta(days=carencia_dias)
+
+
+def _codigos_mes(df: pd.DataFrame):
+    serie = df["ANO_MES"]
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype("category")
+    return serie.cat.codes.to_numpy(), serie.cat.categories
+
+
+def ordenar_por_mes(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas agrupadas por mês (ordem estável), sem data no fim."""
+    codigos, meses = _codigos_mes(df)
+    chave = np.where(codigos < 0, len(meses), codigos)
+    if len(chave) < 2 or (np.diff(chave) >= 0).all():
+        return df
+    return df.take(np.argsort(chave, kind="stable")).reset_index(drop=True)
+
+
+class Particoes:
+    def __init__(self, df: pd.DataFrame):
+        codigos, meses = _codigos_mes(df)
+        chave = np.where(codigos < 0, len(meses), codigos)
+        if len(chave) > 1 and (np.diff(chave) < 0).any():
+            raise ValueError("o quadro precisa estar agrupado por mês (ver ordenar_por_mes)")
+
+        contagem = np.bincount(codigos[codigos >= 0], minlength=len(meses))
+        self.meses = [str(m) for m in meses]
+        self.inicio = np.concatenate([[0], np.cumsum(contagem)]).astype(np.int64)
+        self.total = len(df)
+        self._numeros = np.array([_numero_mes(m) for m in self.meses], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.meses)
+
+    def fatias(self) -> dict:
+        """Partição -> ``(inicio, fim)`` das suas linhas (meses vazios omitidos)."""
+        fatias = {
+            mes: (int(a), int(b))
+            for mes, a, b in zip(self.meses, self.inicio[:-1], self.inicio[1:]) if b > a
+        }
+        if self.total > self.inicio[-1]:
+            fatias[SEM_DATA] = (int(self.inicio[-1]), self.total)
+        return fatias
+
+    def intervalo(self, inicio, fim) -> tuple[int, int]:
+        """Linhas ``[a, b)`` dos meses que tocam o período ``inicio..fim``."""
+        primeiro = np.searchsorted(self._numeros, _numero_mes(pd.Timestamp(inicio)), side="left")
+        ultimo = np.searchsorted(self._numeros, _numero_mes(pd.Timestamp(fim)), side="right")
+        return int(self.inicio[primeiro]), int(self.inicio[max(ultimo, primeiro)])
+
+
+# ======================================================
+# 💾 ARMAZENAMENTO
+# ======================================================
+def _ler_manifesto(pasta: str):
+    try:
+        with open(os.path.join(pasta, MANIFESTO), encoding="utf-8") as arquivo:
+            manifesto = json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifesto.get("versao_esquema") != VERSAO_ESQUEMA:
+        return None
+    return manifesto
+
+
+def salvar_particoes(pasta: str, df: pd.DataFrame, col_data: str, metadados: dict | None = None,
+                     fechadas=(), regravar=()) -> int:
+    """Grava as partições de ``df`` (agrupado por mês) e o manifesto.
+
+    ``fechadas`` é a fonte da verdade: um mês só deixa de ser regravado se
+    está fechado agora, já estava fechado no manifesto anterior e o arquivo
+    tem o mesmo número de linhas (e não está em ``regravar``, os meses
+    reabertos por correções que mantêm a contagem). Retorna o número de
+    arquivos escritos.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    anterior = _ler_manifesto(pasta) or {"particoes": {}}
+    particoes = {}
+    escritos = 0
+    for chave, (a, b) in Particoes(df).fatias().items():
+        arquivo = f"{chave}.arrow"
+        fechada = chave in fechadas
+        gravada = anterior["particoes"].get(chave, {})
+        intacta = (fechada and gravada.get("fechada", False) and gravada.get("linhas") == b - a
+                   and chave not in regravar and os.path.exists(os.path.join(pasta, arquivo)))
+        if not intacta:
+            salvar_snapshot(os.path.join(pasta, arquivo), df.iloc[a:b], col_data, {"particao": chave})
+            escritos += 1
+        particoes[chave] = {"arquivo": arquivo, "linhas": b - a, "fechada": fechada}
+
+    manifesto = {
+        "versao_esquema": VERSAO_ESQUEMA,
+        "col_data": col_data,
+        "metadados": metadados or {},
+        "particoes": particoes,
+    }
+    temporario = os.path.join(pasta, f"{MANIFESTO}.{os.getpid()}.tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False)
+    os.replace(temporario, os.path.join(pasta, MANIFESTO))
+
+    # Meses que deixaram de existir (datas corrigidas na planilha)
+    for chave, info in anterior["particoes"].items():
+        if chave not in particoes:
+            try:
+                os.remove(os.path.join(pasta, info["arquivo"]))
+            except FileNotFoundError:
+                pass
+    return escritos
+
+
+def carregar_particoes(pasta: str):
+    """Retorna ``(df, col_data, metadados, fechadas)`` ou None se ausente/incompatível."""
+    manifesto = _ler_manifesto(pasta)
+    if manifesto is None:
+        return None
+
+    tabelas = []
+    for info in manifesto["particoes"].values():
+        lido = ler_tabela(os.path.join(pasta, info["arquivo"]))
+        if lido is None or lido[0].num_rows != info["linhas"]:
+            return None
+        tabelas.append(lido[0])
+    if not tabelas:
+        return None
+
+    # Uma única conversão para pandas; o Arrow unifica os dicionários das
+    # categóricas (partições gravadas em momentos diferentes)
+    df = pa.concat_tables(tabelas, promote_options="permissive").to_pandas()
+    meses = df["ANO_MES"].cat.categories
+    if len(meses) and not (meses.is_monotonic_increasing
+                           and _numero_mes(meses[-1]) - _numero_mes(meses[0]) == len(meses) - 1):
+        df["ANO_MES"], df["MES_ANO_LABEL"] = periodos_mensais(df["DATA"])
+
+    fechadas = {chave for chave, info in manifesto["particoes"].items() if info["fechada"]}
+    return ordenar_por_mes(df), manifesto["col_data"], manifesto["metadados"], fechadas
@@ -0,0 +1,125 @@
+"""Servidor HTTP local que imita a exportação CSV do Google Sheets.
+
+Serve um corpo CSV mutável com ETag/Last-Modified e responde 304 às
+requisições condicionais, para exercitar a ingestão sem acessar a rede.
+``falhar`` simula a planilha fora do ar (para testar o recuo do
+atualizador em segundo plano)::
+
+    with PlanilhaLocal(open("amostra.csv", "rb").read()) as planilha:
+        fonte = FonteIncremental(planilha.url, ttl=0)
+        fonte.obter()
+        planilha.anexar(b"...nova linha...\\r\\n")
+        fonte.obter()   # lê apenas a cauda
+"""
+
+import gzip
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PlanilhaLocal:
+    def __init__(self, conteudo: bytes = b"", host: str = "127.0.0.1", porta: int = 0,
+                 validadores: bool = True):
+        self.validadores = validadores
+        self.requisicoes = 0
+        self.respostas_304 = 0
+        self.falha = None           # status HTTP devolvido enquanto "fora do ar"
+        self._trava = threading.Lock()
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+        self.definir(conteudo)
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}/export?format=csv"
+
+    # --------------------------------------------------
+    def definir(self, conteudo: bytes):
+        with self._trava:
+            self._conteudo = conteudo
+            self._etag = '"' + hashlib.sha1(conteudo).hexdigest() + '"'
+            self._modificado_em = formatdate(usegmt=True)
+
+    def anexar(self, linhas: bytes):
+        with self._trava:
+            conteudo = self._conteudo
+        self.definir(conteudo + linhas)
+
+    def falhar(self, status: int = 503):
+        self.falha = status
+
+    def restabelecer(self):
+        self.falha = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # --------------------------------------------------
+    def _resposta(self, cabecalhos):
+        with self._trava:
+            self.requisicoes += 1
+            conteudo, etag, modificado_em = self._conteudo, self._etag, self._modificado_em
+        if self.falha is not None:
+            return self.falha, b"", {}
+
+        if self.validadores:
+            if_none_match = cabecalhos.get("If-None-Match")
+            if_modified_since = cabecalhos.get("If-Modified-Since")
+            nao_modificado = False
+            if if_none_match is not None:
+                nao_modificado = if_none_match == etag
+            elif if_modified_since is not None:
+                try:
+                    nao_modificado = (
+                        parsedate_to_datetime(if_modified_since)
+                        >= parsedate_to_datetime(modificado_em)
+                    )
+                except (TypeError, ValueError):
+                    nao_modificado = False
+            if nao_modificado:
+                with self._trava:
+                    self.respostas_304 += 1
+                return 304, b"", {"ETag": etag, "Last-Modified": modificado_em}
+
+        extras = {"Content-Type": "text/csv; charset=utf-8"}
+        if self.validadores:
+            extras.update({"ETag": etag, "Last-Modified": modificado_em})
+        if "gzip" in cabecalhos.get("Accept-Encoding", ""):
+            conteudo = gzip.compress(conteudo)
+            extras["Content-Encoding"] = "gzip"
+        return 200, conteudo, extras
+
+    def _criar_handler(self):
+        planilha = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, corpo, extras = planilha._resposta(self.headers)
+                self.send_response(status)
+                for nome, valor in extras.items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                if corpo:
+                    self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
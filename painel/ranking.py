@@ -0,0 +1,158 @@
+"""Ranking mensal de inspetores, mantido de forma incremental.
+
+Os meses são indexados por um inteiro (``ano * 12 + mês - 1``), e não pelo
+rótulo ``%b/%Y``, que depende do locale. Para cada mês o ranking guarda a
+produção de cada inspetor já ordenada (algumas dezenas de linhas).
+
+A cada base nova, só os meses abertos são recontados a partir do cubo. Os
+meses fechados (ver ``painel.particoes``) vêm prontos da base anterior ou
+do snapshot e nunca são recalculados; são congelados pela chave canônica
+do inspetor (``chave_nome``), e o nome exibido é o da base atual. A produção mensal fica ordenada por
+mês, então o ranking de um mês é uma fatia achada por busca binária.
+"""
+
+import numpy as np
+import pandas as pd
+
+from painel.inspetores import chave_nome
+
+COLUNAS = ["PERIODO", "ANO_MES", "MES_ANO_LABEL", "INSPETOR_LISTA", "INSPECOES"]
+
+
+def chave_mes(datas) -> np.ndarray:
+    """Chave inteira do mês de cada data (-1 para datas ausentes)."""
+    datas = pd.DatetimeIndex(datas)
+    chaves = (datas.year * 12 + datas.month - 1).to_numpy(dtype=float, na_value=np.nan)
+    return np.nan_to_num(chaves, nan=-1).astype(np.int64)
+
+
+def chave_de_ano_mes(ano_mes: str) -> int:
+    return int(ano_mes[:4]) * 12 + int(ano_mes[5:7]) - 1
+
+
+def rotulo(chave: int) -> str:
+    return pd.Period(year=chave // 12, month=chave % 12 + 1, freq="M").strftime("%b/%Y")
+
+
+def contar_meses(cubo: pd.DataFrame, inspetores) -> pd.DataFrame:
+    """Inspeções por mês e inspetor, em ordem de mês e, no mês, de produção."""
+    codigos_equipe = cubo["EQUIPE/INSPETOR"].cat.codes.to_numpy()
+    posicoes, ids = inspetores.membros(codigos_equipe)
+    meses = chave_mes(cubo["DATA"].to_numpy()[posicoes])
+    validos = meses >= 0
+    meses, ids = meses[validos], ids[validos]
+    if len(meses) == 0:
+        return pd.DataFrame({c: pd.Series(dtype="int64" if c in ("PERIODO", "INSPECOES") else object)
+                             for c in COLUNAS})
+
+    # Contagem por (mês, inspetor) numa chave combinada
+    total = len(inspetores.nomes)
+    pesos = cubo["INSPECOES"].to_numpy()[posicoes][validos]
+    chave = (meses - meses.min()) * total + ids
+    combinados, inverso = np.unique(chave, return_inverse=True)
+    contagens = np.bincount(inverso, weights=pesos).astype(np.int64)
+
+    periodo = combinados // total + meses.min()
+    ids = combinados % total
+    # Ids seguem a ordem alfabética dos nomes: empates ficam em ordem de nome
+    ordem = np.lexsort((ids, -contagens, periodo))
+    return _quadro(periodo[ordem], inspetores.nomes[ids[ordem]], contagens[ordem])
+
+
+def _quadro(periodo, nomes, contagens) -> pd.DataFrame:
+    distintos, inverso = np.unique(np.asarray(periodo, dtype=np.int64), return_inverse=True)
+    rotulos = np.array([rotulo(c) for c in distintos], dtype=object)
+    anos_meses = np.array([f"{c // 12:04d}-{c % 12 + 1:02d}" for c in distintos], dtype=object)
+    return pd.DataFrame({
+        "PERIODO": np.asarray(periodo, dtype=np.int64),
+        "ANO_MES": anos_meses[inverso] if len(distintos) else np.empty(0, dtype=object),
+        "MES_ANO_LABEL": rotulos[inverso] if len(distintos) else np.empty(0, dtype=object),
+        "INSPETOR_LISTA": np.asarray(nomes, dtype=object),
+        "INSPECOES": np.asarray(contagens, dtype=np.int64),
+    })
+
+
+def ranking_do_mes(producao: pd.DataFrame, chave: int) -> pd.DataFrame:
+    """Ranking de um mês (com POSICAO) a partir da produção ordenada por mês."""
+    periodos = producao["PERIODO"].to_numpy()
+    a = np.searchsorted(periodos, chave, side="left")
+    b = np.searchsorted(periodos, chave, side="right")
+    ranking = producao.iloc[a:b][["INSPETOR_LISTA", "INSPECOES"]].reset_index(drop=True)
+    ranking.insert(0, "POSICAO", np.arange(1, len(ranking) + 1))
+    return ranking
+
+
+class RankingMensal:
+    def __init__(self, cubo, inspetores, fechados: dict | None = None):
+        """``fechados``: chave do mês -> ``[[chave do inspetor, inspeções], ...]``."""
+        # ``chave_nome`` também converte snapshots antigos, que guardavam o nome exibido
+        self.fechados = {
+            int(chave): [[chave_nome(nome), int(inspecoes)] for nome, inspecoes in linhas]
+            for chave, linhas in (fechados or {}).items()
+        }
+
+        # Só as células dos meses não congelados são recontadas
+        tabela = cubo.tabela
+        if self.fechados:
+            manter = ~np.isin(chave_mes(tabela["DATA"].to_numpy()), list(self.fechados))
+            tabela = tabela[manter]
+        abertos = contar_meses(tabela, inspetores)
+
+        congelados = [
+            (chave, nome, inspecoes)
+            for chave, linhas in self.fechados.items() for nome, inspecoes in linhas
+        ]
+        if congelados:
+            periodo, chaves, contagens = (np.array(c) for c in zip(*congelados))
+            # Nome exibido atual e, como nos abertos, empates em ordem desse nome
+            ids = inspetores.localizar(chaves)
+            conhecidos = ids >= 0
+            nomes = chaves.astype(object)
+            nomes[conhecidos] = inspetores.nomes[ids[conhecidos]]
+            ordem = np.lexsort((np.where(conhecidos, ids, len(inspetores.nomes)), -contagens, periodo))
+            fixos = _quadro(periodo[ordem], nomes[ordem], contagens[ordem])
+            producao = pd.concat([fixos, abertos], ignore_index=True)
+            producao = producao.sort_values("PERIODO", kind="stable", ignore_index=True)
+        else:
+            producao = abertos
+        self.producao = producao
+
+    def meses(self) -> list:
+        return np.unique(self.producao["PERIODO"].to_numpy()).tolist()
+
+    def ranking(self, chave: int) -> pd.DataFrame:
+        return ranking_do_mes(self.producao, chave)
+
+    def congelar(self, chaves) -> dict:
+        """Marca os meses ``chaves`` como fechados; devolve todos os congelados."""
+        for chave in chaves:
+            if chave not in self.fechados:
+                mes = self.ranking(chave)
+                self.fechados[chave] = [
+                    [chave_nome(nome), int(inspecoes)]
+                    for nome, inspecoes in zip(mes["INSPETOR_LISTA"], mes["INSPECOES"])
+                ]
+        return self.fechados
+
+    def producao_mensal(self, periodo, cubo_filtrado, inspetores) -> pd.DataFrame:
+        """Produção mensal sob um filtro só de período.
+
+        Meses inteiramente dentro do período vêm prontos; os das pontas (parciais)
+        são contados a partir do cubo já filtrado.
+        """
+        if not periodo:
+            return self.producao
+        inicio, fim = pd.Timestamp(periodo[0]), pd.Timestamp(periodo[1])
+        primeiro, ultimo = chave_mes([inicio])[0], chave_mes([fim])[0]
+        inteiro_inicio = primeiro if inicio.day == 1 else primeiro + 1
+        inteiro_fim = ultimo if fim == (fim + pd.offsets.MonthEnd(0)) else ultimo - 1
+
+        periodos = self.producao["PERIODO"].to_numpy()
+        a = np.searchsorted(periodos, inteiro_inicio, side="left")
+        b = np.searchsorted(periodos, inteiro_fim, side="right")
+        inteiros = self.producao.iloc[a:b]
+
+        meses = chave_mes(cubo_filtrado["DATA"].to_numpy())
+        pontas = contar_meses(cubo_filtrado[(meses < inteiro_inicio) | (meses > inteiro_fim)], inspetores)
+        producao = pd.concat([pontas, inteiros], ignore_index=True)
+        return producao.sort_values("PERIODO", kind="stable", ignore_index=True)
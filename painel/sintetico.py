@@ -0,0 +1,153 @@
+"""Gerador de planilhas sintéticas com o mesmo esquema do formulário da VISA.
+
+Serve para medir o painel com volumes que a planilha real ainda não tem
+(de dezenas de milhares a milhões de linhas). As cardinalidades imitam as
+da planilha: algumas dezenas de inspetores, equipes de 1 a 3 pessoas com
+grafias variadas, estabelecimentos com popularidade desigual, datas
+``dd/mm/aaaa`` e uma pequena fração de células vazias ou malformadas.
+
+    python -m painel.sintetico 100000 -o dados_100k.csv
+"""
+
+import argparse
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_PLANILHA = [
+    "Carimbo de data/hora",
+    "DATA DA INSPEÇÃO",
+    "TURNO",
+    "ESTABELECIMENTO",
+    "LOCALIDADE",
+    "COORDENAÇÃO",
+    "CLASSIFICAÇÃO DE RISCO",
+    "MOTIVAÇÃO",
+    "O ESTABELECIMENTO FOI LIBERADO",
+    "NÚMERO DA VISITA",
+    "EQUIPE/INSPETOR",
+]
+
+INSPETORES = [
+    "ALESSANDRA DO NASCIMENTO", "MAVIAEL VICTOR DE BARROS", "JOÃO DA SILVA", "MARIA DE SOUZA",
+    "JOSÉ PEREIRA", "ANA LÚCIA FERREIRA", "CARLOS ALBERTO LIMA", "FERNANDA COSTA",
+    "PAULO HENRIQUE SANTOS", "JULIANA ARAÚJO", "RICARDO MONTEIRO", "PATRÍCIA GOMES",
+    "ANDRÉ LUIZ CAVALCANTI", "BEATRIZ ALMEIDA", "MARCOS VINÍCIUS ROCHA", "LUCIANA BARBOSA",
+    "RAFAEL TORRES", "SIMONE DE OLIVEIRA", "EDUARDO MELO", "CLÁUDIA RIBEIRO",
+]
+
+# valor -> peso relativo
+_TURNOS = {"MANHÃ": 6, "TARDE": 4, "NOITE": 1}
+_LOCALIDADES = {
+    "CENTRO": 8, "PORTO DE GALINHAS": 10, "NOSSA SENHORA DO Ó": 5, "CAMELA": 3, "SERRAMBI": 2,
+    "MARACAÍPE": 2, "CAMPO DO JUNDIÁ": 2, "RUROPOLIS": 1, "SUAPE": 2, "": 1,
+}
+_COORDENACOES = {"ALIMENTOS": 6, "SERVIÇOS DE SAÚDE": 3, "PRODUTOS": 2, "AMBIENTAL": 1}
+_RISCOS = {"BAIXO": 5, "MÉDIO": 4, "ALTO": 2}
+_MOTIVACOES = {"ROTINA": 8, "DENÚNCIA": 3, "LICENCIAMENTO": 4, "RETORNO": 3, "SOLICITAÇÃO": 1}
+_LIBERADO = {"SIM": 10, "NÃO": 6, "Sim": 2, "Não": 1, "": 1}
+_VISITAS = {"1": 10, "2": 4, "3": 2, "4": 1}
+_TAMANHO_EQUIPE = {1: 5, 2: 4, 3: 1}
+
+
+def _sortear(rng, pesos: dict, n: int) -> np.ndarray:
+    valores = np.array(list(pesos), dtype=object)
+    p = np.array(list(pesos.values()), dtype=float)
+    return valores[rng.choice(len(valores), size=n, p=p / p.sum())]
+
+
+def _equipes(rng, n: int) -> np.ndarray:
+    """Nomes separados por vírgula, com variações de caixa e espaços."""
+    tamanhos = _sortear(rng, _TAMANHO_EQUIPE, n).astype(int)
+    # Produtividade desigual entre inspetores; amostra sem reposição pelo
+    # truque de Gumbel (os k maiores de log(p) + ruído)
+    log_pesos = -0.6 * np.log(np.arange(1, len(INSPETORES) + 1))
+    k = len(INSPETORES)
+    codigos = np.empty(n, dtype=np.int64)
+    for inicio in range(0, n, 100_000):
+        ruido = rng.gumbel(size=(min(100_000, n - inicio), k)) + log_pesos
+        membros = np.argsort(-ruido, axis=1)[:, :3]
+        tamanho = tamanhos[inicio:inicio + len(membros)]
+        membros[:, 1][tamanho < 2] = k
+        membros[:, 2][tamanho < 3] = k
+        codigos[inicio:inicio + len(membros)] = (membros[:, 0] * (k + 1) + membros[:, 1]) * (k + 1) + membros[:, 2]
+
+    # Cada equipe distinta é montada uma única vez
+    distintos, posicao = np.unique(codigos, return_inverse=True)
+    nomes = INSPETORES + [None]
+    textos = np.array([
+        ", ".join(nomes[i] for i in (c // (k + 1) ** 2, c // (k + 1) % (k + 1), c % (k + 1)) if i < k)
+        for c in distintos
+    ], dtype=object)
+    equipes = textos[posicao]
+
+    variacao = rng.random(n)
+    minusculas = variacao < 0.03
+    equipes[minusculas] = [e.lower() for e in equipes[minusculas]]
+    espacos = (variacao >= 0.03) & (variacao < 0.06)
+    equipes[espacos] = [" " + e.replace(", ", " ,  ") + " " for e in equipes[espacos]]
+    return equipes
+
+
+def gerar_quadro(linhas: int, semente: int = 0, inicio: date = date(2023, 1, 1),
+                 dias: int = 3 * 365) -> pd.DataFrame:
+    """Quadro de texto com ``linhas`` respostas, ordenado pelo carimbo."""
+    rng = np.random.default_rng(semente)
+
+    # Datas e horários formatados uma vez por valor distinto
+    dias_sorteados = np.sort(rng.integers(0, dias, size=linhas))
+    segundos = rng.integers(8 * 3600, 20 * 3600, size=linhas)
+    textos_dia = pd.date_range(inicio, periods=dias, freq="D").strftime("%d/%m/%Y").to_numpy(dtype=object)
+    textos_hora = np.array(
+        [f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in range(24 * 3600)], dtype=object
+    )
+    datas_txt = textos_dia[dias_sorteados]
+    carimbos = datas_txt + " " + textos_hora[segundos]
+    malformadas = rng.random(linhas) < 0.002
+    datas_txt[malformadas] = rng.choice(["", "31/02/2024", "ontem"], size=int(malformadas.sum()))
+
+    # Popularidade dos estabelecimentos segue uma lei de potência
+    total_estab = int(min(max(linhas // 20, 50), 25_000))
+    estab = np.minimum(rng.zipf(1.3, size=linhas), total_estab)
+    estab = (estab * 7919 + rng.integers(0, 3, size=linhas)) % total_estab + 1
+    nomes_estab = np.char.add("ESTABELECIMENTO ", estab.astype(str)).astype(object)
+
+    return pd.DataFrame({
+        "Carimbo de data/hora": carimbos,
+        "DATA DA INSPEÇÃO": datas_txt,
+        "TURNO": _sortear(rng, _TURNOS, linhas),
+        "ESTABELECIMENTO": nomes_estab,
+        "LOCALIDADE": _sortear(rng, _LOCALIDADES, linhas),
+        "COORDENAÇÃO": _sortear(rng, _COORDENACOES, linhas),
+        "CLASSIFICAÇÃO DE RISCO": _sortear(rng, _RISCOS, linhas),
+        "MOTIVAÇÃO": _sortear(rng, _MOTIVACOES, linhas),
+        "O ESTABELECIMENTO FOI LIBERADO": _sortear(rng, _LIBERADO, linhas),
+        "NÚMERO DA VISITA": _sortear(rng, _VISITAS, linhas),
+        "EQUIPE/INSPETOR": _equipes(rng, linhas),
+    }, columns=COLUNAS_PLANILHA)
+
+
+def gerar_csv(linhas: int, semente: int = 0, **opcoes) -> bytes:
+    """Conteúdo CSV (UTF-8) como o exportado pela planilha publicada."""
+    return gerar_quadro(linhas, semente, **opcoes).to_csv(index=False).encode("utf-8")
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Gera uma planilha sintética no esquema do formulário.")
+    parser.add_argument("linhas", type=int)
+    parser.add_argument("-o", "--saida", help="arquivo CSV (padrão: saída padrão)")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    conteudo = gerar_csv(args.linhas, args.semente)
+    if args.saida:
+        with open(args.saida, "wb") as arquivo:
+            arquivo.write(conteudo)
+    else:
+        sys.stdout.buffer.write(conteudo)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,65 @@
+"""Snapshot colunar local do quadro normalizado.
+
+O quadro produzido por ``normalizar`` é gravado em Arrow IPC (Feather v2)
+sem compressão, o que permite abri-lo por memory-map em milissegundos num
+processo novo. O esquema do arquivo carrega um carimbo de versão: qualquer
+mudança na normalização deve incrementar ``VERSAO_ESQUEMA`` para que
+snapshots antigos sejam descartados em vez de lidos com colunas erradas.
+"""
+
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.ipc
+
+VERSAO_ESQUEMA = 3
+
+_CHAVE = b"visa.snapshot"
+
+
+def salvar_snapshot(caminho: str, df, col_data: str, metadados: dict | None = None):
+    """Grava o snapshot de forma atômica (arquivo temporário + ``os.replace``)."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    carimbo = {
+        "versao_esquema": VERSAO_ESQUEMA,
+        "col_data": col_data,
+        "linhas": len(df),
+        "metadados": metadados or {},
+    }
+    esquema = tabela.schema.with_metadata(
+        {**(tabela.schema.metadata or {}), _CHAVE: json.dumps(carimbo).encode()}
+    )
+    tabela = tabela.replace_schema_metadata(esquema.metadata)
+
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with pa.OSFile(temporario, "wb") as arquivo:
+        with pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+
+
+def ler_carimbo(caminho: str):
+    """Lê apenas o carimbo do snapshot (sem materializar os dados)."""
+    try:
+        with pa.memory_map(caminho, "r") as fonte:
+            metadados = pa.ipc.open_file(fonte).schema.metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if _CHAVE not in metadados:
+        return None
+    return json.loads(metadados[_CHAVE])
+
+
+def ler_tabela(caminho: str):
+    """Retorna ``(tabela Arrow, carimbo)`` ou None se ausente/incompatível."""
+    carimbo = ler_carimbo(caminho)
+    if carimbo is None or carimbo.get("versao_esquema") != VERSAO_ESQUEMA:
+        return None
+
+    with pa.memory_map(caminho, "r") as fonte:
+        tabela = pa.ipc.open_file(fonte).read_all()
+    return tabela, carimbo
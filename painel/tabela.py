@@ -0,0 +1,92 @@
+"""Tabela detalhada paginada no servidor.
+
+Na carga, cada coluna da tabela ganha duas permutações de ordenação (as
+posições das linhas em ordem crescente e decrescente, estáveis e com os
+nulos no fim). Ordenar uma seleção é então só interceptar essa permutação
+com as linhas selecionadas, sem ordenar o quadro; a busca por texto roda
+uma vez por valor distinto da coluna. Só a página visível é recortada do quadro e enviada ao navegador.
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_TABELA = [
+    "DATA",
+    "TURNO",
+    "ESTABELECIMENTO",
+    "LOCALIDADE",
+    "COORDENAÇÃO",
+    "CLASSIFICAÇÃO DE RISCO",
+    "MOTIVAÇÃO",
+    "O ESTABELECIMENTO FOI LIBERADO",
+    "NÚMERO DA VISITA",
+    "EQUIPE/INSPETOR",
+]
+
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+
+
+def _chave_ordenacao(serie: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Valores comparáveis (inteiros) da coluna e a máscara de nulos."""
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        valores = serie.to_numpy()
+        return valores.view("int64"), np.isnat(valores)
+    if isinstance(serie.dtype, pd.CategoricalDtype) and serie.cat.categories.is_monotonic_increasing:
+        codigos = serie.cat.codes.to_numpy()
+    else:
+        codigos, _ = pd.factorize(serie, sort=True)
+    return codigos, codigos < 0
+
+
+class _Ordem:
+    def __init__(self, serie: pd.Series):
+        chave, nulos = _chave_ordenacao(serie)
+        validas = np.flatnonzero(~nulos).astype(np.int32)
+        nulas = np.flatnonzero(nulos).astype(np.int32)
+        # Inverter a crescente inverteria os empates: a decrescente ordena a chave negada
+        # (sem estouro: o único int64 mínimo é o NaT, que está entre os nulos).
+        # Nulos no fim nas duas, como no ``sort_values``
+        self.crescente, self.decrescente = (
+            np.concatenate([validas[np.argsort(sinal * chave[validas], kind="stable")], nulas])
+            for sinal in (1, -1)
+        )
+        self.crescente.flags.writeable = False
+        self.decrescente.flags.writeable = False
+
+    def permutacao(self, decrescente: bool) -> np.ndarray:
+        return self.decrescente if decrescente else self.crescente
+
+
+class TabelaDetalhada:
+    def __init__(self, df: pd.DataFrame, colunas=COLUNAS_TABELA):
+        self.df = df
+        self.colunas = [c for c in colunas if c in df.columns]
+        self._ordens = {coluna: _Ordem(df[coluna]) for coluna in self.colunas}
+
+    def buscar(self, linhas: np.ndarray, coluna: str, texto: str) -> np.ndarray:
+        """Linhas cuja ``coluna`` contém ``texto`` (sem diferenciar maiúsculas)."""
+        texto = texto.strip()
+        if not texto:
+            return linhas
+        serie = self.df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie)
+        aceitos = pd.Index(valores).astype(str).str.contains(texto, case=False, regex=False)
+        mascara = np.append(np.asarray(aceitos, dtype=bool), False)   # código -1 (nulo)
+        return linhas[mascara[codigos[linhas]]]
+
+    def ordenar(self, linhas: np.ndarray, coluna: str, decrescente: bool = False) -> np.ndarray:
+        """``linhas`` na ordem da coluna (empates na ordem original)."""
+        permutacao = self._ordens[coluna].permutacao(decrescente)
+        if len(linhas) == len(self.df):
+            return permutacao
+        selecionadas = np.zeros(len(self.df), dtype=bool)
+        selecionadas[linhas] = True
+        return permutacao[selecionadas[permutacao]]
+
+    def pagina(self, ordenadas: np.ndarray, numero: int, tamanho: int) -> pd.DataFrame:
+        """Página ``numero`` (a partir de 1) das linhas já ordenadas."""
+        inicio = (numero - 1) * tamanho
+        return self.df[self.colunas].take(ordenadas[inicio:inicio + tamanho])
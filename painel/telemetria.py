@@ -0,0 +1,153 @@
+"""Medição leve das etapas de cada rerun do painel.
+
+Cada rerun abre um ``Rerun`` e envolve as etapas do script em
+``rerun.etapa(nome, **marcadores)``; a etapa registra duração, memória
+residente (RSS) ao final e a variação durante a etapa, além de marcadores
+livres como número de linhas ou acerto de cache. Ao final o rerun vira um
+registro JSON, guardado numa janela circular (para os percentis p50/p95
+do painel de administração) e emitido no logger ``visa.telemetria`` e,
+opcionalmente, num arquivo JSON Lines.
+
+O custo por etapa é uma leitura de ``/proc/self/statm`` e dois relógios.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("visa.telemetria")
+
+try:
+    _PAGINA = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGINA = 4096
+
+
+def memoria_residente_mb(pid: int | None = None) -> float | None:
+    """RSS atual do processo ``pid`` (padrão: este; Linux).
+
+    Nas demais plataformas, o pico de RSS deste processo, ou ``None`` para
+    outro ``pid``.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "rb") as arquivo:
+            return int(arquivo.read().split()[1]) * _PAGINA / 2**20
+    except OSError:
+        if pid is not None:
+            return None
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em bytes no macOS e em KiB nos demais
+        return pico / 2**20 if sys.platform == "darwin" else pico / 2**10
+
+
+@contextmanager
+def cronometrar(destino: dict, nome: str):
+    """Soma em ``destino[nome]`` os milissegundos gastos no bloco."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        destino[nome] = destino.get(nome, 0.0) + (time.perf_counter() - inicio) * 1000
+
+
+class Rerun:
+    def __init__(self, telemetria, **marcadores):
+        self._telemetria = telemetria
+        self._inicio = time.perf_counter()
+        self._rss_inicial = memoria_residente_mb()
+        self.momento = datetime.now().isoformat(timespec="milliseconds")
+        self.marcadores = dict(marcadores)
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nome: str, **marcadores):
+        """Mede o bloco; o dicionário entregue aceita marcadores extras."""
+        rss_antes = memoria_residente_mb()
+        inicio = time.perf_counter()
+        try:
+            yield marcadores
+        finally:
+            fim = time.perf_counter()
+            rss = memoria_residente_mb()
+            self.etapas.append({
+                "etapa": nome,
+                "inicio_ms": round((inicio - self._inicio) * 1000, 3),
+                "duracao_ms": round((fim - inicio) * 1000, 3),
+                "rss_mb": round(rss, 1),
+                "delta_rss_mb": round(rss - rss_antes, 1),
+                **marcadores,
+            })
+
+    def finalizar(self, **marcadores) -> dict:
+        rss = memoria_residente_mb()
+        registro = {
+            "tipo": "rerun",
+            "momento": self.momento,
+            "duracao_ms": round((time.perf_counter() - self._inicio) * 1000, 3),
+            "rss_mb": round(rss, 1),
+            "delta_rss_mb": round(rss - self._rss_inicial, 1),
+            **self.marcadores,
+            **marcadores,
+            "etapas": self.etapas,
+        }
+        self._telemetria.registrar(registro)
+        return registro
+
+
+class Telemetria:
+    def __init__(self, max_reruns: int = 1000, caminho_log: str | None = None):
+        self.caminho_log = caminho_log
+        self._registros = deque(maxlen=max_reruns)
+        self._trava = threading.Lock()
+
+    def iniciar(self, **marcadores) -> Rerun:
+        return Rerun(self, **marcadores)
+
+    def registrar(self, registro: dict):
+        linha = json.dumps(registro, ensure_ascii=False, default=str)
+        with self._trava:
+            self._registros.append(registro)
+            if self.caminho_log:
+                with open(self.caminho_log, "a", encoding="utf-8") as arquivo:
+                    arquivo.write(linha + "\n")
+        logger.info(linha)
+
+    def registros(self) -> list:
+        with self._trava:
+            return list(self._registros)
+
+    def json_linhas(self) -> str:
+        return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in self.registros())
+
+    def percentis(self) -> pd.DataFrame:
+        """p50/p95/máximo (ms) do rerun inteiro, dos fragmentos e de cada etapa na janela."""
+        amostras = {}
+        for registro in self.registros():
+            total = f"fragmento {registro['fragmento']}" if "fragmento" in registro else "rerun"
+            amostras.setdefault(total, []).append(registro["duracao_ms"])
+            for etapa in registro["etapas"]:
+                amostras.setdefault(etapa["etapa"], []).append(etapa["duracao_ms"])
+
+        linhas = [
+            {
+                "ETAPA": nome,
+                "N": len(valores),
+                "P50_MS": float(np.percentile(valores, 50)),
+                "P95_MS": float(np.percentile(valores, 95)),
+                "MAX_MS": float(np.max(valores)),
+            }
+            for nome, valores in amostras.items()
+        ]
+        if not linhas:
+            return pd.DataFrame(columns=["ETAPA", "N", "P50_MS", "P95_MS", "MAX_MS"])
+        return pd.DataFrame(linhas).sort_values("P95_MS", ascending=False).round(1)
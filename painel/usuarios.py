@@ -0,0 +1,52 @@
+"""Usuários do painel (login e nome na planilha) e autenticação por perfil.
+
+Usado pelo painel (login e filtro do próprio inspetor), pela API de
+indicadores (``painel.api``, mesmo escopo por perfil) e pelos relatórios
+em lote (``painel.lote``), um por inspetor desta lista.
+"""
+
+# Perfil ADMIN (vê todos os inspetores)
+USUARIO_ADMIN = "admin"
+SENHA_ADMIN = "Ipojuca@2025*"
+
+# ATENÇÃO:
+# - "nome_inspetor" deve ser IGUAL ao que aparece na planilha (campo EQUIPE/INSPETOR), em maiúsculo.
+# - "username" é o login (primeiro.ultimo em minúsculo).
+# - "senha" é a senha do usuário.
+# Adicione/ajuste aqui todos os inspetores.
+
+USUARIOS_INSPETORES = [
+    {
+        "nome_inspetor": "ALESSANDRA DO NASCIMENTO",
+        "username": "alessandra.nascimento",
+        "senha": "Visa@25*",
+    },
+    {
+        "nome_inspetor": "MAVIAEL VICTOR DE BARROS",
+        "username": "maviael.barros",
+        "senha": "Visa@25*",
+    },
+    # EXEMPLOS: preencha com todos os demais
+    # {
+    #     "nome_inspetor": "JOAO DA SILVA",
+    #     "username": "joao.silva",
+    #     "senha": "Visa@25*",
+    # },
+    # {
+    #     "nome_inspetor": "MARIA DE SOUZA",
+    #     "username": "maria.souza",
+    #     "senha": "Visa@25*",
+    # },
+]
+
+
+def autenticar(usuario: str, senha: str) -> dict | None:
+    """``{"perfil", "usuario", "inspetor_nome"}`` se usuário e senha conferem; senão ``None``."""
+    usuario = (usuario or "").strip().lower()
+    if usuario == USUARIO_ADMIN and senha == SENHA_ADMIN:
+        return {"perfil": "admin", "usuario": usuario, "inspetor_nome": "ADMIN"}
+    # Perfil INSPETOR (primeiro da lista com esse login)
+    cadastro = next((u for u in USUARIOS_INSPETORES if u["username"].lower() == usuario), None)
+    if cadastro is not None and senha == cadastro["senha"]:
+        return {"perfil": "inspetor", "usuario": usuario, "inspetor_nome": cadastro["nome_inspetor"]}
+    return None
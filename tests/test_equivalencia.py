@@ -0,0 +1,353 @@
+"""Caminhos rápidos contra as versões diretas, linha a linha, que substituíram."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from painel import agregacoes
+from painel.acumulados import SomasAcumuladas, periodo_anterior
+from painel.base import BaseDados
+from painel.cache import CacheAgregacoes
+from painel.carga import _normalizar_linha_a_linha, extrair_inspetores, ler_csv, normalizar
+from painel.distintos import ERRO_PADRAO, LIMITE_EXATO, SketchesDistintos
+from painel.estabelecimentos import LIMITE_BUSCA
+from painel.graficos import figura_em_cache
+from painel.inspetores import chave_nome
+from painel.sintetico import gerar_csv
+
+
+@pytest.fixture(scope="module")
+def bruto():
+    return ler_csv(gerar_csv(3000, semente=11))
+
+
+@pytest.fixture(scope="module")
+def base(bruto):
+    df, col_data = normalizar(bruto)
+    return BaseDados(df, col_data, "teste")
+
+
+def selecoes(base):
+    opcoes = base.indice.opcoes
+    inicio, fim = pd.Timestamp("2024-03-10"), pd.Timestamp("2024-11-20")
+    inspetores = base.inspetores.nomes
+    return [
+        ({}, None, None),
+        ({}, (inicio, fim), None),
+        ({"TURNO": opcoes("TURNO")[:1]}, None, None),
+        ({"COORDENAÇÃO": opcoes("COORDENAÇÃO")[:2], "CLASSIFICAÇÃO DE RISCO": opcoes("CLASSIFICAÇÃO DE RISCO")[:1]},
+         (inicio, fim), None),
+        ({}, None, list(inspetores[:1])),
+        ({"LOCALIDADE": opcoes("LOCALIDADE")[:3]}, (inicio, fim), list(inspetores[1:3])),
+        ({"MOTIVAÇÃO": ["(valor inexistente)"]}, None, None),
+    ]
+
+
+def mascara(df, col_data, valores, periodo, inspetores):
+    """Seleção com máscaras booleanas sobre as linhas, como no painel original."""
+    filtro = pd.Series(True, index=df.index)
+    if periodo:
+        filtro &= (df[col_data] >= periodo[0]) & (df[col_data] <= periodo[1])
+    for coluna, aceitos in valores.items():
+        if aceitos:
+            filtro &= df[coluna].isin(aceitos)
+    if inspetores:
+        procurados = {chave_nome(nome) for nome in inspetores}
+        filtro &= df["EQUIPE/INSPETOR"].map(
+            lambda equipe: any(chave_nome(nome) in procurados for nome in extrair_inspetores(equipe))
+        ).astype(bool)
+    return filtro.to_numpy()
+
+
+def como_objetos(serie):
+    # Compara valores, não dtypes (categorias, Int16, NA x NaN)
+    return serie.astype(object).where(serie.notna(), None)
+
+
+def test_normalizar_rapido_igual_ao_linha_a_linha(bruto):
+    lento, col_lento = _normalizar_linha_a_linha(bruto, compacto=False)
+    rapido, col_rapido = normalizar(bruto, compacto=False)
+    assert col_rapido == col_lento
+    pd.testing.assert_frame_equal(rapido, lento[rapido.columns], check_dtype=False)
+
+
+def test_normalizar_compacto_preserva_valores(bruto):
+    lento, col_data = _normalizar_linha_a_linha(bruto, compacto=False)
+    compacto, _ = normalizar(bruto)
+    for coluna in compacto.columns:
+        if coluna in lento.columns and coluna != "INSPETOR_LISTA":
+            pd.testing.assert_series_equal(
+                como_objetos(compacto[coluna]), como_objetos(lento[coluna]), check_names=False,
+            )
+
+
+@pytest.mark.parametrize("caso", range(7))
+def test_selecionar_igual_as_mascaras(base, caso):
+    valores, periodo, inspetores = selecoes(base)[caso]
+    linhas = base.selecionar(periodo, valores, inspetores)
+    esperado = np.flatnonzero(mascara(base.df, base.col_data, valores, periodo, inspetores))
+    np.testing.assert_array_equal(linhas, esperado)
+
+
+@pytest.mark.parametrize("caso", range(7))
+def test_indicadores_do_cubo_iguais_aos_das_linhas(base, caso):
+    valores, periodo, inspetores = selecoes(base)[caso]
+    selecionadas = base.selecionar(periodo, valores, inspetores)
+    cubo = base.agregar(selecionadas, periodo, valores, inspetores)
+    obtido = agregacoes.indicadores(cubo, base.recortar(selecionadas), base.inspetores)
+
+    # As mesmas contas direto nas linhas selecionadas
+    recorte = base.df.iloc[selecionadas]
+    total = len(recorte)
+    liberados = int((recorte["LIBERADO_FLAG"] == "SIM").sum())
+    nomes = {chave_nome(nome) for equipe in recorte["EQUIPE/INSPETOR"] for nome in extrair_inspetores(equipe)}
+    assert obtido["total_inspecoes"] == total
+    assert obtido["liberados"] == liberados
+    assert obtido["dias_periodo"] == max(recorte["DATA"].nunique(), 1)
+    assert obtido["taxa_liberacao"] == pytest.approx(liberados / total * 100 if total else 0)
+    assert obtido["total_estabelecimentos"] == recorte["ESTABELECIMENTO"].nunique()
+    assert obtido["total_inspetores"] == len(nomes)
+
+    for coluna in ("MOTIVAÇÃO", "TURNO", "COORDENAÇÃO"):
+        contagem = agregacoes.contagem(cubo, coluna)
+        esperado = recorte[coluna].value_counts()
+        esperado = esperado[esperado > 0]
+        assert dict(zip(map(str, contagem.index), contagem.tolist())) == \
+            dict(zip(map(str, esperado.index), esperado.tolist()))
+
+
+def test_figura_em_cache_igual_a_construida_e_protegida(base):
+    import plotly.express as px
+    import plotly.io as pio
+
+    dados = agregacoes.producao_por_data(base.cubo.tabela, "mes")
+    construcoes = []
+
+    def construir(dados):
+        construcoes.append(1)
+        return px.bar(dados, x="DATA", y="Inspeções", title="Produção")
+
+    cache = CacheAgregacoes()
+    primeira = figura_em_cache(cache, base.versao, "producao", dados, construir)
+    assert pio.to_json(primeira) == pio.to_json(construir(dados).to_dict())
+    primeira["layout"]["title"]["text"] = "alterada"
+    primeira["data"].clear()
+
+    segunda = figura_em_cache(cache, base.versao, "producao", dados, construir)
+    assert len(construcoes) == 2        # a segunda leitura não reconstruiu
+    assert segunda["layout"]["title"]["text"] == "Produção" and segunda["data"]
+
+    figura_em_cache(cache, "outra versão", "producao", dados, construir)
+    assert len(construcoes) == 3
+
+
+def test_ranking_congelado_igual_ao_recontado(bruto):
+    df, col_data = normalizar(bruto)
+    anterior = BaseDados(df, col_data, "v1")
+    fechados = anterior.ranking.congelar(anterior.ranking.meses())
+
+    # Uma grafia com acento passa a ser a mais frequente: muda o nome exibido e a ordem alfabética
+    nome = anterior.inspetores.nomes[0]
+    acentuado = nome.replace("A", "Á", 1)
+    assert acentuado != nome and chave_nome(acentuado) == chave_nome(nome)
+    df = df.copy()
+    df["EQUIPE/INSPETOR"] = df["EQUIPE/INSPETOR"].cat.rename_categories(
+        lambda equipe: equipe.replace(nome, acentuado)
+    )
+
+    congelada = BaseDados(df, col_data, "v2", ranking_fechado=fechados)
+    recontada = BaseDados(df, col_data, "v3")
+    assert acentuado in congelada.inspetores.nomes
+    assert congelada.ranking.meses() == recontada.ranking.meses()
+    for mes in recontada.ranking.meses():
+        pd.testing.assert_frame_equal(congelada.ranking.ranking(mes), recontada.ranking.ranking(mes),
+                                      check_dtype=False)
+
+
+@pytest.mark.parametrize("decrescente", [False, True])
+@pytest.mark.parametrize("coluna", ["DATA", "TURNO", "ESTABELECIMENTO", "NÚMERO DA VISITA"])
+def test_ordenar_igual_ao_sort_values(base, coluna, decrescente):
+    valores, periodo, inspetores = selecoes(base)[5]
+    linhas = base.selecionar(periodo, valores, inspetores)
+    obtido = base.tabela.ordenar(linhas, coluna, decrescente)
+
+    # Ordenação estável do pandas: empates na ordem original, nulos no fim
+    recorte = base.df.iloc[linhas]
+    esperado = recorte[coluna].reset_index(drop=True).sort_values(
+        ascending=not decrescente, kind="stable", na_position="last"
+    )
+    np.testing.assert_array_equal(obtido, linhas[esperado.index.to_numpy()])
+
+
+@pytest.mark.parametrize("periodo", [
+    ("2024-03-10", "2024-11-20"), ("2024-02-29", "2024-02-29"), ("2023-01-01", "2025-12-31"),
+    ("2020-01-01", "2020-06-30"), ("2025-12-15", "2027-01-01"),
+])
+def test_particoes_podam_so_os_meses_de_fora(base, periodo):
+    inicio, fim = map(pd.Timestamp, periodo)
+    a, b = base.particoes.intervalo(inicio, fim)
+
+    # Todas as linhas do período ficam no intervalo, que só tem meses que tocam o período
+    datas = base.df[base.col_data]
+    dentro = np.flatnonzero(((datas >= inicio) & (datas <= fim)).to_numpy())
+    assert dentro.size == 0 or (dentro.min() >= a and dentro.max() < b)
+    tocados = set(pd.period_range(inicio, fim, freq="M").strftime("%Y-%m"))
+    assert set(base.df["ANO_MES"].iloc[a:b].astype(str)) <= tocados
+    # Os meses que tocam o período entram inteiros
+    fatias = base.particoes.fatias()
+    assert sum(fim_ - inicio_ for mes, (inicio_, fim_) in fatias.items() if mes in tocados) == b - a
+
+
+PERIODOS = [("2024-03-10", "2024-11-20"), ("2024-02-29", "2024-02-29"), ("2022-06-01", "2023-02-15"),
+            ("2025-12-01", "2026-03-31"), ("2020-01-01", "2020-12-31")]
+
+
+@pytest.mark.parametrize("periodo", PERIODOS)
+def test_somas_acumuladas_iguais_ao_cubo(base, periodo):
+    periodo = tuple(map(pd.Timestamp, periodo))
+    selecionadas = base.selecionar(periodo, {}, None)
+    cubo = base.agregar(selecionadas, periodo, {}, None)
+    direto = agregacoes.indicadores(cubo, base.recortar(selecionadas), base.inspetores)
+
+    totais = base.acumulados.totais(periodo)
+    for chave in ("total_inspecoes", "liberados", "dias_periodo"):
+        assert totais[chave] == direto[chave]
+    assert totais["taxa_liberacao"] == pytest.approx(direto["taxa_liberacao"])
+    for coluna in ("TURNO", "COORDENAÇÃO", "MOTIVAÇÃO"):
+        pd.testing.assert_series_equal(base.acumulados.contagem(coluna, periodo),
+                                       agregacoes.contagem(cubo, coluna), check_index_type=False,
+                                       check_names=False, check_dtype=False)
+
+
+def test_somas_acumuladas_reaproveitam_os_meses_fechados(bruto):
+    df, col_data = normalizar(bruto)
+    completa = BaseDados(df, col_data, "v2")
+    meses = completa.ranking.meses()
+    # Base anterior sem o último mês, que chega depois; os anteriores a ele estão fechados
+    ultimo = df["ANO_MES"].astype(str) == completa.particoes.meses[-1]
+    anterior = BaseDados(df[~ultimo.to_numpy()].reset_index(drop=True), col_data, "v1")
+
+    nova = SomasAcumuladas(completa.cubo, anterior.acumulados, set(meses[:-1]))
+    assert nova.dias_reaproveitados > 0
+    for medida, acumulado in completa.acumulados.total.items():
+        np.testing.assert_array_equal(nova.total[medida], acumulado)
+    for medida in ("INSPECOES", "LIBERADOS"):
+        for coluna, acumulado in completa.acumulados.por_valor[medida].items():
+            np.testing.assert_array_equal(nova.por_valor[medida][coluna], acumulado)
+
+
+@pytest.mark.parametrize("modo, periodo, esperado", [
+    ("periodo", ("2024-03-01", "2024-03-31"), ("2024-01-30", "2024-02-29")),
+    ("periodo", ("2024-01-01", "2024-01-01"), ("2023-12-31", "2023-12-31")),
+    ("ano", ("2024-03-01", "2024-03-31"), ("2023-03-01", "2023-03-31")),
+    ("ano", ("2024-02-29", "2024-02-29"), ("2023-02-28", "2023-02-28")),
+])
+def test_periodo_anterior(modo, periodo, esperado):
+    assert periodo_anterior(*periodo, modo) == tuple(map(pd.Timestamp, esperado))
+
+
+# Seleções acima de LIMITE_EXATO, em que o painel e a API passam a estimar
+@pytest.fixture(scope="module")
+def base_grande():
+    df, col_data = normalizar(ler_csv(gerar_csv(12000, semente=5)))
+    return BaseDados(df, col_data, "grande")
+
+
+def dentro_do_erro(estimado, exato, desvios: float = 4) -> bool:
+    return abs(estimado - exato) <= desvios * ERRO_PADRAO * exato + 1
+
+
+@pytest.mark.parametrize("caso", [
+    ({}, None), ({}, ("2024-01-01", "2025-06-30")), ({"TURNO": ["MANHÃ", "TARDE"]}, None),
+])
+def test_distintos_estimados_dentro_do_erro(base_grande, caso):
+    valores, periodo = caso
+    periodo = tuple(map(pd.Timestamp, periodo)) if periodo else None
+    linhas = base_grande.selecionar(periodo, valores, None)
+    assert len(linhas) > LIMITE_EXATO and base_grande.cubo.atende(valores)
+    cubo = base_grande.agregar(linhas, periodo, valores, None)
+    recorte = base_grande.recortar(linhas)
+    sketches = base_grande.cubo.distintos
+
+    estimado = agregacoes.indicadores(cubo, recorte, base_grande.inspetores, sketches=sketches)
+    exato = recorte["ESTABELECIMENTO"].nunique()
+    assert dentro_do_erro(estimado["total_estabelecimentos"], exato)
+
+    aproximado = agregacoes.desempenho_inspetores(cubo, base_grande, linhas, 1, sketches=sketches)
+    direto = agregacoes.desempenho_inspetores(cubo, base_grande, linhas, 1)
+    juntos = aproximado.merge(direto, on="INSPETOR_LISTA", suffixes=("", "_exato"))
+    assert len(juntos) == len(direto)
+    for estimado, exato in zip(juntos["ESTAB_UNICOS"], juntos["ESTAB_UNICOS_exato"]):
+        assert dentro_do_erro(estimado, exato)
+
+
+def test_sketch_com_muitos_distintos_dentro_do_erro():
+    # Bem acima de 2,5 * 2**PRECISAO distintos: vale a estimativa bruta, sem a contagem linear
+    aleatorio = np.random.default_rng(0)
+    valores = pd.Series(aleatorio.integers(0, 60_000, 120_000)).map("estab-{}".format)
+    celulas = aleatorio.integers(0, 50, len(valores))
+    sketches = SketchesDistintos(celulas, 50, valores)
+
+    assert dentro_do_erro(sketches.contar(np.arange(50)), valores.nunique())
+    escolhidas = np.arange(0, 50, 3)
+    assert dentro_do_erro(sketches.contar(escolhidas), valores[np.isin(celulas, escolhidas)].nunique())
+    grupos = escolhidas % 2
+    estimados = sketches.contar_por_grupo(escolhidas, grupos, 2)
+    for grupo in (0, 1):
+        exato = valores[np.isin(celulas, escolhidas[grupos == grupo])].nunique()
+        assert dentro_do_erro(estimados[grupo], exato)
+
+
+def nomes_com_prefixo(nomes, texto):
+    """Varredura direta: nomes com alguma palavra (na forma canônica) começando por ``texto``."""
+    procurado = chave_nome(texto)
+    encontrados = []
+    for nome in nomes:
+        palavras = chave_nome(nome).split(" ")
+        if any(" ".join(palavras[i:]).startswith(procurado) for i in range(len(palavras))):
+            encontrados.append(nome)
+    return sorted(encontrados)
+
+
+def test_busca_de_estabelecimentos_igual_a_varredura(bruto):
+    # Nomes com acentos, várias palavras e espaços repetidos no lugar de "ESTABELECIMENTO n"
+    tipos = ["MERCADO", "ÓTICA", "PADARIA", "BAR  DO", "RESTAURANTE", "Farmácia"]
+    lugares = ["SÃO JOSÉ", "PORTO", "DO Ó", "CENTRO", "MARACAÍPE"]
+    df, col_data = normalizar(bruto)
+    df = df.copy()
+    df["ESTABELECIMENTO"] = df["ESTABELECIMENTO"].cat.rename_categories(
+        [f"{tipos[i % 6]} {lugares[i // 6 % 5]} {i}" for i in range(len(df["ESTABELECIMENTO"].cat.categories))]
+    )
+    estabelecimentos = BaseDados(df, col_data, "nomes").estabelecimentos
+    assert len(estabelecimentos.opcoes) > LIMITE_BUSCA
+    nome = estabelecimentos.opcoes[len(estabelecimentos.opcoes) // 2]
+    palavras = nome.split()
+    textos = ["", "  ", "m", "ZZZ", "mercado s", "ÓTICA", "otica", "sao jose", "do", "bar do",
+              "  porto ", "1", "12", palavras[-1], nome, nome + " X"]
+    for texto in textos:
+        esperado = nomes_com_prefixo(estabelecimentos.opcoes, texto)
+        assert estabelecimentos.buscar(texto) == esperado[:LIMITE_BUSCA], texto
+        assert estabelecimentos.buscar(texto, limite=3) == esperado[:3], texto
+    assert nome in estabelecimentos.buscar(palavras[-1].lower())
+
+
+def test_historico_e_tabela_de_estabelecimentos(base):
+    df = base.df
+    valores, periodo, inspetores = selecoes(base)[1]
+    selecionadas = base.selecionar(periodo, valores, inspetores)
+    estabelecimentos = base.estabelecimentos
+    contagem = df["ESTABELECIMENTO"].value_counts()
+    for nome in [contagem.index[0], contagem.index[-1], estabelecimentos.opcoes[0]]:
+        proprias = df["ESTABELECIMENTO"] == nome
+        for linhas in (None, selecionadas):
+            filtro = proprias if linhas is None else proprias & np.isin(np.arange(len(df)), linhas)
+            esperado = df[filtro.to_numpy()].sort_values(base.col_data, ascending=False, kind="stable")
+            obtido = estabelecimentos.historico(nome, linhas)
+            assert obtido.index.tolist() == esperado.index.tolist()
+            pd.testing.assert_frame_equal(obtido, esperado[obtido.columns])
+
+        linha = estabelecimentos.tabela.set_index("ESTABELECIMENTO").loc[nome]
+        assert linha["VISITAS"] == proprias.sum()
+        assert linha["ULTIMA_INSPECAO"] == df.loc[proprias, base.col_data].max()
+        assert linha["PRIMEIRA_INSPECAO"] == df.loc[proprias, base.col_data].min()
+    assert estabelecimentos.historico("(sem esse estabelecimento)").empty
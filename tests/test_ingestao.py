@@ -0,0 +1,311 @@
+"""Ingestão incremental contra a planilha local (``painel.planilha_local``)."""
+
+import base64
+import json
+import time
+import urllib.request
+from datetime import date
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+
+import pandas as pd
+import pytest
+
+from painel.api import ServicoIndicadores, ServidorIndicadores
+from painel.base import BaseDados
+from painel.carga import ler_csv, normalizar
+from painel.ingestao import FonteIncremental
+from painel.particoes import Particoes, carregar_particoes, ordenar_por_mes, salvar_particoes
+from painel.planilha_local import PlanilhaLocal
+from painel.sintetico import gerar_csv
+from painel.usuarios import SENHA_ADMIN, USUARIO_ADMIN
+
+
+def linha_de_hoje(conteudo: bytes, indice: int = 1) -> bytes:
+    """Uma linha da planilha com as datas trocadas por hoje (mês aberto)."""
+    campos = conteudo.split(b"\n")[indice].split(b",")
+    hoje = date.today().strftime("%d/%m/%Y").encode()
+    campos[0] = hoje + b" 10:00:00"
+    campos[1] = hoje
+    return b",".join(campos) + b"\n"
+
+
+def esperar(condicao, timeout: float = 10):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            raise AssertionError("condição não atingida a tempo")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def conteudo():
+    return gerar_csv(300, semente=3)
+
+
+@pytest.fixture
+def planilha(conteudo):
+    with PlanilhaLocal(conteudo) as planilha:
+        yield planilha
+
+
+def test_304_mantem_a_versao(planilha):
+    fonte = FonteIncremental(planilha.url, ttl=0)
+    base = fonte.sincronizar()
+    assert fonte.sincronizar() is base
+    assert planilha.respostas_304 == 1
+    assert fonte.estatisticas["nao_modificado"] == 1
+    assert fonte.estatisticas["completo"] == 1
+
+
+def test_linhas_anexadas_leem_so_a_cauda(planilha, conteudo):
+    fonte = FonteIncremental(planilha.url, ttl=0)
+    base = fonte.sincronizar()
+    planilha.anexar(linha_de_hoje(conteudo, 1) + linha_de_hoje(conteudo, 2))
+
+    nova = fonte.sincronizar()
+    assert fonte.estatisticas["incremental"] == 1
+    assert fonte.estatisticas["completo"] == 1
+    assert nova.versao != base.versao
+    assert len(nova.df) == len(base.df) + 2
+
+
+def test_prefixo_reescrito_recarrega_tudo(planilha, conteudo):
+    fonte = FonteIncremental(planilha.url, ttl=0)
+    base = fonte.sincronizar()
+    cabecalho, primeira, resto = conteudo.split(b"\n", 2)
+    planilha.definir(cabecalho + b"\n" + resto + linha_de_hoje(conteudo))
+
+    nova = fonte.sincronizar()
+    assert fonte.estatisticas["incremental"] == 0
+    assert fonte.estatisticas["completo"] == 2
+    assert nova.versao != base.versao
+    esperado, _ = normalizar(ler_csv(cabecalho + b"\n" + resto + linha_de_hoje(conteudo)))
+    assert len(nova.df) == len(esperado)
+
+
+def test_recuo_e_recuperacao(planilha, conteudo):
+    fonte = FonteIncremental(planilha.url, ttl=60, recuo_inicial=0.05, recuo_maximo=0.2)
+    base = fonte.obter()
+    fonte.iniciar_atualizador()
+    try:
+        planilha.falhar(503)
+        fonte.invalidar()
+        esperar(lambda: fonte.falhas_seguidas >= 2)
+        assert fonte.ultimo_erro is not None
+        assert fonte.obter() is base
+
+        planilha.anexar(linha_de_hoje(conteudo))
+        planilha.restabelecer()
+        esperar(lambda: fonte.falhas_seguidas == 0 and fonte.ultimo_erro is None)
+        assert len(fonte.obter().df) == len(base.df) + 1
+    finally:
+        fonte.parar_atualizador(timeout=5)
+
+
+def mes_da_linha(linha: bytes) -> str:
+    dia, mes, ano = linha.split(b",")[1].decode().split("/")
+    return f"{ano}-{mes}"
+
+
+def test_snapshot_reabre_o_quadro_normalizado(conteudo, tmp_path):
+    df, col_data = normalizar(ler_csv(conteudo))
+    df = ordenar_por_mes(df)
+    meses = set(Particoes(df).fatias())
+    pasta = str(tmp_path / "particoes")
+    assert salvar_particoes(pasta, df, col_data, {"etag": "x"}, fechadas=meses) == len(meses)
+
+    lido, col_lida, metadados, fechadas = carregar_particoes(pasta)
+    assert (col_lida, metadados, fechadas) == (col_data, {"etag": "x"}, meses)
+    pd.testing.assert_frame_equal(lido, df)
+    # Meses fechados e inalterados não são regravados
+    assert salvar_particoes(pasta, df, col_data, fechadas=meses) == 0
+
+
+@pytest.mark.parametrize("mudanca", ["remover", "corrigir"])
+def test_mes_reaberto_e_regravado_no_snapshot(planilha, conteudo, tmp_path, mudanca):
+    pasta = str(tmp_path / "particoes")
+    fonte = FonteIncremental(planilha.url, ttl=0, caminho_snapshot=pasta)
+    fonte.sincronizar()
+    cabecalho, linha, resto = conteudo.split(b"\n", 2)
+    mes = mes_da_linha(linha)
+    assert mes in fonte._fechadas
+    if mudanca == "remover":
+        planilha.definir(cabecalho + b"\n" + resto)
+    else:
+        campos = linha.split(b",")
+        campos[2] = b"NOITE" if campos[2] != b"NOITE" else b"TARDE"
+        planilha.definir(cabecalho + b"\n" + b",".join(campos) + b"\n" + resto)
+
+    nova = fonte.sincronizar()
+    assert [r["mes"] for r in fonte.reaberturas] == [mes]
+    assert mes in fonte._fechadas       # congelado de novo, já corrigido
+    esperado, _ = normalizar(ler_csv(planilha._conteudo))
+    assert len(nova.df) == len(esperado)
+
+    # Reinício: o snapshot gravado depois da reabertura abre e bate com a planilha
+    reinicio = FonteIncremental(planilha.url, ttl=0, caminho_snapshot=pasta)
+    assert reinicio._abrir_snapshot()
+    assert mes in reinicio._fechadas
+    df = reinicio._atual.df
+    assert len(df) == len(esperado)
+    assert df["TURNO"].value_counts().to_dict() == esperado["TURNO"].value_counts().to_dict()
+    assert reinicio.sincronizar() is reinicio._atual
+    assert reinicio.estatisticas["nao_modificado"] == 1
+
+
+def test_snapshot_recente_respeita_o_ttl(planilha, tmp_path):
+    pasta = str(tmp_path / "particoes")
+    FonteIncremental(planilha.url, ttl=0, caminho_snapshot=pasta).sincronizar()
+    requisicoes = planilha.requisicoes
+
+    fonte = FonteIncremental(planilha.url, ttl=60, caminho_snapshot=pasta)
+    base = fonte.obter()
+    fonte.aguardar_reconciliacao(timeout=5)
+    assert fonte.estatisticas["snapshot"] == 1
+    assert not fonte._expirado()
+    assert fonte.obter() is base
+    assert planilha.requisicoes == requisicoes
+
+    # Snapshot mais velho que o TTL: reconcilia (aqui, com um 304)
+    vencida = FonteIncremental(planilha.url, ttl=0, caminho_snapshot=pasta)
+    vencida.obter()
+    vencida.aguardar_reconciliacao(timeout=5)
+    assert planilha.respostas_304 == 1
+
+
+@pytest.mark.parametrize("ttl", [60, 0])
+def test_partida_a_frio_com_snapshot_e_atualizador(planilha, conteudo, tmp_path, ttl):
+    pasta = str(tmp_path / "particoes")
+    FonteIncremental(planilha.url, ttl=0, caminho_snapshot=pasta).sincronizar()
+    requisicoes = planilha.requisicoes
+
+    # Como no painel: o atualizador sobe antes do primeiro ``obter``
+    fonte = FonteIncremental(planilha.url, ttl=ttl, caminho_snapshot=pasta)
+    fonte.iniciar_atualizador()
+    try:
+        base = fonte.obter()
+        assert len(base.df) == 300
+        if ttl:
+            time.sleep(0.2)
+            assert planilha.requisicoes == requisicoes
+        else:
+            # Vencido: revalida com validadores (304), sem baixar tudo de novo
+            esperar(lambda: planilha.respostas_304 >= 1)
+        assert fonte.estatisticas["snapshot"] == 1
+        assert fonte.estatisticas["completo"] == 0
+    finally:
+        fonte.parar_atualizador(timeout=5)
+
+
+# ======================================================
+# 🌐 API sobre a base
+# ======================================================
+def requisitar(url: str, usuario=(USUARIO_ADMIN, SENHA_ADMIN), etag: str | None = None):
+    """``(status, cabeçalhos, corpo JSON ou None)`` de um GET."""
+    pedido = urllib.request.Request(url)
+    if usuario:
+        credencial = base64.b64encode(f"{usuario[0]}:{usuario[1]}".encode()).decode()
+        pedido.add_header("Authorization", "Basic " + credencial)
+    if etag:
+        pedido.add_header("If-None-Match", etag)
+    try:
+        with urllib.request.urlopen(pedido, timeout=10) as resposta:
+            return resposta.status, resposta.headers, json.loads(resposta.read())
+    except HTTPError as erro:
+        corpo = erro.read()
+        return erro.code, erro.headers, json.loads(corpo) if corpo else None
+
+
+def test_api_sem_dados_responde_503(conteudo):
+    vazia = BaseDados(*normalizar(ler_csv(conteudo.split(b"\n")[0] + b"\n")), "vazia")
+    with ServidorIndicadores(ServicoIndicadores(lambda: vazia)) as servidor:
+        status, cabecalhos, corpo = requisitar(f"{servidor.url}/indicadores")
+        assert status == 503 and "erro" in corpo and cabecalhos["Retry-After"]
+
+    def fora_do_ar():
+        raise OSError("planilha inacessível")
+
+    with ServidorIndicadores(ServicoIndicadores(fora_do_ar)) as servidor:
+        assert requisitar(f"{servidor.url}/indicadores")[0] == 503
+        assert requisitar(f"{servidor.url}/saude", usuario=None)[0] == 503
+
+
+def test_api_erro_inesperado_responde_500(conteudo):
+    base = BaseDados(*normalizar(ler_csv(conteudo)), "teste")
+    servico = ServicoIndicadores(lambda: base)
+
+    def falhar(*args):
+        raise RuntimeError("falha no cálculo")
+
+    servico._corpo = falhar
+    with ServidorIndicadores(servico) as servidor:
+        status, _, corpo = requisitar(f"{servidor.url}/indicadores?inicio=2024-01-01&fim=2024-12-31")
+        assert status == 500 and corpo == {"erro": "Erro interno ao calcular a resposta."}
+
+
+INSPETOR = ("maviael.barros", "Visa@25*")
+PERIODO = "inicio=2024-01-01&fim=2024-12-31"
+
+
+@pytest.fixture
+def api(conteudo):
+    """``(url, serviço, bases)``: trocar ``bases[0]`` publica uma versão nova dos dados."""
+    bases = [BaseDados(*normalizar(ler_csv(conteudo)), "v1")]
+    servico = ServicoIndicadores(lambda: bases[0])
+    with ServidorIndicadores(servico) as servidor:
+        yield servidor.url, servico, bases
+
+
+def test_api_escopo_do_inspetor(api):
+    url, _, bases = api
+    assert requisitar(f"{url}/indicadores?{PERIODO}", usuario=None)[0] == 401
+    assert requisitar(f"{url}/indicadores?{PERIODO}", usuario=("maviael.barros", "errada"))[0] == 401
+    for recurso in ("inspetores", "coordenacoes"):
+        assert requisitar(f"{url}/{recurso}?{PERIODO}", usuario=INSPETOR)[0] == 403
+        assert requisitar(f"{url}/{recurso}?{PERIODO}")[0] == 200
+
+    # O filtro de inspetor pedido é trocado pelo próprio inspetor
+    status, _, proprio = requisitar(f"{url}/indicadores?{PERIODO}&{urlencode({'inspetor': 'JOÃO DA SILVA'})}",
+                                    usuario=INSPETOR)
+    assert status == 200 and proprio["filtros"]["inspetor"] == ["MAVIAEL VICTOR DE BARROS"]
+    _, _, admin = requisitar(f"{url}/indicadores?{PERIODO}&{urlencode({'inspetor': 'MAVIAEL VICTOR DE BARROS'})}")
+    assert proprio["indicadores"] == admin["indicadores"]
+    linhas = bases[0].selecionar((pd.Timestamp("2024-01-01"), pd.Timestamp("2024-12-31")), {},
+                                 ["MAVIAEL VICTOR DE BARROS"])
+    assert proprio["indicadores"]["total_inspecoes"] == len(linhas) > 0
+
+
+def test_api_etag_e_304(api):
+    url, servico, bases = api
+    calculos = []
+    corpo_original = servico._corpo
+    servico._corpo = lambda *args: calculos.append(1) or corpo_original(*args)
+
+    status, cabecalhos, corpo = requisitar(f"{url}/indicadores?{PERIODO}")
+    etag = cabecalhos["ETag"]
+    assert status == 200 and corpo["versao"] == "v1" and len(calculos) == 1
+    status, cabecalhos, corpo = requisitar(f"{url}/indicadores?{PERIODO}", etag=etag)
+    assert (status, corpo, cabecalhos["ETag"]) == (304, None, etag)
+    assert len(calculos) == 1       # o 304 sai antes de qualquer cálculo
+
+    # Outros filtros, outro usuário ou outra versão dos dados: outro ETag
+    assert requisitar(f"{url}/indicadores?{PERIODO}&turno=NOITE", etag=etag)[0] == 200
+    assert requisitar(f"{url}/indicadores?{PERIODO}", usuario=INSPETOR, etag=etag)[0] == 200
+    bases[0] = BaseDados(bases[0].df, bases[0].col_data, "v2")
+    status, cabecalhos, corpo = requisitar(f"{url}/indicadores?{PERIODO}", etag=etag)
+    assert status == 200 and corpo["versao"] == "v2" and cabecalhos["ETag"] != etag
+
+
+@pytest.mark.parametrize("consulta, status, trecho", [
+    (f"indicadores?{PERIODO}&cidade=RECIFE", 400, "cidade"),
+    (f"indicadores?{PERIODO}&turnos=NOITE&x=1", 400, "turnos, x"),
+    ("indicadores?inicio=01/01/2024", 400, "inicio"),
+    ("indicadores?inicio=2024-12-31&fim=2024-01-01", 400, "fim anterior"),
+    (f"indicadores?{PERIODO}&comparacao=mes", 400, "comparacao"),
+    (f"relatorio?{PERIODO}", 404, "relatorio"),
+])
+def test_api_consultas_invalidas(api, consulta, status, trecho):
+    url, _, _ = api
+    obtido, _, corpo = requisitar(f"{url}/{consulta}")
+    assert obtido == status and trecho in corpo["erro"]
@@ -1,9 +1,22 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from io import BytesIO
 from datetime import datetime
 
+from painel import agregacoes
+from painel.acumulados import MODOS_COMPARACAO, periodo_anterior
+from painel.cache import CacheAgregacoes, chave_filtros
+from painel.distintos import ERRO_PADRAO, LIMITE_EXATO
+from painel.estabelecimentos import LIMITE_BUSCA
+from painel.exportacao import FORMATOS, exportar_temporario
+from painel.graficos import GRANULARIDADES, escolher_granularidade, figura_em_cache, modo_renderizacao
+from painel.ingestao import FonteIncremental
+from painel.ranking import ranking_do_mes
+from painel.tabela import TAMANHOS_PAGINA
+from painel.telemetria import Telemetria
+from painel.usuarios import autenticar
+
 # ======================================================
 # 🎨 CONFIGURAÇÃO DA PÁGINA
 # ======================================================
@@ -16,82 +29,85 @@ st.set_page_config(
 # ======================================================
 # 👥 USUÁRIOS EXPLÍCITOS
 # ======================================================
-# ATENÇÃO:
-# - "nome_inspetor" deve ser IGUAL ao que aparece na planilha (campo EQUIPE/INSPETOR), em maiúsculo.
-# - "username" é o login (primeiro.ultimo em minúsculo).
-# - "senha" é a senha do usuário.
-# Adicione/ajuste aqui todos os inspetores.
-
-USUARIOS_INSPETORES = [
-    {
-        "nome_inspetor": "ALESSANDRA DO NASCIMENTO",
-        "username": "alessandra.nascimento",
-        "senha": "Visa@25*",
-    },
-    {
-        "nome_inspetor": "MAVIAEL VICTOR DE BARROS",
-        "username": "maviael.barros",
-        "senha": "Visa@25*",
-    },
-    # EXEMPLOS: preencha com todos os demais
-    # {
-    #     "nome_inspetor": "JOAO DA SILVA",
-    #     "username": "joao.silva",
-    #     "senha": "Visa@25*",
-    # },
-    # {
-    #     "nome_inspetor": "MARIA DE SOUZA",
-    #     "username": "maria.souza",
-    #     "senha": "Visa@25*",
-    # },
-]
-
-# Converte para DataFrame para facilitar busca
-df_perfis = pd.DataFrame(USUARIOS_INSPETORES)
-
-# ======================================================
-# 🔧 FUNÇÕES AUXILIARES
-# ======================================================
-def extrair_inspetores(texto):
-    if pd.isna(texto):
-        return []
-    return [nome.strip().upper() for nome in str(texto).split(",") if nome.strip()]
+# Lista e autenticação em painel/usuarios.py (compartilhadas com a API de
+# indicadores e os relatórios em lote)
 
 # ======================================================
 # 📥 FONTE E CARREGAMENTO DOS DADOS
 # ======================================================
-URL_DADOS = "https://docs.google.com/spreadsheets/d/1CP6RD8UlHzB6FB7x8fhS3YZB0rVGPyf6q99PNp4iAGQ/export?format=csv"
+URL_DADOS = os.environ.get(
+    "VISA_URL_DADOS",
+    "https://docs.google.com/spreadsheets/d/1CP6RD8UlHzB6FB7x8fhS3YZB0rVGPyf6q99PNp4iAGQ/export?format=csv",
+)
+# Intervalo (s) entre revalidações da planilha; dentro dele não há acesso à rede
+TTL_DADOS = float(os.environ.get("VISA_TTL_DADOS", "300"))
+# Pasta com as partições mensais do quadro normalizado (partida a frio sem
+# esperar a rede); meses fechados são gravados uma vez e não mudam mais
+CAMINHO_SNAPSHOT = os.environ.get("VISA_SNAPSHOT", os.path.join(".visa_cache", "particoes"))
+
+# Revalidação numa thread própria (VISA_ATUALIZACAO_FUNDO=0 volta a revalidar
+# dentro do rerun do primeiro usuário após o TTL)
+ATUALIZACAO_FUNDO = os.environ.get("VISA_ATUALIZACAO_FUNDO", "1") == "1"
+
+# Estabelecimentos distintos: "exato" (nunique nas linhas) ou "aproximado"
+# (HyperLogLog por célula do cubo; ver painel.distintos). Seleções pequenas
+# são sempre contadas exatamente
+DISTINTOS = os.environ.get("VISA_DISTINTOS", "exato")
+
+@st.cache_resource
+def obter_fonte(url: str, ttl: float, caminho_snapshot: str):
+    fonte = FonteIncremental(url, ttl=ttl, caminho_snapshot=caminho_snapshot)
+    if ATUALIZACAO_FUNDO:
+        fonte.iniciar_atualizador()
+    return fonte
 
-@st.cache_data
 def carregar_dados(url: str):
-    df = pd.read_csv(url, dtype=str)
-    df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-
-    # Remove carimbo se existir
-    if "Carimbo de data/hora" in df.columns:
-        df = df.drop(columns=["Carimbo de data/hora"])
-
-    # Identifica coluna de data
-    col_data = [c for c in df.columns if "data" in c.lower()][0]
-    df[col_data] = pd.to_datetime(df[col_data], dayfirst=True, errors="coerce")
-
-    # Colunas auxiliares de tempo
-    df["DATA"] = df[col_data]
-    df["ANO"] = df["DATA"].dt.year
-    df["MES"] = df["DATA"].dt.month
-    df["ANO_MES"] = df["DATA"].dt.to_period("M").astype(str)
-    df["MES_ANO_LABEL"] = df["DATA"].dt.strftime("%b/%Y")
-
-    # Lista de inspetores
-    df["INSPETOR_LISTA"] = df["EQUIPE/INSPETOR"].apply(extrair_inspetores)
-
-    # Normaliza campo de liberação
-    df["LIBERADO_FLAG"] = df["O ESTABELECIMENTO FOI LIBERADO"].str.upper().fillna("")
-    df["LIBERADO_BIN"] = df["LIBERADO_FLAG"].apply(lambda x: 1 if x == "SIM" else 0)
-
-    return df, col_data
-
-df, col_data = carregar_dados(URL_DADOS)
+    # Requisição condicional (ETag/Last-Modified); se a planilha só ganhou
+    # linhas no final, apenas a cauda é lida e normalizada. Com o atualizador,
+    # os reruns só leem a última base completa, sem esperar pela rede.
+    return obter_fonte(url, TTL_DADOS, CAMINHO_SNAPSHOT).obter()
+
+def descrever_idade(segundos):
+    if segundos is None:
+        return "idade desconhecida"
+    if segundos < 60:
+        return "agora há pouco"
+    if segundos < 3600:
+        return f"há {segundos // 60:.0f} min"
+    if segundos < 86400:
+        return f"há {segundos // 3600:.0f} h"
+    return f"há {segundos // 86400:.0f} dia(s)"
+
+@st.cache_resource
+def obter_cache_agregacoes():
+    # Uma instância por processo, compartilhada por todas as sessões
+    return CacheAgregacoes()
+
+@st.cache_resource
+def obter_cache_figuras():
+    # Figuras prontas, indexadas pela versão da base e pelo hash dos dados
+    # agregados que as geram (uma nova versão descarta as da anterior)
+    return CacheAgregacoes(max_entradas=256, max_bytes=64 * 2**20)
+
+@st.cache_resource
+def obter_telemetria(caminho_log: str | None):
+    # Janela dos últimos reruns de todas as sessões (p50/p95 no painel admin)
+    return Telemetria(caminho_log=caminho_log)
+
+# Tempos e memória de cada etapa do rerun; também gravados em JSON Lines
+# se VISA_LOG_TELEMETRIA apontar para um arquivo.
+telemetria = obter_telemetria(os.environ.get("VISA_LOG_TELEMETRIA") or None)
+rerun = telemetria.iniciar()
+
+with rerun.etapa("carga") as marcas:
+    fonte = obter_fonte(URL_DADOS, TTL_DADOS, CAMINHO_SNAPSHOT)
+    requisicoes_antes = fonte.estatisticas["requisicoes"]
+    base = carregar_dados(URL_DADOS)
+    marcas.update(linhas=len(base.df), versao=base.versao, idade_dados_s=fonte.idade())
+    if fonte.estatisticas["requisicoes"] != requisicoes_antes:
+        # A planilha foi consultada neste rerun
+        marcas.update(fonte.ultima_atualizacao)
+df, col_data = base.df, base.col_data
 
 # ======================================================
 # 🔐 LOGIN POR PERFIL
@@ -106,30 +122,19 @@ def login():
         submit = st.form_submit_button("Entrar")
 
     if submit:
-        username_norm = username.strip().lower()
-
-        # Perfil ADMIN
-        if username_norm == "admin" and password == "Ipojuca@2025*":
-            st.session_state["autenticado"] = True
-            st.session_state["perfil"] = "admin"
-            st.session_state["usuario"] = "admin"
-            st.session_state["inspetor_nome"] = "ADMIN"
-            st.success("✅ Login realizado com sucesso (ADMIN)!")
-            st.rerun()
+        perfil_login = autenticar(username, password)
+        if perfil_login is None:
+            st.error("❌ Usuário ou senha incorretos.")
         else:
-            # Perfil INSPETOR (buscar na lista explícita)
-            linha = df_perfis[df_perfis["username"].str.lower() == username_norm]
-            if not linha.empty and password == linha.iloc[0]["senha"]:
-                st.session_state["autenticado"] = True
-                st.session_state["perfil"] = "inspetor"
-                st.session_state["usuario"] = username_norm
-                st.session_state["inspetor_nome"] = linha.iloc[0]["nome_inspetor"]
+            st.session_state["autenticado"] = True
+            st.session_state.update(perfil_login)
+            if perfil_login["perfil"] == "admin":
+                st.success("✅ Login realizado com sucesso (ADMIN)!")
+            else:
                 st.success(
-                    f"✅ Login realizado com sucesso! Bem-vindo(a), {linha.iloc[0]['nome_inspetor'].title()}"
+                    f"✅ Login realizado com sucesso! Bem-vindo(a), {perfil_login['inspetor_nome'].title()}"
                 )
-                st.rerun()
-            else:
-                st.error("❌ Usuário ou senha incorretos.")
+            st.rerun()
 
 if "autenticado" not in st.session_state:
     st.session_state["autenticado"] = False
@@ -153,7 +158,12 @@ if perfil == "admin":
 else:
     st.title(f"🦠 Painel de Produção - VISA Ipojuca | {inspetor_logado.title()}")
 
-st.caption(f"👤 Usuário logado: **{usuario}** | Perfil: **{perfil.upper()}**")
+st.caption(
+    f"👤 Usuário logado: **{usuario}** | Perfil: **{perfil.upper()}** | "
+    f"🕒 Dados verificados {descrever_idade(fonte.idade())}"
+)
+if fonte.ultimo_erro:
+    st.caption(f"⚠️ A última consulta à planilha falhou ({fonte.falhas_seguidas}x); exibindo os dados anteriores.")
 
 # ======================================================
 # 🧠 BARRA LATERAL - FILTROS
@@ -177,18 +187,35 @@ data_range = st.sidebar.date_input(
     max_value=data_max
 )
 
-turno = st.sidebar.multiselect("🕑 Turno", sorted(df["TURNO"].dropna().unique()))
-localidade = st.sidebar.multiselect("📍 Localidade", sorted(df["LOCALIDADE"].dropna().unique()))
-estabelecimento = st.sidebar.multiselect("🏢 Estabelecimento", sorted(df["ESTABELECIMENTO"].dropna().unique()))
-coordenacao = st.sidebar.multiselect("👥 Coordenação", sorted(df["COORDENAÇÃO"].dropna().unique()))
-class_risco = st.sidebar.multiselect("⚠️ Classificação de Risco", sorted(df["CLASSIFICAÇÃO DE RISCO"].dropna().unique()))
-motivacao = st.sidebar.multiselect("🎯 Motivação", sorted(df["MOTIVAÇÃO"].dropna().unique()))
-status = st.sidebar.multiselect("✅ Status do Estabelecimento", sorted(df["O ESTABELECIMENTO FOI LIBERADO"].dropna().unique()))
+# Opções montadas uma vez por base (ver IndiceFiltros.opcoes)
+opcoes = base.indice.opcoes
+turno = st.sidebar.multiselect("🕑 Turno", opcoes("TURNO"))
+localidade = st.sidebar.multiselect("📍 Localidade", opcoes("LOCALIDADE"))
+
+# Busca por prefixo (sem acento ou caixa) no índice de estabelecimentos:
+# só os nomes encontrados, mais os já escolhidos, vão para o navegador
+busca_estab = st.sidebar.text_input(
+    "🔎 Buscar estabelecimento", key="busca_estabelecimento",
+    placeholder="Início de qualquer palavra do nome",
+)
+encontrados = base.estabelecimentos.buscar(busca_estab)
+if len(encontrados) == LIMITE_BUSCA:
+    st.sidebar.caption(f"Mostrando os {LIMITE_BUSCA} primeiros; refine a busca.")
+estabelecimento = st.sidebar.multiselect(
+    "🏢 Estabelecimento",
+    sorted(set(encontrados) | set(st.session_state.get("estabelecimento", []))),
+    key="estabelecimento",
+)
+
+coordenacao = st.sidebar.multiselect("👥 Coordenação", opcoes("COORDENAÇÃO"))
+class_risco = st.sidebar.multiselect("⚠️ Classificação de Risco", opcoes("CLASSIFICAÇÃO DE RISCO"))
+motivacao = st.sidebar.multiselect("🎯 Motivação", opcoes("MOTIVAÇÃO"))
+status = st.sidebar.multiselect("✅ Status do Estabelecimento", opcoes("O ESTABELECIMENTO FOI LIBERADO"))
 
 # Campo de inspetor na barra lateral:
 if perfil == "admin":
     # Admin pode escolher qualquer inspetor (ou todos)
-    todos_inspetores = sorted(set(sum(df["INSPETOR_LISTA"].tolist(), [])))
+    todos_inspetores = base.inspetores.nomes_ordenados()
     inspetores_sel = st.sidebar.multiselect("🕵️‍♂️ Inspetor", todos_inspetores)
 else:
     # Inspetor comum não escolhe, é automaticamente filtrado nele mesmo
@@ -197,31 +224,79 @@ else:
 # ======================================================
 # 🔍 APLICAR FILTROS (inclui restrição de perfil)
 # ======================================================
-df_filtrado = df.copy()
-
-if data_range:
-    df_filtrado = df_filtrado[
-        (df_filtrado[col_data] >= pd.to_datetime(data_range[0])) &
-        (df_filtrado[col_data] <= pd.to_datetime(data_range[1]))
-    ]
-if turno:
-    df_filtrado = df_filtrado[df_filtrado["TURNO"].isin(turno)]
-if localidade:
-    df_filtrado = df_filtrado[df_filtrado["LOCALIDADE"].isin(localidade)]
-if estabelecimento:
-    df_filtrado = df_filtrado[df_filtrado["ESTABELECIMENTO"].isin(estabelecimento)]
-if coordenacao:
-    df_filtrado = df_filtrado[df_filtrado["COORDENAÇÃO"].isin(coordenacao)]
-if class_risco:
-    df_filtrado = df_filtrado[df_filtrado["CLASSIFICAÇÃO DE RISCO"].isin(class_risco)]
-if motivacao:
-    df_filtrado = df_filtrado[df_filtrado["MOTIVAÇÃO"].isin(motivacao)]
-if status:
-    df_filtrado = df_filtrado[df_filtrado["O ESTABELECIMENTO FOI LIBERADO"].isin(status)]
-if inspetores_sel:
-    df_filtrado = df_filtrado[
-        df_filtrado["INSPETOR_LISTA"].apply(lambda x: any(i in x for i in inspetores_sel))
-    ]
+# Índice construído na carga: resolve a combinação inteira de filtros em
+# um único conjunto de linhas, sem copiar a tabela completa.
+periodo_sel = data_range if data_range else None
+valores_sel = {
+    "TURNO": turno,
+    "LOCALIDADE": localidade,
+    "ESTABELECIMENTO": estabelecimento,
+    "COORDENAÇÃO": coordenacao,
+    "CLASSIFICAÇÃO DE RISCO": class_risco,
+    "MOTIVAÇÃO": motivacao,
+    "O ESTABELECIMENTO FOI LIBERADO": status,
+}
+
+# Só o período filtrado: totais e contagens vêm das somas acumuladas por dia
+# (duas consultas por período), sem tocar em linhas nem no cubo
+somente_periodo = bool(periodo_sel) and len(periodo_sel) == 2 and not inspetores_sel \
+    and not any(valores_sel.values())
+
+# Resultados memorizados por (versão dos dados, filtros): sessões com a mesma
+# seleção e reruns que não mudam filtros reaproveitam as agregações.
+cache_agregacoes = obter_cache_agregacoes()
+chave_selecao = chave_filtros(periodo_sel, valores_sel, inspetores_sel)
+
+def memorizado(nome, calcular):
+    with rerun.etapa(nome, cache="acerto") as marcas:
+        def calcular_e_marcar():
+            marcas["cache"] = "falha"
+            return calcular()
+        valor = cache_agregacoes.obter(base.versao, chave_selecao, nome, calcular_e_marcar)
+        if hasattr(valor, "shape"):
+            marcas["linhas"] = valor.shape[0]
+        return valor
+
+linhas_filtradas = memorizado(
+    "filtros", lambda: base.selecionar(periodo_sel, valores_sel, inspetores_sel)
+)
+df_filtrado = memorizado("df_filtrado", lambda: base.recortar(linhas_filtradas))
+
+# Recorte do cubo pré-agregado: indicadores e gráficos vêm daqui, com custo
+# proporcional ao número de combinações distintas e não ao de inspeções.
+cubo_filtrado = memorizado(
+    "cubo", lambda: base.agregar(linhas_filtradas, periodo_sel, valores_sel, inspetores_sel)
+)
+rerun.marcadores.update(linhas_filtradas=len(linhas_filtradas), celulas_cubo=len(cubo_filtrado))
+
+# Sketches só quando o recorte saiu do cubo da base (posições das células)
+sketches = None
+if DISTINTOS == "aproximado" and len(linhas_filtradas) > LIMITE_EXATO and base.cubo.atende(valores_sel):
+    sketches = base.cubo.distintos
+
+cache_figuras = obter_cache_figuras()
+
+def plotar(nome, dados, construir, medicao=None):
+    # ``nome`` deve incluir tudo, além dos dados, que muda a figura (títulos etc.);
+    # ``medicao``: o registro de um fragmento (padrão: o do rerun completo)
+    with (medicao or rerun).etapa(f"grafico {nome.split('|')[0]}", cache="acerto") as marcas:
+        def construir_e_marcar(dados):
+            marcas["cache"] = "falha"
+            return construir(dados)
+        figura = figura_em_cache(cache_figuras, base.versao, nome, dados, construir_e_marcar)
+    st.plotly_chart(figura, use_container_width=True)
+
+def contagem_periodo(coluna):
+    if somente_periodo:
+        return base.acumulados.contagem(coluna, periodo_sel)
+    return agregacoes.contagem(cubo_filtrado, coluna)
+
+def totais_periodo(periodo):
+    # Totais de outro período com os mesmos filtros (comparação)
+    if somente_periodo:
+        return base.acumulados.totais(periodo)
+    linhas = base.selecionar(periodo, valores_sel, inspetores_sel)
+    return agregacoes.totais(base.agregar(linhas, periodo, valores_sel, inspetores_sel))
 
 # ======================================================
 # 📌 RESUMO DA SELEÇÃO
@@ -237,11 +312,16 @@ st.sidebar.markdown(
 )
 
 if len(estabelecimento) == 1:
+    # Linhas do estabelecimento (índice) ∩ seleção, sem varrer o quadro filtrado
     est = estabelecimento[0]
-    dados_est = df_filtrado[df_filtrado["ESTABELECIMENTO"] == est]
-    local = dados_est["LOCALIDADE"].dropna().unique()
-    coord = dados_est["COORDENAÇÃO"].dropna().unique()
-    risco = dados_est["CLASSIFICAÇÃO DE RISCO"].dropna().unique()
+    foco = base.estabelecimentos.resumo(est, linhas_filtradas)
+    local = foco["LOCALIDADE"]
+    coord = foco["COORDENAÇÃO"]
+    risco = foco["CLASSIFICAÇÃO DE RISCO"]
+    ultima = (
+        f"{foco['ultima_inspecao']:%d/%m/%Y} (visita {foco['ultima_visita']})"
+        if "ultima_inspecao" in foco and pd.notna(foco["ultima_inspecao"]) else "Não informado"
+    )
 
     st.sidebar.markdown(
         f"""
@@ -250,53 +330,91 @@ if len(estabelecimento) == 1:
 - 📍 Localidade: {", ".join(local) if len(local) > 0 else "Não informado"}
 - 👥 Coordenação: {", ".join(coord) if len(coord) > 0 else "Não informado"}
 - ⚠️ Classificação de Risco: {", ".join(risco) if len(risco) > 0 else "Não informado"}
+- 🔁 Inspeções (toda a base): {foco.get("visitas", 0)} · última em {ultima}
 """
     )
+    # Admin vê todas as visitas ao estabelecimento; o inspetor, só as da sua seleção
+    with st.sidebar.expander("🗂️ Histórico de inspeções"):
+        historico = base.estabelecimentos.historico(est, None if perfil == "admin" else linhas_filtradas)
+        st.dataframe(
+            historico.rename(columns={col_data: "DATA"}),
+            use_container_width=True,
+            hide_index=True,
+            column_config={"DATA": st.column_config.DateColumn(format="DD/MM/YYYY")},
+        )
 
-# ======================================================
-# 🧱 ABAS (ADMIN x INSPETOR)
-# ======================================================
 if perfil == "admin":
-    aba_geral, aba_inspetores, aba_coordenacao, aba_detalhes, aba_download = st.tabs(
-        ["📊 Visão Geral", "🕵️‍♂️ Painel dos Inspetores", "👥 Coordenações", "📑 Tabelas Detalhadas", "📥 Download"]
-    )
-else:
-    aba_geral, aba_detalhes, aba_download = st.tabs(
-        ["📊 Minha Produção", "📑 Minhas Inspeções", "📥 Download"]
-    )
-    aba_inspetores = None
-    aba_coordenacao = None
+    with st.sidebar.expander("⚙️ Cache de agregações"):
+        est_cache = cache_agregacoes.estatisticas()
+        st.markdown(
+            f"""
+- **Acertos / falhas:** {est_cache["acertos"]} / {est_cache["falhas"]}
+- **Taxa de acerto:** {est_cache["taxa_acerto"] * 100:.1f}%
+- **Entradas:** {est_cache["entradas"]} ({est_cache["bytes"] / 2**20:.1f} MB)
+- **Remoções / invalidações:** {est_cache["remocoes"]} / {est_cache["invalidacoes"]}
+"""
+        )
 
 # ======================================================
 # 📊 VISÃO GERAL / MINHA PRODUÇÃO
 # ======================================================
-with aba_geral:
+def visao_geral():
     if perfil == "admin":
         st.subheader("📊 Indicadores Gerais do Período Selecionado")
     else:
         st.subheader("📊 Minha Produção no Período Selecionado")
 
-    total_inspecoes = len(df_filtrado)
-    total_estabelecimentos = df_filtrado["ESTABELECIMENTO"].nunique()
-    total_inspetores_env = len(set(sum(df_filtrado["INSPETOR_LISTA"].tolist(), [])))
-    dias_periodo = df_filtrado["DATA"].dt.date.nunique()
-    dias_periodo = dias_periodo if dias_periodo > 0 else 1
-
-    taxa_liberacao = (
-        df_filtrado["LIBERADO_BIN"].sum() / total_inspecoes * 100
-        if total_inspecoes > 0 else 0
+    indicadores = memorizado(
+        "indicadores",
+        lambda: agregacoes.indicadores(
+            cubo_filtrado, df_filtrado, base.inspetores,
+            base.acumulados.totais(periodo_sel) if somente_periodo else None,
+            sketches,
+        ),
     )
+    total_inspecoes = indicadores["total_inspecoes"]
+    total_estabelecimentos = indicadores["total_estabelecimentos"]
+    total_inspetores_env = indicadores["total_inspetores"]
+    dias_periodo = indicadores["dias_periodo"]
+    taxa_liberacao = indicadores["taxa_liberacao"]
+
+    # Comparação com outro período (mesmos filtros)
+    delta_inspecoes = delta_taxa = None
+    if periodo_sel and len(periodo_sel) == 2:
+        modo_comparacao = st.radio(
+            "🔁 Comparar com",
+            list(MODOS_COMPARACAO),
+            format_func=MODOS_COMPARACAO.get,
+            horizontal=True,
+            key="comparacao",
+        )
+        periodo_cmp = periodo_anterior(*periodo_sel, modo_comparacao)
+        anteriores = memorizado(f"comparacao_{modo_comparacao}", lambda: totais_periodo(periodo_cmp))
+        diferenca = total_inspecoes - anteriores["total_inspecoes"]
+        delta_inspecoes = f"{diferenca:+d}"
+        if anteriores["total_inspecoes"] > 0:
+            delta_inspecoes += f" ({diferenca / anteriores['total_inspecoes'] * 100:+.1f}%)"
+            delta_taxa = f"{taxa_liberacao - anteriores['taxa_liberacao']:+.1f} p.p."
+        st.caption(
+            f"Comparado com {periodo_cmp[0]:%d/%m/%Y} a {periodo_cmp[1]:%d/%m/%Y}: "
+            f"{anteriores['total_inspecoes']} inspeções, "
+            f"{anteriores['taxa_liberacao']:.1f}% de liberação."
+        )
 
     col_kpi1, col_kpi2, col_kpi3, col_kpi4 = st.columns(4)
     if perfil == "admin":
-        col_kpi1.metric("Total de Inspeções", f"{total_inspecoes}")
+        col_kpi1.metric("Total de Inspeções", f"{total_inspecoes}", delta_inspecoes)
         col_kpi3.metric("Inspetores Envolvidos", f"{total_inspetores_env}")
     else:
-        col_kpi1.metric("Minhas Inspeções", f"{total_inspecoes}")
+        col_kpi1.metric("Minhas Inspeções", f"{total_inspecoes}", delta_inspecoes)
         col_kpi3.metric("Estabelecimentos Atendidos", f"{total_estabelecimentos}")
 
     col_kpi2.metric("Estabelecimentos Únicos", f"{total_estabelecimentos}")
-    col_kpi4.metric("Taxa de Liberação (%)", f"{taxa_liberacao:.1f}%")
+    col_kpi4.metric("Taxa de Liberação (%)", f"{taxa_liberacao:.1f}%", delta_taxa)
+    if sketches is not None:
+        st.caption(
+            f"≈ Estabelecimentos distintos estimados (HyperLogLog, erro padrão de ~{ERRO_PADRAO * 100:.1f}%)."
+        )
 
     st.markdown("### 📈 Tendências e Distribuições")
 
@@ -304,34 +422,52 @@ with aba_geral:
 
     # 📅 Produção ao longo do período
     with col1:
-        prod_por_data = df_filtrado.groupby("DATA").size().reset_index(name="Inspeções")
+        # Dia, semana ou mês, conforme a extensão do período selecionado
+        if periodo_sel and len(periodo_sel) == 2:
+            granularidade = escolher_granularidade(*periodo_sel)
+        else:
+            granularidade = escolher_granularidade(df[col_data].min(), df[col_data].max())
+        _, adjetivo, substantivo = GRANULARIDADES[granularidade]
+
+        prod_por_data = memorizado(
+            f"producao_por_data_{granularidade}",
+            lambda: agregacoes.producao_por_data(cubo_filtrado, granularidade),
+        )
         if not prod_por_data.empty:
-            titulo = "📅 Produção Diária no Período"
+            titulo = f"📅 Produção {adjetivo} no Período"
             if perfil != "admin":
-                titulo = "📅 Minhas Inspeções por Dia"
-            graf1 = px.bar(
+                titulo = f"📅 Minhas Inspeções por {substantivo}"
+            plotar(
+                f"producao|{titulo}",
                 prod_por_data,
-                x="DATA",
-                y="Inspeções",
-                title=titulo
+                lambda dados: px.bar(
+                    dados,
+                    x="DATA",
+                    y="Inspeções",
+                    title=titulo
+                ).update_layout(xaxis_title=substantivo if granularidade != "dia" else "Data",
+                                yaxis_title="Nº de inspeções"),
             )
-            graf1.update_layout(xaxis_title="Data", yaxis_title="Nº de inspeções")
-            st.plotly_chart(graf1, use_container_width=True)
         else:
             st.info("Sem dados para o período selecionado.")
 
     # 🎯 Distribuição por Motivação
     with col2:
-        motiv_counts = df_filtrado["MOTIVAÇÃO"].value_counts().reset_index()
+        motiv_counts = memorizado(
+            "contagem_motivacao", lambda: contagem_periodo("MOTIVAÇÃO")
+        ).reset_index()
         motiv_counts.columns = ["Motivação", "Quantidade"]
         if not motiv_counts.empty:
-            graf2 = px.pie(
+            plotar(
+                "motivacao",
                 motiv_counts,
-                names="Motivação",
-                values="Quantidade",
-                title="🎯 Distribuição por Motivação"
+                lambda dados: px.pie(
+                    dados,
+                    names="Motivação",
+                    values="Quantidade",
+                    title="🎯 Distribuição por Motivação"
+                ),
             )
-            st.plotly_chart(graf2, use_container_width=True)
         else:
             st.info("Sem dados de motivação para o filtro atual.")
 
@@ -339,265 +475,364 @@ with aba_geral:
 
     # ✔️ Status do Estabelecimento
     with col3:
-        status_counts = df_filtrado["O ESTABELECIMENTO FOI LIBERADO"].value_counts().reset_index()
+        status_counts = memorizado(
+            "contagem_status",
+            lambda: contagem_periodo("O ESTABELECIMENTO FOI LIBERADO"),
+        ).reset_index()
         status_counts.columns = ["Status", "Quantidade"]
         if not status_counts.empty:
-            graf3 = px.pie(
+            plotar(
+                "status",
                 status_counts,
-                names="Status",
-                values="Quantidade",
-                title="✔️ Status do Estabelecimento"
+                lambda dados: px.pie(
+                    dados,
+                    names="Status",
+                    values="Quantidade",
+                    title="✔️ Status do Estabelecimento"
+                ),
             )
-            st.plotly_chart(graf3, use_container_width=True)
         else:
             st.info("Sem dados de status para o filtro atual.")
 
     # 🏙️ Classificação de Risco por Localidade
     with col4:
-        risco_local = (
-            df_filtrado
-            .groupby(["LOCALIDADE", "CLASSIFICAÇÃO DE RISCO"])
-            .size()
-            .reset_index(name="Quantidade")
+        risco_local = memorizado(
+            "risco_localidade",
+            lambda: agregacoes.cruzamento(cubo_filtrado, "LOCALIDADE", "CLASSIFICAÇÃO DE RISCO"),
         )
         if not risco_local.empty:
-            graf4 = px.bar(
+            plotar(
+                "risco_localidade",
                 risco_local,
-                x="LOCALIDADE",
-                y="Quantidade",
-                color="CLASSIFICAÇÃO DE RISCO",
-                title="🏙️ Classificação de Risco por Localidade",
-                barmode="stack"
+                lambda dados: px.bar(
+                    dados,
+                    x="LOCALIDADE",
+                    y="Quantidade",
+                    color="CLASSIFICAÇÃO DE RISCO",
+                    title="🏙️ Classificação de Risco por Localidade",
+                    barmode="stack"
+                ).update_layout(xaxis_title="Localidade", yaxis_title="Nº de inspeções"),
             )
-            graf4.update_layout(xaxis_title="Localidade", yaxis_title="Nº de inspeções")
-            st.plotly_chart(graf4, use_container_width=True)
         else:
             st.info("Sem dados de risco/localidade para o filtro atual.")
 
 # ======================================================
 # 🕵️‍♂️ PAINEL DOS INSPETORES (APENAS ADMIN)
 # ======================================================
-if perfil == "admin" and aba_inspetores is not None:
-    with aba_inspetores:
-        st.subheader("🕵️‍♂️ Indicadores de Desempenho por Inspetor")
-
-        df_insp = df_filtrado.explode("INSPETOR_LISTA")
-        df_insp = df_insp[
-            df_insp["INSPETOR_LISTA"].notna() & (df_insp["INSPETOR_LISTA"] != "")
-        ]
-
-        if df_insp.empty:
-            st.info("Nenhum dado de inspetor encontrado para o filtro atual.")
-        else:
-            dias_periodo = df_filtrado["DATA"].dt.date.nunique()
-            dias_periodo = dias_periodo if dias_periodo > 0 else 1
+@st.fragment
+def ranking_mensal(prod_mensal):
+    # Fragmento: trocar o mês só reexecuta este trecho, não o painel inteiro.
+    # Meses pela chave inteira (PERIODO): a produção já vem ordenada por mês
+    # e, dentro do mês, por inspeções, então o ranking é uma fatia
+    # Registro próprio: numa reexecução só do fragmento o do rerun completo
+    # já foi finalizado
+    medicao = telemetria.iniciar(fragmento="ranking")
+    rotulos = dict(zip(prod_mensal["PERIODO"], prod_mensal["MES_ANO_LABEL"]))
+
+    mes_selecionado = st.selectbox(
+        "Selecione o Mês/Ano para ver o ranking:",
+        list(rotulos),
+        format_func=rotulos.get,
+    )
+    mes_label_selecionado = rotulos[mes_selecionado]
 
-            grp = df_insp.groupby("INSPETOR_LISTA")
+    ranking_mes = ranking_do_mes(prod_mensal, mes_selecionado)
 
-            desempenho_insp = grp.agg(
-                INSPECOES=("INSPETOR_LISTA", "count"),
-                LIBERADOS=("LIBERADO_BIN", "sum"),
-                ESTAB_UNICOS=("ESTABELECIMENTO", "nunique")
-            ).reset_index()
+    col_r1, col_r2 = st.columns([1, 1.5])
 
-            desempenho_insp["TAXA_LIBERACAO_%"] = (
-                desempenho_insp["LIBERADOS"] / desempenho_insp["INSPECOES"] * 100
-            ).round(1)
+    with col_r1:
+        st.markdown(f"**Ranking de Inspetores - {mes_label_selecionado}**")
+        st.dataframe(
+            ranking_mes[["POSICAO", "INSPETOR_LISTA", "INSPECOES"]],
+            use_container_width=True
+        )
 
-            desempenho_insp["INSPECOES_DIA_MEDIO"] = (
-                desempenho_insp["INSPECOES"] / dias_periodo
-            ).round(2)
+    with col_r2:
+        plotar(
+            f"ranking_mes|{mes_label_selecionado}",
+            ranking_mes,
+            lambda dados: px.bar(
+                dados,
+                x="INSPETOR_LISTA",
+                y="INSPECOES",
+                title=f"🏅 Ranking de Produção - {mes_label_selecionado}",
+                text="INSPECOES"
+            ).update_traces(textposition="outside")
+            .update_layout(xaxis_title="Inspetor", yaxis_title="Nº de inspeções"),
+            medicao=medicao,
+        )
+    medicao.finalizar(perfil=perfil)
 
-            desempenho_insp["PARTICIPACAO_%"] = (
-                desempenho_insp["INSPECOES"] / desempenho_insp["INSPECOES"].sum() * 100
-            ).round(1)
+def painel_inspetores():
+    st.subheader("🕵️‍♂️ Indicadores de Desempenho por Inspetor")
 
-            desempenho_insp = desempenho_insp.sort_values("INSPECOES", ascending=False)
+    # Células do cubo expandidas para os membros de cada equipe
+    desempenho_insp = memorizado(
+        "desempenho_inspetores",
+        lambda: agregacoes.desempenho_inspetores(
+            cubo_filtrado, base, linhas_filtradas, agregacoes.dias_periodo(cubo_filtrado), sketches
+        ),
+    )
 
-            col_a, col_b, col_c = st.columns(3)
-            col_a.metric("Total de Inspetores Ativos no Período", f"{desempenho_insp['INSPETOR_LISTA'].nunique()}")
-            col_b.metric("Maior Produção (Inspetor)", f"{desempenho_insp.iloc[0]['INSPECOES']} insp.")
-            col_c.metric(
-                "Média de Inspeções por Inspetor",
-                f"{desempenho_insp['INSPECOES'].mean():.1f}"
-            )
+    if desempenho_insp.empty:
+        st.info("Nenhum dado de inspetor encontrado para o filtro atual.")
+    else:
+        col_a, col_b, col_c = st.columns(3)
+        col_a.metric("Total de Inspetores Ativos no Período", f"{desempenho_insp['INSPETOR_LISTA'].nunique()}")
+        col_b.metric("Maior Produção (Inspetor)", f"{desempenho_insp.iloc[0]['INSPECOES']} insp.")
+        col_c.metric(
+            "Média de Inspeções por Inspetor",
+            f"{desempenho_insp['INSPECOES'].mean():.1f}"
+        )
 
-            st.markdown("### 📋 Tabela de Desempenho por Inspetor")
-            st.dataframe(desempenho_insp, use_container_width=True)
+        st.markdown("### 📋 Tabela de Desempenho por Inspetor")
+        st.dataframe(desempenho_insp, use_container_width=True)
 
-            fig_insp = px.bar(
-                desempenho_insp,
+        plotar(
+            "producao_inspetores",
+            desempenho_insp[["INSPETOR_LISTA", "INSPECOES"]],
+            lambda dados: px.bar(
+                dados,
                 x="INSPETOR_LISTA",
                 y="INSPECOES",
                 title="🏆 Produção por Inspetor (Período Selecionado)",
                 text="INSPECOES"
-            )
-            fig_insp.update_traces(textposition="outside")
-            fig_insp.update_layout(xaxis_title="Inspetor", yaxis_title="Nº de inspeções")
-            st.plotly_chart(fig_insp, use_container_width=True)
-
-            # Ranking mensal
-            st.markdown("### 📆 Ranking Mensal de Produção dos Inspetores")
-
-            prod_mensal = (
-                df_insp
-                .groupby(["ANO_MES", "MES_ANO_LABEL", "INSPETOR_LISTA"])
-                .size()
-                .reset_index(name="INSPECOES")
-            )
-
-            if not prod_mensal.empty:
-                meses_disponiveis = prod_mensal["MES_ANO_LABEL"].unique().tolist()
-                meses_disponiveis = sorted(
-                    meses_disponiveis,
-                    key=lambda x: datetime.strptime(x, "%b/%Y")
-                )
+            ).update_traces(textposition="outside")
+            .update_layout(xaxis_title="Inspetor", yaxis_title="Nº de inspeções"),
+        )
 
-                mes_label_selecionado = st.selectbox(
-                    "Selecione o Mês/Ano para ver o ranking:",
-                    meses_disponiveis
-                )
+        # Ranking mensal
+        st.markdown("### 📆 Ranking Mensal de Produção dos Inspetores")
 
-                prod_mes_sel = prod_mensal[prod_mensal["MES_ANO_LABEL"] == mes_label_selecionado]
-                ranking_mes = (
-                    prod_mes_sel
-                    .sort_values("INSPECOES", ascending=False)
-                    .reset_index(drop=True)
-                )
-                ranking_mes["POSICAO"] = ranking_mes.index + 1
-
-                col_r1, col_r2 = st.columns([1, 1.5])
-
-                with col_r1:
-                    st.markdown(f"**Ranking de Inspetores - {mes_label_selecionado}**")
-                    st.dataframe(
-                        ranking_mes[["POSICAO", "INSPETOR_LISTA", "INSPECOES"]],
-                        use_container_width=True
-                    )
-
-                with col_r2:
-                    fig_rank = px.bar(
-                        ranking_mes,
-                        x="INSPETOR_LISTA",
-                        y="INSPECOES",
-                        title=f"🏅 Ranking de Produção - {mes_label_selecionado}",
-                        text="INSPECOES"
-                    )
-                    fig_rank.update_traces(textposition="outside")
-                    fig_rank.update_layout(xaxis_title="Inspetor", yaxis_title="Nº de inspeções")
-                    st.plotly_chart(fig_rank, use_container_width=True)
-
-                fig_evol = px.line(
-                    prod_mensal.sort_values("ANO_MES"),
+        # Só com filtro de período, os meses inteiros vêm prontos do ranking
+        # incremental da base; os demais filtros exigem recontar o recorte
+        if somente_periodo or (not periodo_sel and not inspetores_sel and not any(valores_sel.values())):
+            calcular_mensal = lambda: base.ranking.producao_mensal(periodo_sel, cubo_filtrado, base.inspetores)
+        else:
+            calcular_mensal = lambda: agregacoes.producao_mensal_inspetores(cubo_filtrado, base.inspetores)
+        prod_mensal = memorizado("producao_mensal", calcular_mensal)
+
+        if not prod_mensal.empty:
+            ranking_mensal(prod_mensal)
+
+            # Uma linha por inspetor; séries grandes vão para WebGL
+            plotar(
+                "evolucao_mensal",
+                prod_mensal.sort_values(["PERIODO", "INSPETOR_LISTA"], kind="stable"),
+                lambda dados: px.line(
+                    dados,
                     x="MES_ANO_LABEL",
                     y="INSPECOES",
                     color="INSPETOR_LISTA",
                     markers=True,
+                    render_mode=modo_renderizacao(len(dados)),
                     title="📈 Evolução Mensal de Produção por Inspetor"
-                )
-                fig_evol.update_layout(xaxis_title="Mês/Ano", yaxis_title="Nº de inspeções")
-                st.plotly_chart(fig_evol, use_container_width=True)
+                ).update_layout(xaxis_title="Mês/Ano", yaxis_title="Nº de inspeções"),
+            )
 
 # ======================================================
 # 👥 VISÃO POR COORDENAÇÃO (APENAS ADMIN)
 # ======================================================
-if perfil == "admin" and aba_coordenacao is not None:
-    with aba_coordenacao:
-        st.subheader("👥 Indicadores por Coordenação")
-
-        if df_filtrado.empty:
-            st.info("Sem dados para o filtro atual.")
-        else:
-            grp_coord = df_filtrado.groupby("COORDENAÇÃO").agg(
-                INSPECOES=("COORDENAÇÃO", "count"),
-                ESTAB_UNICOS=("ESTABELECIMENTO", "nunique"),
-                LIBERADOS=("LIBERADO_BIN", "sum")
-            ).reset_index()
+def visao_coordenacoes():
+    st.subheader("👥 Indicadores por Coordenação")
 
-            grp_coord["TAXA_LIBERACAO_%"] = (
-                grp_coord["LIBERADOS"] / grp_coord["INSPECOES"] * 100
-            ).round(1)
-
-            grp_coord = grp_coord.sort_values("INSPECOES", ascending=False)
+    if df_filtrado.empty:
+        st.info("Sem dados para o filtro atual.")
+    else:
+        grp_coord = memorizado(
+            "desempenho_coordenacoes",
+            lambda: agregacoes.desempenho_coordenacoes(
+                cubo_filtrado, df_filtrado,
+                base.acumulados.somas("COORDENAÇÃO", periodo_sel) if somente_periodo else None,
+                sketches,
+            ),
+        )
 
-            st.markdown("### 📋 Tabela de Coordenações")
-            st.dataframe(grp_coord, use_container_width=True)
+        st.markdown("### 📋 Tabela de Coordenações")
+        st.dataframe(grp_coord, use_container_width=True)
 
-            fig_coord = px.bar(
-                grp_coord,
+        plotar(
+            "producao_coordenacoes",
+            grp_coord[["COORDENAÇÃO", "INSPECOES"]],
+            lambda dados: px.bar(
+                dados,
                 x="COORDENAÇÃO",
                 y="INSPECOES",
                 title="👥 Produção por Coordenação",
                 text="INSPECOES"
-            )
-            fig_coord.update_traces(textposition="outside")
-            fig_coord.update_layout(xaxis_title="Coordenação", yaxis_title="Nº de inspeções")
-            st.plotly_chart(fig_coord, use_container_width=True)
-
-            risco_coord = (
-                df_filtrado
-                .groupby(["COORDENAÇÃO", "CLASSIFICAÇÃO DE RISCO"])
-                .size()
-                .reset_index(name="Quantidade")
-            )
-            if not risco_coord.empty:
-                fig_risco_coord = px.bar(
-                    risco_coord,
+            ).update_traces(textposition="outside")
+            .update_layout(xaxis_title="Coordenação", yaxis_title="Nº de inspeções"),
+        )
+
+        risco_coord = memorizado(
+            "risco_coordenacao",
+            lambda: agregacoes.cruzamento(cubo_filtrado, "COORDENAÇÃO", "CLASSIFICAÇÃO DE RISCO"),
+        )
+        if not risco_coord.empty:
+            plotar(
+                "risco_coordenacao",
+                risco_coord,
+                lambda dados: px.bar(
+                    dados,
                     x="COORDENAÇÃO",
                     y="Quantidade",
                     color="CLASSIFICAÇÃO DE RISCO",
                     title="⚠️ Mix de Risco por Coordenação",
                     barmode="stack"
-                )
-                fig_risco_coord.update_layout(xaxis_title="Coordenação", yaxis_title="Nº de inspeções")
-                st.plotly_chart(fig_risco_coord, use_container_width=True)
+                ).update_layout(xaxis_title="Coordenação", yaxis_title="Nº de inspeções"),
+            )
 
 # ======================================================
 # 📑 TABELAS DETALHADAS
 # ======================================================
-with aba_detalhes:
+def tabela_detalhada():
     if perfil == "admin":
         st.subheader("📑 Visualização Completa dos Dados Filtrados")
     else:
         st.subheader("📑 Minhas Inspeções Detalhadas")
 
-    colunas_tabela = [
-        "DATA",
-        "TURNO",
-        "ESTABELECIMENTO",
-        "LOCALIDADE",
-        "COORDENAÇÃO",
-        "CLASSIFICAÇÃO DE RISCO",
-        "MOTIVAÇÃO",
-        "O ESTABELECIMENTO FOI LIBERADO",
-        "NÚMERO DA VISITA",
-        "EQUIPE/INSPETOR"
-    ]
-
-    colunas_existentes = [c for c in colunas_tabela if c in df_filtrado.columns]
-    st.dataframe(
-        df_filtrado[colunas_existentes].sort_values("DATA", ascending=False),
-        use_container_width=True
+    # Paginação no servidor: a ordem vem das permutações montadas na carga
+    # e só a página visível é recortada e enviada ao navegador.
+    tabela = base.tabela
+    col_busca, col_ordem, col_sentido = st.columns([3, 2, 1])
+    with col_busca:
+        busca = st.text_input("🔎 Buscar estabelecimento", key="tabela_busca")
+    with col_ordem:
+        coluna_ordem = st.selectbox("Ordenar por", tabela.colunas, key="tabela_ordem")
+    with col_sentido:
+        decrescente = st.toggle("Decrescente", value=True, key="tabela_decrescente")
+
+    linhas_tabela = memorizado(
+        f"tabela|{busca.strip().upper()}|{coluna_ordem}|{decrescente}",
+        lambda: tabela.ordenar(
+            tabela.buscar(linhas_filtradas, "ESTABELECIMENTO", busca), coluna_ordem, decrescente
+        ),
+    )
+
+    col_pagina, col_tamanho = st.columns([1, 1])
+    with col_tamanho:
+        tamanho = st.selectbox("Linhas por página", TAMANHOS_PAGINA, index=1, key="tabela_tamanho")
+    paginas = max(1, -(-len(linhas_tabela) // tamanho))
+    with col_pagina:
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1,
+                                 key="tabela_pagina")
+    pagina = min(int(pagina), paginas)
+
+    st.dataframe(tabela.pagina(linhas_tabela, pagina, tamanho), use_container_width=True)
+    primeira = (pagina - 1) * tamanho
+    st.caption(
+        f"Linhas {min(primeira + 1, len(linhas_tabela)):,}–{min(primeira + tamanho, len(linhas_tabela)):,} "
+        f"de {len(linhas_tabela):,} · página {pagina} de {paginas}"
     )
 
 # ======================================================
 # 📥 DOWNLOAD
 # ======================================================
-with aba_download:
+def download_dados():
     if perfil == "admin":
         st.subheader("📥 Download dos Dados Filtrados")
     else:
         st.subheader("📥 Download das Minhas Inspeções")
 
-    def gerar_excel_download(dataframe):
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            dataframe.to_excel(writer, index=False, sheet_name="Dados Filtrados")
-        return output.getvalue()
-
-    st.download_button(
-        label="📥 Download (Excel)",
-        data=gerar_excel_download(df_filtrado.drop(columns=["INSPETOR_LISTA"], errors="ignore")),
-        file_name="dados_filtrados_visa.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    # O arquivo só é gerado quando pedido e fica guardado na sessão enquanto
+    # os filtros e o formato não mudarem. É anônimo (sem nome no disco): some
+    # ao ser fechado ou quando a sessão termina e o estado dela é coletado.
+    formato = st.radio(
+        "Formato",
+        list(FORMATOS),
+        format_func=lambda f: FORMATOS[f][0],
+        horizontal=True,
+        key="formato_download",
     )
+    rotulo, extensao, mime = FORMATOS[formato]
+    chave_exportacao = (base.versao, chave_selecao, formato)
+
+    ultima = st.session_state.get("ultima_exportacao")
+    if ultima is not None and ultima["chave"] != chave_exportacao:
+        ultima["arquivo"].close()
+        ultima = st.session_state["ultima_exportacao"] = None
+
+    if ultima is None:
+        if st.button(f"⚙️ Gerar arquivo ({rotulo})"):
+            with st.spinner("Gerando arquivo..."), rerun.etapa(f"exportacao.{formato}", linhas=len(df_filtrado)):
+                arquivo = exportar_temporario(
+                    df_filtrado.drop(columns=["INSPETOR_LISTA"], errors="ignore"), formato
+                )
+            ultima = st.session_state["ultima_exportacao"] = {"chave": chave_exportacao, "arquivo": arquivo}
+
+    if ultima is not None:
+        st.download_button(
+            label=f"📥 Download ({rotulo})",
+            data=ultima["arquivo"],
+            file_name=f"dados_filtrados_visa.{extensao}",
+            mime=mime
+        )
+
+# ======================================================
+# 🧱 VISÕES (ADMIN x INSPETOR)
+# ======================================================
+# Só a visão escolhida é calculada a cada rerun; com VISA_ABAS=1 volta ao
+# layout em abas, em que todas as visões são montadas juntas.
+if perfil == "admin":
+    VISOES = {
+        "📊 Visão Geral": visao_geral,
+        "🕵️‍♂️ Painel dos Inspetores": painel_inspetores,
+        "👥 Coordenações": visao_coordenacoes,
+        "📑 Tabelas Detalhadas": tabela_detalhada,
+        "📥 Download": download_dados,
+    }
+else:
+    VISOES = {
+        "📊 Minha Produção": visao_geral,
+        "📑 Minhas Inspeções": tabela_detalhada,
+        "📥 Download": download_dados,
+    }
+
+if os.environ.get("VISA_ABAS") == "1":
+    for (nome_visao, mostrar), aba in zip(VISOES.items(), st.tabs(list(VISOES))):
+        with aba, rerun.etapa(f"visao {nome_visao}"):
+            mostrar()
+else:
+    visao = st.radio("Visão", list(VISOES), horizontal=True, label_visibility="collapsed", key="visao")
+    with rerun.etapa(f"visao {visao}"):
+        VISOES[visao]()
+
+registro_rerun = rerun.finalizar(perfil=perfil)
+
+# ======================================================
+# ⏱️ DESEMPENHO (APENAS ADMIN)
+# ======================================================
+if perfil == "admin":
+    if fonte.reaberturas:
+        st.sidebar.warning(
+            "📅 Meses fechados reabertos por divergirem da planilha (lançamentos atrasados "
+            "ou correções): "
+            + ", ".join(
+                f"{r['mes']} ({r['linhas_congeladas']} → {r['linhas_planilha']} linhas)"
+                for r in fonte.reaberturas[-5:]
+            )
+        )
+    with st.sidebar.expander("⏱️ Desempenho"):
+        st.markdown(
+            f"**Último rerun:** {registro_rerun['duracao_ms']:.0f} ms · "
+            f"RSS {registro_rerun['rss_mb']:.0f} MB"
+        )
+        st.dataframe(
+            pd.DataFrame(registro_rerun["etapas"]).drop(columns=["inicio_ms"]),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.markdown("**Percentis (reruns recentes, todas as sessões)**")
+        st.dataframe(telemetria.percentis(), use_container_width=True, hide_index=True)
+        if fonte.ultima_atualizacao:
+            st.caption(
+                "Última consulta à planilha: "
+                + ", ".join(f"{k}={v:.0f}" if isinstance(v, float) else f"{k}={v}"
+                            for k, v in fonte.ultima_atualizacao.items())
+            )
+        st.download_button(
+            "📄 Logs (JSON Lines)",
+            data=telemetria.json_linhas(),
+            file_name="telemetria_visa.jsonl",
+            mime="application/x-ndjson",
+        )